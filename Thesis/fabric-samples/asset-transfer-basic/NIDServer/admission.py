@@ -0,0 +1,141 @@
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from metrics import METRICS_WINDOW, percentile
+
+# Callers send their remaining budget so work they've given up on is dropped
+DEADLINE_HEADER = 'X-Request-Timeout-Ms'
+
+
+def request_deadline(timeout_ms, default_ms):
+    """perf_counter() deadline from a DEADLINE_HEADER value, or the default budget"""
+    try:
+        budget = float(timeout_ms) if timeout_ms not in (None, '') else float(default_ms)
+    except ValueError:
+        budget = float(default_ms)
+    return time.perf_counter() + max(0.0, budget) / 1000
+
+
+class Rejected(Exception):
+    """A request shed by admission control, with the HTTP status to answer"""
+
+    def __init__(self, reason, status, retry_after=None):
+        super().__init__(reason)
+        self.reason = reason
+        self.status = status
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bounds how much CPU-heavy work the server takes on at once.
+
+    At most ``max_in_flight`` requests run; up to ``max_queue`` more wait
+    for a slot. Anything beyond that is refused at once with 429 and a
+    Retry-After estimated from the queue depth and recent service times,
+    instead of piling up behind work that will already miss its deadline.
+    A waiting request whose deadline passes leaves the queue with 503, and
+    ``expired`` lets a handler drop a probe whose caller has given up
+    between stages.
+    """
+
+    def __init__(self, max_in_flight=4, max_queue=16):
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.max_queue = max(0, int(max_queue))
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        self._window = deque(maxlen=METRICS_WINDOW)
+        self._totals = {'admitted': 0, 'completed': 0, 'shed_queue_full': 0,
+                        'shed_deadline_queued': 0, 'shed_deadline_running': 0}
+
+    def configure(self, max_in_flight=None, max_queue=None):
+        """Change the limits at runtime; waiting requests re-check at once"""
+        with self._cond:
+            if max_in_flight is not None:
+                self.max_in_flight = max(1, int(max_in_flight))
+            if max_queue is not None:
+                self.max_queue = max(0, int(max_queue))
+            self._cond.notify_all()
+
+    def _mean_service(self):
+        services = [service for _, _, service in self._window]
+        return sum(services) / len(services) if services else 1.0
+
+    def retry_after(self):
+        """Seconds until a new request would likely find a free slot"""
+        backlog = self._waiting + self._active + 1
+        return min(30, max(1, math.ceil(backlog * self._mean_service() / self.max_in_flight)))
+
+    @contextmanager
+    def slot(self, deadline):
+        """
+        Hold one work slot for the duration of the block; yields the seconds
+        spent queued. Raises Rejected when the queue is full or the deadline
+        passes while waiting.
+        """
+        queued = time.perf_counter()
+        with self._cond:
+            if self._active >= self.max_in_flight:
+                if self._waiting >= self.max_queue:
+                    self._totals['shed_queue_full'] += 1
+                    raise Rejected('queue_full', 429, self.retry_after())
+                self._waiting += 1
+                try:
+                    while self._active >= self.max_in_flight:
+                        remaining = deadline - time.perf_counter()
+                        if remaining <= 0:
+                            self._totals['shed_deadline_queued'] += 1
+                            raise Rejected('deadline', 503)
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            self._active += 1
+            self._totals['admitted'] += 1
+        started = time.perf_counter()
+        try:
+            yield started - queued
+        finally:
+            finished = time.perf_counter()
+            with self._cond:
+                self._active -= 1
+                self._totals['completed'] += 1
+                self._window.append((time.time(), started - queued, finished - started))
+                self._cond.notify()
+
+    def expired(self, deadline):
+        """True (and counted as shed) when the caller's deadline has passed"""
+        if time.perf_counter() <= deadline:
+            return False
+        with self._cond:
+            self._totals['shed_deadline_running'] += 1
+        return True
+
+    def metrics(self):
+        """Queue depth, shed counts and queue-wait / service times over the recent window"""
+        with self._cond:
+            window = list(self._window)
+            totals = dict(self._totals)
+            active, waiting = self._active, self._waiting
+        waits = [wait * 1000 for _, wait, _ in window]
+        services = [service * 1000 for _, _, service in window]
+        return {
+            'max_in_flight': self.max_in_flight,
+            'max_queue': self.max_queue,
+            'in_flight': active,
+            'queued': waiting,
+            'admitted_total': totals['admitted'],
+            'completed_total': totals['completed'],
+            'shed_queue_full_total': totals['shed_queue_full'],
+            'shed_deadline_queued_total': totals['shed_deadline_queued'],
+            'shed_deadline_running_total': totals['shed_deadline_running'],
+            'shed_total': (totals['shed_queue_full'] + totals['shed_deadline_queued']
+                           + totals['shed_deadline_running']),
+            'queue_wait_ms_p50': percentile(waits, 50),
+            'queue_wait_ms_p95': percentile(waits, 95),
+            'service_ms_p50': percentile(services, 50),
+            'service_ms_p95': percentile(services, 95),
+        }
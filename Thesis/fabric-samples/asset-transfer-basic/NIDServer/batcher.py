@@ -0,0 +1,148 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+from gallery import chisqr_distances
+from metrics import METRICS_WINDOW, percentile
+
+
+class MatchBatcher:
+    """
+    Collects concurrent /match probes and scores them against the gallery together.
+
+    Each request thread submits its feature vector and blocks on a Future.
+    A single scheduler thread takes the first waiting probe, keeps pulling
+    more until ``max_batch`` probes are queued or ``max_wait_ms`` has passed,
+    then scores the whole block with one chisqr_distances call so the
+    gallery is read once per batch instead of once per probe. Under light
+    load a probe waits at most ``max_wait_ms`` extra; under heavy load
+    batches fill before the timer expires.
+
+    A probe submitted with ``rows`` (a demographic prefilter) is scored
+    only against those gallery rows, so its cost follows the subset size.
+    """
+
+    def __init__(self, ids, features, max_batch=32, max_wait_ms=2.0):
+        self.ids = np.asarray(ids)
+        self.features = np.asarray(features, dtype=np.float64)
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._window = deque(maxlen=METRICS_WINDOW)
+        self._totals = {'batches': 0, 'probes': 0, 'compute_seconds': 0.0,
+                        'filtered_probes': 0, 'filtered_candidates': 0}
+        self._started = time.time()
+        self._thread = threading.Thread(target=self._run, name='match-batcher', daemon=True)
+        self._thread.start()
+
+    def configure(self, max_batch=None, max_wait_ms=None):
+        """Change batching limits at runtime; applies from the next batch"""
+        if max_batch is not None:
+            self.max_batch = max(1, int(max_batch))
+        if max_wait_ms is not None:
+            self.max_wait_ms = max(0.0, float(max_wait_ms))
+
+    def submit(self, features, rows=None):
+        """
+        Queue one probe; the Future resolves to (best_id, best_score).
+        ``rows`` restricts the search to those gallery row numbers.
+        """
+        future = Future()
+        self._queue.put((np.asarray(features, dtype=np.float64), future, time.perf_counter(), rows))
+        return future
+
+    def match(self, features, threshold=0.3, timeout=30, rows=None):
+        """Blocking helper mirroring match_fingerprint: best id under threshold or None"""
+        best_id, best_score = self.submit(features, rows).result(timeout=timeout)
+        return best_id if best_score < threshold else None
+
+    def _score(self, batch):
+        results = [(None, float('inf'))] * len(batch)
+        full = [i for i, (_, _, _, rows) in enumerate(batch) if rows is None]
+        if full and len(self.ids):
+            distances = chisqr_distances(np.vstack([batch[i][0] for i in full]), self.features)
+            best = distances.argmin(axis=1)
+            scores = distances[np.arange(len(full)), best]
+            for i, row, score in zip(full, best, scores):
+                results[i] = (self.ids[row].item(), float(score))
+        for i, (probe, _, _, rows) in enumerate(batch):
+            if rows is None or len(rows) == 0:
+                continue
+            # Fancy indexing reads just the candidate rows, also from a mmap
+            distances = chisqr_distances(probe, self.features[rows])[0]
+            best = int(distances.argmin())
+            results[i] = (self.ids[rows[best]].item(), float(distances[best]))
+        return results
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                # Anything already queued is taken even once the wait is over
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            start = time.perf_counter()
+            try:
+                results = self._score(batch)
+            except Exception as e:
+                for _, future, _, _ in batch:
+                    future.set_exception(e)
+                continue
+            compute = time.perf_counter() - start
+            for (_, future, _, _), result in zip(batch, results):
+                future.set_result(result)
+            waits = [start - queued for _, _, queued, _ in batch]
+            subsets = [len(rows) for _, _, _, rows in batch if rows is not None]
+            with self._lock:
+                self._totals['batches'] += 1
+                self._totals['probes'] += len(batch)
+                self._totals['compute_seconds'] += compute
+                self._totals['filtered_probes'] += len(subsets)
+                self._totals['filtered_candidates'] += sum(subsets)
+                self._window.append((time.time(), len(batch), max(waits), compute))
+
+    def metrics(self):
+        """Batch fill, queueing delay and throughput over the recent window"""
+        with self._lock:
+            window = list(self._window)
+            totals = dict(self._totals)
+        fills = [fill for _, fill, _, _ in window]
+        waits = [wait * 1000 for _, _, wait, _ in window]
+        computes = [compute * 1000 for _, _, _, compute in window]
+        span = window[-1][0] - window[0][0] if len(window) > 1 else 0
+        return {
+            'max_batch': self.max_batch,
+            'max_wait_ms': self.max_wait_ms,
+            'gallery_size': int(len(self.ids)),
+            'queued': self._queue.qsize(),
+            'batches_total': totals['batches'],
+            'probes_total': totals['probes'],
+            'compute_seconds_total': round(totals['compute_seconds'], 6),
+            'uptime_seconds': round(time.time() - self._started, 1),
+            'window_batches': len(window),
+            'mean_batch_fill': round(float(np.mean(fills)), 2) if fills else None,
+            'batch_fill_ratio': round(float(np.mean(fills)) / self.max_batch, 3) if fills else None,
+            'flushed_by_timeout_ratio': (round(sum(f < self.max_batch for f in fills) / len(fills), 3)
+                                         if fills else None),
+            'queue_wait_ms_p50': percentile(waits, 50),
+            'queue_wait_ms_p95': percentile(waits, 95),
+            'compute_ms_p50': percentile(computes, 50),
+            'compute_ms_p95': percentile(computes, 95),
+            'probes_per_second': round(sum(fills) / span, 1) if span else None,
+            'filtered_probes_total': totals['filtered_probes'],
+            'mean_filtered_candidates': (round(totals['filtered_candidates'] / totals['filtered_probes'], 1)
+                                         if totals['filtered_probes'] else None),
+        }
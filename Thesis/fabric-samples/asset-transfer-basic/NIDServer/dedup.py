@@ -0,0 +1,155 @@
+import argparse
+import json
+import os
+import resource
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from gallery import chisqr_distances, extract_directory, load_features, save_features
+
+# match_fingerprint accepts anything under 0.3, but distinct fingers in
+# fingerprints_raw already score 0.005-0.3 against each other, so a
+# duplicate audit needs a much tighter cut to stay meaningful
+DEFAULT_THRESHOLD = 0.003
+DEFAULT_TILE = 1024
+
+# Gallery opened once per worker process
+_features = None
+
+
+def _init_worker(features_path):
+    global _features
+    _, _features = load_features(features_path, mmap_mode='r')
+
+
+def _scan_tile(row_start, col_start, tile, threshold):
+    """
+    Score one tile of the upper triangle of the all-pairs matrix.
+
+    compareHist's chi-square is asymmetric, so a pair is suspect if either
+    direction falls under the threshold, mirroring /match where either
+    finger could be the probe.
+    """
+    rows = np.asarray(_features[row_start:row_start + tile])
+    cols = np.asarray(_features[col_start:col_start + tile])
+    distances = np.minimum(chisqr_distances(rows, cols), chisqr_distances(cols, rows).T)
+    if row_start == col_start:
+        # Diagonal tile: keep only i < j
+        distances[np.tril_indices(len(rows), m=len(cols))] = np.inf
+    i, j = np.nonzero(distances < threshold)
+    return len(rows) * len(cols), [(int(a + row_start), int(b + col_start), float(distances[a, b]))
+                                   for a, b in zip(i, j)]
+
+
+def _clusters(ids, pairs):
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for i, j, _ in pairs:
+        parent[find(i)] = find(j)
+    groups = {}
+    for index in parent:
+        groups.setdefault(find(index), []).append(int(ids[index]))
+    return sorted((sorted(members) for members in groups.values()), key=len, reverse=True)
+
+
+def find_duplicates(features_path, threshold=DEFAULT_THRESHOLD, tile=DEFAULT_TILE, workers=None, progress=True):
+    """
+    All-pairs duplicate-enrollment scan over a saved feature gallery.
+
+    Work is split into tile x tile blocks of the upper triangle, each scored
+    with vectorized NumPy on a process pool, so memory is bounded by the
+    tile size rather than the gallery size.
+    """
+    ids, features = load_features(features_path, mmap_mode='r')
+    n = len(ids)
+    starts = range(0, n, tile)
+    tasks = [(r, c) for r in starts for c in starts if c >= r]
+
+    pairs = []
+    compared = 0
+    done = 0
+    workers = workers or os.cpu_count() or 1
+    pending = set()
+    start = time.perf_counter()
+
+    def collect(finished):
+        nonlocal compared, done
+        for future in finished:
+            tile_compared, tile_pairs = future.result()
+            compared += tile_compared
+            pairs.extend(tile_pairs)
+            done += 1
+            if progress and (done % 100 == 0 or done == len(tasks)):
+                elapsed = time.perf_counter() - start
+                print(f"  {done}/{len(tasks)} tiles, {compared / max(elapsed, 1e-9):,.0f} comparisons/s")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(features_path,)) as pool:
+        # Keep a bounded number of tiles queued so huge galleries don't
+        # materialize every future up front
+        for r, c in tasks:
+            pending.add(pool.submit(_scan_tile, r, c, tile, threshold))
+            if len(pending) >= workers * 4:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+        collect(wait(pending)[0])
+    elapsed = time.perf_counter() - start
+
+    # Comparisons on diagonal tiles include the discarded lower half
+    unique_pairs = n * (n - 1) // 2
+    peak_rss_mb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss +
+                   resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) / 1024
+    return {
+        'gallery_size': int(n),
+        'threshold': threshold,
+        'pairs_compared': unique_pairs,
+        'seconds': round(elapsed, 3),
+        'pairs_per_second': round(unique_pairs / elapsed) if elapsed else None,
+        'peak_rss_mb': round(peak_rss_mb, 1),
+        'suspect_pairs': [{'nid_a': int(ids[i]), 'nid_b': int(ids[j]), 'score': round(score, 6)}
+                          for i, j, score in sorted(pairs, key=lambda p: p[2])],
+        'clusters': _clusters(ids, pairs),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect fingerprints enrolled under more than one NID")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--features", help="Feature gallery directory written by gallery.save_features")
+    source.add_argument("--images", help="Directory of <nid>.bmp images, or a fparchive.py archive, "
+                                         "to extract features from")
+    parser.add_argument("--save-features", help="Keep features extracted from --images in this directory")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--tile", type=int, default=DEFAULT_TILE, help="Rows per tile (memory per task ~ tile^2)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", "-o", default="duplicates.json")
+    args = parser.parse_args()
+
+    features_path = args.features
+    if args.images:
+        features_path = args.save_features or tempfile.mkdtemp(prefix="gallery-")
+        start = time.perf_counter()
+        ids, features = extract_directory(args.images, workers=args.workers)
+        save_features(features_path, ids, features)
+        print(f"Extracted {len(ids)} templates in {time.perf_counter() - start:.1f}s")
+
+    report = find_duplicates(features_path, args.threshold, args.tile, args.workers)
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+
+    print(f"Compared {report['pairs_compared']:,} pairs in {report['seconds']}s "
+          f"({report['pairs_per_second'] or 0:,} pairs/s), peak RSS {report['peak_rss_mb']} MB")
+    print(f"{len(report['suspect_pairs'])} suspect pairs in {len(report['clusters'])} clusters -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
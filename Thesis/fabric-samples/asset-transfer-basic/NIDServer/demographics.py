@@ -0,0 +1,151 @@
+import os
+
+import numpy as np
+
+# Sort key for rows without a usable date_of_birth
+UNKNOWN_YEAR = 0
+
+
+def normalize(value):
+    return str(value).strip().lower() if value not in (None, '') else None
+
+
+def district_of(address):
+    """'Dhaka, Bangladesh' -> 'dhaka'"""
+    if not address:
+        return None
+    return normalize(str(address).split(',')[0])
+
+
+def birth_year_of(date_of_birth):
+    try:
+        return int(str(date_of_birth)[:4])
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_hints(form):
+    """
+    Read prefilter hints from a request form (or dict).
+
+    Returns a dict with only the hints that were given, or raises
+    ValueError for a malformed birth year.
+    """
+    hints = {}
+    for field in ('gender', 'district'):
+        value = normalize(form.get(field))
+        if value:
+            hints[field] = value
+    for field in ('birth_year_min', 'birth_year_max'):
+        value = form.get(field)
+        if value not in (None, ''):
+            try:
+                hints[field] = int(value)
+            except (TypeError, ValueError):
+                raise ValueError(f'{field} must be a year')
+    return hints
+
+
+class DemographicIndex:
+    """
+    Posting lists over the gallery rows, by citizen attribute.
+
+    ``gender`` and ``district`` map each value to a sorted array of gallery
+    row numbers; birth years are kept sorted next to their rows so a year
+    range is two binary searches. Rows whose citizen record lacks an
+    attribute are listed under it as unknown and always stay in the
+    candidate set, so a hint can narrow the search but never hide a
+    gallery entry that might be the right one.
+    """
+
+    def __init__(self, size, postings, years, year_rows, unknown):
+        self.size = size
+        self.postings = postings
+        self.years = years
+        self.year_rows = year_rows
+        self.unknown = unknown
+
+    @classmethod
+    def build(cls, ids, citizens):
+        """Index gallery ``ids`` (row order) using {nid_no: citizen record}"""
+        lists = {'gender': {}, 'district': {}}
+        unknown = {'gender': [], 'district': [], 'birth_year': []}
+        years = []
+        for row, nid in enumerate(ids):
+            citizen = citizens.get(str(nid)) or {}
+            values = {'gender': normalize(citizen.get('gender')),
+                      'district': district_of(citizen.get('address'))}
+            for field, value in values.items():
+                if value is None:
+                    unknown[field].append(row)
+                else:
+                    lists[field].setdefault(value, []).append(row)
+            year = birth_year_of(citizen.get('date_of_birth'))
+            if year is None:
+                unknown['birth_year'].append(row)
+            years.append(UNKNOWN_YEAR if year is None else year)
+
+        years = np.asarray(years, dtype=np.int32)
+        order = np.argsort(years, kind='stable')
+        postings = {field: {value: np.asarray(rows, dtype=np.int64) for value, rows in values.items()}
+                    for field, values in lists.items()}
+        return cls(len(ids), postings, years[order], order.astype(np.int64),
+                   {field: np.asarray(rows, dtype=np.int64) for field, rows in unknown.items()})
+
+    def select(self, hints):
+        """
+        Sorted gallery rows compatible with ``hints``, or None when no
+        hint applies (meaning: scan everything).
+        """
+        selected = None
+
+        def narrow(field, rows):
+            nonlocal selected
+            rows = np.union1d(rows, self.unknown[field])
+            selected = rows if selected is None else np.intersect1d(selected, rows, assume_unique=True)
+
+        for field in ('gender', 'district'):
+            if field in hints:
+                narrow(field, self.postings[field].get(hints[field], np.zeros(0, dtype=np.int64)))
+        if 'birth_year_min' in hints or 'birth_year_max' in hints:
+            # Unknown years sort first as UNKNOWN_YEAR and come back via narrow()
+            low = np.searchsorted(self.years, max(hints.get('birth_year_min', 1), UNKNOWN_YEAR + 1), side='left')
+            high = np.searchsorted(self.years, hints.get('birth_year_max', np.iinfo(np.int32).max), side='right')
+            narrow('birth_year', np.sort(self.year_rows[low:high]))
+        return selected
+
+    def stats(self):
+        return {
+            'rows': self.size,
+            'genders': {value: len(rows) for value, rows in self.postings['gender'].items()},
+            'districts': len(self.postings['district']),
+            'unknown': {field: len(rows) for field, rows in self.unknown.items()},
+        }
+
+    def save(self, path):
+        """Store next to the features cache so a restart skips the rebuild"""
+        arrays = {'size': np.asarray(self.size), 'years': self.years, 'year_rows': self.year_rows}
+        for field, values in self.postings.items():
+            for value, rows in values.items():
+                arrays[f'posting:{field}:{value}'] = rows
+        for field, rows in self.unknown.items():
+            arrays[f'unknown:{field}'] = rows
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        postings = {'gender': {}, 'district': {}}
+        unknown = {}
+        with np.load(path) as data:
+            for key in data.files:
+                kind, _, rest = key.partition(':')
+                if kind == 'posting':
+                    field, _, value = rest.partition(':')
+                    postings[field][value] = data[key]
+                elif kind == 'unknown':
+                    unknown[rest] = data[key]
+            return cls(int(data['size']), postings, data['years'], data['year_rows'], unknown)
+
+
+def index_path(features_cache):
+    return os.path.join(features_cache, 'demographics.npz')
@@ -1,3 +1,6 @@
+import argparse
+import os
+import sys
 import requests
 import random
 from faker import Faker
@@ -8,8 +11,11 @@ from datetime import datetime
 # Initialize Faker for realistic data
 fake = Faker()
 
-# Base URL for the EHR creation endpoint
-BASE_URL = "http://localhost:8000/ehr/create/nid"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from thesis_client import GatewayClient
+
+# Pooled client for the gateway (GATEWAY_URL overrides http://localhost:8000)
+client = GatewayClient()
 
 # Predefined options for randomization
 DIAGNOSIS_OPTIONS = {
@@ -126,7 +132,7 @@ def generate_random_ehr(nid_no):
 def create_ehr(nid_no):
     payload = generate_random_ehr(nid_no)
     try:
-        response = requests.post(BASE_URL, json=payload)
+        response = client.create_ehr(payload)
         if response.status_code in (200, 201):
             print(f"Successfully created EHR for NID {nid_no}: {response.json()}")
         else:
@@ -134,15 +140,45 @@ def create_ehr(nid_no):
     except requests.RequestException as e:
         print(f"Error creating EHR for NID {nid_no}: {e}")
 
+def create_ehr_batch(nid_nos):
+    payloads = [generate_random_ehr(nid_no) for nid_no in nid_nos]
+    label = f"{nid_nos[0]}-{nid_nos[-1]}"
+    try:
+        response = client.create_ehr_batch(payloads)
+        if response.status_code == 200:
+            body = response.json()
+            for result in body["results"]:
+                if result["status"] != 201:
+                    print(f"Failed to create EHR for NID {result['nid_no']}: {result['status']} - {result.get('error')}")
+            print(f"Batch {label}: created {body['created']}, failed {body['failed']}")
+        else:
+            print(f"Failed to create EHR batch {label}: {response.status_code} - {response.text}")
+    except requests.RequestException as e:
+        print(f"Error creating EHR batch {label}: {e}")
+
 def main():
-    start_nid = 5000000001
-    end_nid = 5000000150
+    parser = argparse.ArgumentParser(description="Generate random EHRs through the gateway")
+    parser.add_argument("--start", type=int, default=5000000001, help="First NID")
+    parser.add_argument("--end", type=int, default=5000000150, help="Last NID")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="EHRs per request; above 1 uses /ehr/create/batch")
+    parser.add_argument("--delay", type=float, default=0.5, help="Seconds to wait between requests")
+    args = parser.parse_args()
+    start_nid = args.start
+    end_nid = args.end
     
     print(f"Generating EHRs for NIDs {start_nid} to {end_nid} with 5-6 diseases per patient...")
     
-    for nid in range(start_nid, end_nid + 1):
-        create_ehr(nid)
-        time.sleep(0.5)  # 0.5 seconds delay between requests
+    if args.batch_size > 1:
+        nids = list(range(start_nid, end_nid + 1))
+        for i in range(0, len(nids), args.batch_size):
+            create_ehr_batch(nids[i:i + args.batch_size])
+            time.sleep(args.delay)
+    else:
+        for nid in range(start_nid, end_nid + 1):
+            create_ehr(nid)
+            # Add a small delay to avoid overwhelming the server
+            time.sleep(args.delay)
     
     print("EHR generation complete!")
 
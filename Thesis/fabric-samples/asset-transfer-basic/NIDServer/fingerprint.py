@@ -1,31 +1,57 @@
-from flask import Flask, request, jsonify
-import cv2
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 import numpy as np
-from skimage.feature import local_binary_pattern
 import os
+import sys
+import hmac
 import json
+import math
 import tempfile
+import threading
+import time
+from registry import CitizenRegistry
+from batcher import MatchBatcher
+from admission import DEADLINE_HEADER, AdmissionController, Rejected, request_deadline
+from demographics import DemographicIndex, index_path, parse_hints
+from fparchive import DEFAULT_ARCHIVE, FingerprintArchive, is_archive
+from gallery import (FIRST_ID, LAST_ID, features_source, features_version, load_features, nearest_non_match,
+                     save_features, source_key)
+from fingerprint_template import (TEMPLATE_VERSION, TemplateError, TemplateVersionError, decode_template,
+                                  extract_features, from_text, preprocess_fingerprint)
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from thesis_client.tracing import PARENT_HEADER, TRACE_ENV, TRACE_HEADER, Tracer
+
+# cv2 and skimage are imported inside the functions that use them so the
+# server can bind its port before those (slow) imports finish
 
 app = Flask(__name__)
 
-# Reusing the functions from previous implementation
-def preprocess_fingerprint(image):
-    if len(image.shape) == 3:
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-    image = clahe.apply(image)
-    image = cv2.fastNlMeansDenoising(image)
-    _, image = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-    return image
-
-def extract_features(image):
-    radius = 3
-    n_points = 8 * radius
-    lbp = local_binary_pattern(image, n_points, radius, method='uniform')
-    hist, _ = np.histogram(lbp.ravel(), bins=np.arange(0, n_points + 3), range=(0, n_points + 2))
-    hist = hist.astype("float")
-    hist /= (hist.sum() + 1e-7)
-    return hist
+# Spans for each request and /match stage, joined to the caller's trace via
+# X-Trace-Id / X-Parent-Span-Id; written when THESIS_TRACE names a file
+tracer = Tracer('nid-server', os.environ.get(TRACE_ENV))
+
+@app.before_request
+def start_request_span():
+    g.span = tracer.start(f"{request.method} {request.path}",
+                          request.headers.get(TRACE_HEADER), request.headers.get(PARENT_HEADER))
+
+@app.after_request
+def finish_request_span(response):
+    span = g.pop('span', None)
+    if span is not None:
+        response.headers[TRACE_HEADER] = span.trace_id
+        span.finish(status=response.status_code)
+    return response
+
+@app.teardown_request
+def abandon_request_span(error=None):
+    # Only reached with a span still open when the view raised
+    span = g.pop('span', None)
+    if span is not None:
+        span.finish(status=500, error=type(error).__name__ if error else None)
+
+# preprocess_fingerprint / extract_features live in fingerprint_template so
+# clients can build the same templates locally and use /match/template
 
 # Load citizen data
 def load_citizens():
@@ -33,39 +59,282 @@ def load_citizens():
     with open(file_path, 'r', encoding='utf-8') as file:
         return json.load(file)
 
+# Disk-backed registry, used instead of citizens.json once it has been imported
+CITIZENS_DB = os.environ.get('CITIZENS_DB', os.path.join(os.path.dirname(__file__), 'citizens.db'))
+_registry = None
+
+def get_registry():
+    global _registry
+    if _registry is None and os.path.exists(CITIZENS_DB):
+        _registry = CitizenRegistry(CITIZENS_DB)
+    return _registry
+
+def find_citizen(nid_no):
+    registry = get_registry()
+    if registry is not None:
+        return registry.get(nid_no)
+    return next((c for c in load_citizens() if c['nid_no'] == str(nid_no)), None)
+
+def find_citizens(nid_nos):
+    """Return {nid_no: citizen} for the NIDs that exist"""
+    registry = get_registry()
+    if registry is not None:
+        return registry.get_many(nid_nos)
+    wanted = set(nid_nos)
+    return {c['nid_no']: c for c in load_citizens() if c['nid_no'] in wanted}
+
+# Upper bound on NIDs accepted by a single /nid/batch request
+MAX_BATCH_NIDS = 10000
+
+def project_citizen(citizen, fields=None):
+    """Return only the requested columns of a citizen record"""
+    if not fields:
+        return citizen
+    return {field: citizen[field] for field in fields if field in citizen}
+
 # Global variable to store fingerprint database
 fingerprint_database = {}
 
-def load_database(database_path, start_id=5000000001, end_id=5000000150):
-    """Load fingerprint database at server startup"""
-    global fingerprint_database
-    for fingerprint_id in range(start_id, end_id + 1):
-        image_path = os.path.join(database_path, f"{fingerprint_id}.bmp")
-        if os.path.exists(image_path):
-            image = cv2.imread(image_path)
-            if image is not None:
-                processed_image = preprocess_fingerprint(image)
-                features = extract_features(processed_image)
-                fingerprint_database[fingerprint_id] = features
+# Concurrent /match probes are scored together; raise the batch size for
+# throughput or lower the wait for single-request latency
+MATCH_BATCH_SIZE = int(os.environ.get('MATCH_BATCH_SIZE', 32))
+MATCH_MAX_WAIT_MS = float(os.environ.get('MATCH_MAX_WAIT_MS', 2.0))
+match_batcher = None
+
+# POST /admin/tuning changes the batching and admission limits live; it is
+# disabled unless NID_ADMIN_TOKEN is set, and callers send it as
+# "Authorization: Bearer <token>"
+NID_ADMIN_TOKEN = os.environ.get('NID_ADMIN_TOKEN')
+TUNING_FIELDS = ('max_batch', 'max_wait_ms', 'max_in_flight', 'max_queue')
+
+# Admission control for /match and /match/template: requests beyond
+# ADMISSION_MAX_IN_FLIGHT running plus ADMISSION_MAX_QUEUE waiting get 429
+# with Retry-After, and work is dropped once the caller's X-Request-Timeout-Ms
+# budget (MATCH_DEADLINE_MS when absent) has run out. Admitted requests are
+# what feeds the batcher, so the default cap never drops below
+# MATCH_BATCH_SIZE; a lower cap means no batch can fill and every flush
+# waits out MATCH_MAX_WAIT_MS
+ADMISSION_MAX_IN_FLIGHT = int(os.environ.get('ADMISSION_MAX_IN_FLIGHT', max(os.cpu_count() or 4, MATCH_BATCH_SIZE)))
+ADMISSION_MAX_QUEUE = int(os.environ.get('ADMISSION_MAX_QUEUE', 4 * ADMISSION_MAX_IN_FLIGHT))
+MATCH_DEADLINE_MS = float(os.environ.get('MATCH_DEADLINE_MS', 30000))
+admission = AdmissionController(ADMISSION_MAX_IN_FLIGHT, ADMISSION_MAX_QUEUE)
+# Gender / district / birth-year posting lists over the gallery rows, used
+# to narrow /match when the caller sends hints
+demographic_index = None
+# Hints come from the caller and may be wrong. The best hit among the hinted
+# rows is only trusted without a full scan when it is closer than
+# HINT_ACCEPT_MARGIN times the distance between the two most similar
+# different prints in the gallery; anything else is checked against every row
+HINT_ACCEPT_MARGIN = float(os.environ.get('HINT_ACCEPT_MARGIN', 0.5))
+hint_accept_distance = 0.0
+
+# Background gallery load progress reported by /readyz
+gallery_state = {'status': 'starting', 'loaded': 0, 'total': None, 'source': None,
+                 'error': None, 'started_at': None, 'ready_at': None,
+                 'template_version': TEMPLATE_VERSION}
+
+def load_database(database_path, start_id=None, end_id=None, features_cache=None):
+    """
+    Load fingerprint database at server startup.
+
+    Archives load every NID they hold and directories FIRST_ID..LAST_ID,
+    unless ``start_id`` / ``end_id`` narrow the range. With
+    ``features_cache`` (a gallery.save_features directory) templates are
+    read from it when it was extracted from the same images, range and
+    template version, memory-mapped, instead of re-extracting every image;
+    otherwise they are extracted and written there for the next start. The
+    demographic index is cached there as well.
+    """
+    global fingerprint_database, match_batcher, demographic_index, hint_accept_distance
+    import cv2
+    gallery_state.update(status='loading', loaded=0, started_at=time.time(), source=database_path)
+    fingerprint_database = {}
+    archive = is_archive(database_path)
+    if not archive:
+        start_id = FIRST_ID if start_id is None else start_id
+        end_id = LAST_ID if end_id is None else end_id
+    source = source_key(database_path, start_id, end_id)
+    low = -np.inf if start_id is None else start_id
+    high = np.inf if end_id is None else end_id
+
+    # A cache from other images, another NID range or another template
+    # version would serve the wrong gallery, so it is rebuilt rather than used
+    if (features_cache and os.path.exists(os.path.join(features_cache, 'features.npy'))
+            and features_version(features_cache) == TEMPLATE_VERSION
+            and features_source(features_cache) == source):
+        ids, features = load_features(features_cache, mmap_mode='r')
+        gallery_state.update(total=len(ids), loaded=len(ids), source=features_cache)
+        fingerprint_database = dict(zip(ids.tolist(), features))
+    elif archive:
+        # One sequential pass over the packed archive instead of a stat and
+        # open per NID
+        with FingerprintArchive(database_path) as archive:
+            ids = archive.ids()
+            gallery_state['total'] = int(((ids >= low) & (ids <= high)).sum())
+            for fingerprint_id, data in archive.iter_images():
+                if low <= fingerprint_id <= high:
+                    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+                    if image is not None:
+                        fingerprint_database[fingerprint_id] = extract_features(preprocess_fingerprint(image))
+                    gallery_state['loaded'] += 1
+    else:
+        gallery_state['total'] = end_id - start_id + 1
+        for fingerprint_id in range(start_id, end_id + 1):
+            image_path = os.path.join(database_path, f"{fingerprint_id}.bmp")
+            if os.path.exists(image_path):
+                image = cv2.imread(image_path)
+                if image is not None:
+                    processed_image = preprocess_fingerprint(image)
+                    features = extract_features(processed_image)
+                    fingerprint_database[fingerprint_id] = features
+            gallery_state['loaded'] += 1
+
+    ids = list(fingerprint_database)
+    features = np.vstack([fingerprint_database[i] for i in ids]) if ids else np.zeros((0, 26))
+    if features_cache and gallery_state['source'] != features_cache and ids:
+        save_features(features_cache, ids, features, source=source)
+    demographic_index = load_demographic_index(ids, features_cache)
+    hint_accept_distance = HINT_ACCEPT_MARGIN * (nearest_non_match(features) or 0.0)
+    match_batcher = MatchBatcher(ids, features, MATCH_BATCH_SIZE, MATCH_MAX_WAIT_MS)
+    gallery_state.update(status='ready', ready_at=time.time())
     print(f"Loaded {len(fingerprint_database)} fingerprints into database")
 
-def match_fingerprint(query_features, threshold=0.3):
-    """Match fingerprint features against database"""
-    best_score = float('inf')
-    best_match_id = None
+def load_demographic_index(ids, features_cache=None):
+    """Build the prefilter index for gallery ``ids``, or reuse the cached one"""
+    cached = index_path(features_cache) if features_cache else None
+    if cached and gallery_state['source'] == features_cache and os.path.exists(cached):
+        index = DemographicIndex.load(cached)
+        if index.size == len(ids):
+            return index
+    index = DemographicIndex.build(ids, find_citizens([str(i) for i in ids]))
+    if cached and ids:
+        index.save(cached)
+    return index
+
+def load_database_in_background(database_path, **kwargs):
+    """Start load_database on a daemon thread so the port can open right away"""
+    def run():
+        try:
+            load_database(database_path, **kwargs)
+        except Exception as e:
+            gallery_state.update(status='failed', error=str(e))
+            print(f"Failed to load fingerprint database: {e}")
+    thread = threading.Thread(target=run, name='gallery-loader', daemon=True)
+    thread.start()
+    return thread
+
+def retry_after_seconds():
+    """Estimate how long until the gallery is loaded, from progress so far"""
+    loaded, total, started = gallery_state['loaded'], gallery_state['total'], gallery_state['started_at']
+    if not (loaded and total and started):
+        return 5
+    remaining = (time.time() - started) / loaded * max(total - loaded, 0)
+    return min(60, max(1, math.ceil(remaining)))
+
+def not_ready_response():
+    response = jsonify({'error': 'Fingerprint database is still loading', 'gallery': gallery_state})
+    response.status_code = 503
+    if gallery_state['status'] != 'failed':
+        response.headers['Retry-After'] = str(retry_after_seconds())
+    return response
 
-    for fingerprint_id, db_features in fingerprint_database.items():
-        score = cv2.compareHist(query_features.astype(np.float32), 
-                                db_features.astype(np.float32), 
-                                cv2.HISTCMP_CHISQR)
-        if score < best_score:
-            best_score = score
-            best_match_id = fingerprint_id
+def shed_response(rejected):
+    if rejected.reason == 'queue_full':
+        message = 'Server is at capacity, retry later'
+    else:
+        message = 'Request deadline passed before it could be served'
+    response = jsonify({'error': message, 'reason': rejected.reason})
+    response.status_code = rejected.status
+    if rejected.retry_after is not None:
+        response.headers['Retry-After'] = str(rejected.retry_after)
+    return response
+
+def match_fingerprint(query_features, threshold=0.3, hints=None):
+    """
+    Match fingerprint features against database.
+
+    With demographic ``hints`` the gallery rows they allow are scored
+    first, and their best hit is returned only when it scores under
+    hint_accept_distance. Otherwise the whole gallery is scanned as a
+    fallback, so a wrong hint can't return another citizen. Returns
+    (match_id, search) where ``search`` says how many rows were scored
+    first and whether the fallback ran.
+    """
+    if match_batcher is None:
+        return None, None
+    rows = demographic_index.select(hints) if hints and demographic_index is not None else None
+    if rows is None:
+        return match_batcher.match(query_features, threshold), {'candidates': len(match_batcher.ids),
+                                                                'fallback': False}
+    search = {'candidates': int(len(rows)), 'fallback': False}
+    if len(rows):
+        best_id, best_score = match_batcher.submit(query_features, rows).result(timeout=30)
+        if best_score < min(hint_accept_distance, threshold):
+            return best_id, search
+    search['fallback'] = True
+    return match_batcher.match(query_features, threshold), search
+
+def identify(query_features, hints):
+    """Match features and build the /match response body"""
+    with tracer.span('match', hints=sorted(hints)) as span:
+        match_id, search = match_fingerprint(query_features, hints=hints)
+        span.attrs.update(search or {})
+
+    if match_id:
+        # Fetch citizen data using matched fingerprint ID
+        with tracer.span('citizen_lookup'):
+            citizen = find_citizen(match_id)
+
+        if citizen:
+            return jsonify({
+                'match_found': True,
+                'nid_no': match_id,
+                'citizen_data': citizen,
+                'search': search
+            })
+        else:
+            return jsonify({
+                'match_found': True,
+                'nid_no': match_id,
+                'citizen_data': 'Citizen data not found',
+                'search': search
+            })
+    else:
+        return jsonify({
+            'match_found': False,
+            'nid_no': None,
+            'citizen_data': None,
+            'search': search
+        })
 
-    return best_match_id if best_score < threshold else None
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness: the process is up and serving requests"""
+    return jsonify({'status': 'alive'})
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness: 200 once the gallery is loaded, 503 with progress before that"""
+    if gallery_state['status'] != 'ready':
+        return not_ready_response()
+    return jsonify({'status': 'ready', 'gallery': gallery_state})
 
 @app.route('/match', methods=['POST'])
 def match_endpoint():
+    if match_batcher is None:
+        return not_ready_response()
+
+    # Shed before reading the upload so an overloaded server answers fast
+    deadline = request_deadline(request.headers.get(DEADLINE_HEADER), MATCH_DEADLINE_MS)
+    try:
+        with admission.slot(deadline) as waited:
+            g.span.attrs['queue_wait'] = round(waited, 6)
+            return match_image(deadline)
+    except Rejected as e:
+        return shed_response(e)
+
+def match_image(deadline):
+    import cv2
     if 'image' not in request.files:
         return jsonify({'error': 'No image provided'}), 400
 
@@ -73,46 +342,82 @@ def match_endpoint():
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
 
+    # Optional prefilter: gender, birth_year_min, birth_year_max, district
+    try:
+        hints = parse_hints(request.form)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
     try:
         # Save uploaded file temporarily
         with tempfile.NamedTemporaryFile(suffix='.bmp', delete=False) as temp_file:
-            file.save(temp_file.name)
-            query_image = cv2.imread(temp_file.name)
+            with tracer.span('decode'):
+                file.save(temp_file.name)
+                query_image = cv2.imread(temp_file.name)
+            os.unlink(temp_file.name)
             if query_image is None:
                 return jsonify({'error': 'Invalid image file'}), 400
 
-            # Process and match fingerprint
-            processed_query = preprocess_fingerprint(query_image)
-            query_features = extract_features(processed_query)
-            match_id = match_fingerprint(query_features)
+            # Process and match fingerprint, dropping the probe between
+            # stages once its caller has given up
+            if admission.expired(deadline):
+                return shed_response(Rejected('deadline', 503))
+            with tracer.span('preprocess'):
+                processed_query = preprocess_fingerprint(query_image)
+            with tracer.span('extract'):
+                query_features = extract_features(processed_query)
+            if admission.expired(deadline):
+                return shed_response(Rejected('deadline', 503))
 
-            # Clean up temporary file
-            os.unlink(temp_file.name)
+            return identify(query_features, hints)
 
-            if match_id:
-                # Fetch citizen data using matched fingerprint ID
-                citizens = load_citizens()
-                citizen = next((c for c in citizens if c['nid_no'] == str(match_id)), None)
-
-                if citizen:
-                    return jsonify({
-                        'match_found': True,
-                        'nid_no': match_id,
-                        'citizen_data': citizen
-                    })
-                else:
-                    return jsonify({
-                        'match_found': True,
-                        'nid_no': match_id,
-                        'citizen_data': 'Citizen data not found'
-                    })
-            else:
-                return jsonify({
-                    'match_found': False,
-                    'nid_no': None,
-                    'citizen_data': None
-                })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/match/template', methods=['POST'])
+def match_template_endpoint():
+    """
+    Identify from a fingerprint_template instead of an image, so the server
+    only scores. Send the template bytes as application/octet-stream (hints
+    in the query string) or JSON {"template": "<base64>", hints...}.
+    """
+    if match_batcher is None:
+        return not_ready_response()
+
+    deadline = request_deadline(request.headers.get(DEADLINE_HEADER), MATCH_DEADLINE_MS)
+    try:
+        with admission.slot(deadline) as waited:
+            g.span.attrs['queue_wait'] = round(waited, 6)
+            return match_template()
+    except Rejected as e:
+        return shed_response(e)
+
+def match_template():
+    if request.mimetype == 'application/octet-stream':
+        data, fields = request.get_data(), request.args
+    else:
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict) or not isinstance(body.get('template'), str):
+            return jsonify({'error': 'Expected a template as octet-stream or JSON {"template": base64}'}), 400
+        fields = body
+        try:
+            data = from_text(body['template'])
+        except TemplateError as e:
+            return jsonify({'error': str(e)}), 400
 
+    try:
+        hints = parse_hints(fields)
+        with tracer.span('decode_template'):
+            query_features = decode_template(data)
+    except TemplateVersionError as e:
+        # Scoring it against this gallery would give meaningless distances
+        return jsonify({'error': str(e), 'template_version': e.version,
+                        'expected_version': TEMPLATE_VERSION}), 409
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        return identify(query_features, hints)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -124,15 +429,109 @@ def get_citizen_by_nid():
     if not nid_no:
         return jsonify({'error': 'No NID number provided'}), 400
 
-    citizens = load_citizens()
-    citizen = next((c for c in citizens if c['nid_no'] == nid_no), None)
+    citizen = find_citizen(nid_no)
 
     if citizen:
         return jsonify({'nid_no': nid_no, 'citizen_data': citizen})
     else:
         return jsonify({'error': 'Citizen not found'}), 404
 
+@app.route('/nid/batch', methods=['POST'])
+def get_citizens_by_nid_batch():
+    """Resolve many NIDs in one round trip.
+
+    Accepts either a JSON list of NIDs or an object of the form
+    {"nid_nos": [...], "fields": [...]}. Fields may also be passed as a
+    comma separated ``fields`` query parameter. The response is streamed as
+    {"found": {nid: record, ...}, "missing": [nid, ...]}.
+    """
+    data = request.get_json(silent=True)
+    fields = None
+    if isinstance(data, dict):
+        nid_nos = data.get('nid_nos')
+        fields = data.get('fields')
+    else:
+        nid_nos = data
+    if fields is None and request.args.get('fields'):
+        fields = request.args.get('fields').split(',')
+
+    if not isinstance(nid_nos, list) or not nid_nos:
+        return jsonify({'error': 'Expected a non-empty JSON list of NID numbers'}), 400
+    if len(nid_nos) > MAX_BATCH_NIDS:
+        return jsonify({'error': f'At most {MAX_BATCH_NIDS} NID numbers per request'}), 413
+    if fields is not None and (not isinstance(fields, list) or not all(isinstance(f, str) for f in fields)):
+        return jsonify({'error': 'fields must be a list of column names'}), 400
+    for index, nid_no in enumerate(nid_nos):
+        if not isinstance(nid_no, str) or not nid_no.strip():
+            return jsonify({'error': f'NID number at index {index} must be a non-empty string',
+                            'nid_no': nid_no}), 400
+
+    # Deduplicate while keeping the caller's order
+    nid_nos = list(dict.fromkeys(nid_no.strip() for nid_no in nid_nos))
+    citizens_by_nid = find_citizens(nid_nos)
+
+    def generate():
+        missing = []
+        first = True
+        yield '{"found": {'
+        for nid_no in nid_nos:
+            citizen = citizens_by_nid.get(nid_no)
+            if citizen is None:
+                missing.append(nid_no)
+                continue
+            prefix = '' if first else ', '
+            first = False
+            yield f'{prefix}{json.dumps(nid_no)}: {json.dumps(project_citizen(citizen, fields), ensure_ascii=False)}'
+        yield '}, "missing": ' + json.dumps(missing) + '}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Matcher batching and admission statistics (read-only; see /admin/tuning)"""
+    if match_batcher is None:
+        return not_ready_response()
+    return jsonify({'match_batcher': match_batcher.metrics(),
+                    'admission': admission.metrics(),
+                    'demographic_index': demographic_index.stats() if demographic_index else None,
+                    'hint_accept_distance': hint_accept_distance})
+
+@app.route('/admin/tuning', methods=['POST'])
+def tuning_endpoint():
+    """Retune matcher batching and admission limits live from a JSON object of TUNING_FIELDS"""
+    if not NID_ADMIN_TOKEN:
+        return jsonify({'error': 'Tuning is disabled; set NID_ADMIN_TOKEN to enable it'}), 403
+    supplied = request.headers.get('Authorization', '').encode()
+    if not hmac.compare_digest(supplied, f'Bearer {NID_ADMIN_TOKEN}'.encode()):
+        return jsonify({'error': 'Missing or invalid admin token'}), 401
+    if match_batcher is None:
+        return not_ready_response()
+
+    settings = request.get_json(silent=True)
+    if not isinstance(settings, dict) or not settings:
+        return jsonify({'error': 'Send a JSON object of settings', 'allowed': TUNING_FIELDS}), 400
+    unknown = sorted(set(settings) - set(TUNING_FIELDS))
+    if unknown:
+        return jsonify({'error': f"Unknown settings: {', '.join(unknown)}", 'allowed': TUNING_FIELDS}), 400
+    invalid = [name for name, value in settings.items()
+               if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value)]
+    if invalid:
+        return jsonify({'error': f"Settings must be numeric: {', '.join(invalid)}"}), 400
+
+    match_batcher.configure(settings.get('max_batch'), settings.get('max_wait_ms'))
+    admission.configure(settings.get('max_in_flight'), settings.get('max_queue'))
+    return jsonify({'match_batcher': match_batcher.metrics(), 'admission': admission.metrics()})
+
 if __name__ == '__main__':
-    DATABASE_PATH = "./fingerprints_raw"  # Update this path
-    load_database(DATABASE_PATH)
-    app.run(host='0.0.0.0', port=15000)
+    # Prefer the packed archive (fparchive.py pack fingerprints_raw) when present
+    DATABASE_PATH = os.environ.get('FINGERPRINT_DB') or (
+        DEFAULT_ARCHIVE if os.path.exists(DEFAULT_ARCHIVE) else "./fingerprints_raw")
+    # Templates extracted on the first start are reused by later ones
+    FEATURES_CACHE = os.environ.get('FINGERPRINT_FEATURES') or None
+    # Optional NID range; by default an archive (e.g. a synth_prints.py
+    # gallery) is served whole and a directory as FIRST_ID..LAST_ID
+    FIRST_NID = int(os.environ['FINGERPRINT_FIRST_ID']) if os.environ.get('FINGERPRINT_FIRST_ID') else None
+    LAST_NID = int(os.environ['FINGERPRINT_LAST_ID']) if os.environ.get('FINGERPRINT_LAST_ID') else None
+    load_database_in_background(DATABASE_PATH, start_id=FIRST_NID, end_id=LAST_NID,
+                                features_cache=FEATURES_CACHE)
+    app.run(host='0.0.0.0', port=15000, threaded=True)
@@ -0,0 +1,154 @@
+import argparse
+import base64
+import os
+import struct
+import sys
+
+import numpy as np
+
+# Wire format: header | BINS little-endian float32 LBP histogram bins
+#   header  MAGIC, version u16, bin count u16
+# Bump TEMPLATE_VERSION whenever preprocess_fingerprint or extract_features
+# change what they produce; servers refuse templates from another version
+# because they would be scored against a gallery built differently.
+MAGIC = b'FPTM'
+TEMPLATE_VERSION = 1
+HEADER = struct.Struct('<4sHH')
+LBP_RADIUS = 3
+LBP_POINTS = 8 * LBP_RADIUS
+BINS = LBP_POINTS + 2
+TEMPLATE_SIZE = HEADER.size + BINS * 4
+
+
+class TemplateError(ValueError):
+    """The bytes are not a fingerprint template"""
+
+
+class TemplateVersionError(TemplateError):
+    """A well-formed template from a different extraction pipeline"""
+
+    def __init__(self, version):
+        super().__init__(f"Template version {version} does not match version {TEMPLATE_VERSION}")
+        self.version = version
+
+
+def preprocess_fingerprint(image):
+    import cv2
+    if len(image.shape) == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    image = clahe.apply(image)
+    image = cv2.fastNlMeansDenoising(image)
+    _, image = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return image
+
+
+def extract_features(image):
+    from skimage.feature import local_binary_pattern
+    lbp = local_binary_pattern(image, LBP_POINTS, LBP_RADIUS, method='uniform')
+    hist, _ = np.histogram(lbp.ravel(), bins=np.arange(0, LBP_POINTS + 3), range=(0, LBP_POINTS + 2))
+    hist = hist.astype("float")
+    hist /= (hist.sum() + 1e-7)
+    return hist
+
+
+def encode_template(features):
+    """Pack a feature vector into TEMPLATE_SIZE bytes"""
+    features = np.asarray(features, dtype='<f4').ravel()
+    if features.shape != (BINS,):
+        raise TemplateError(f"Expected {BINS} features, got {features.size}")
+    return HEADER.pack(MAGIC, TEMPLATE_VERSION, BINS) + features.tobytes()
+
+
+def decode_template(data):
+    """
+    Feature vector (float64) from template bytes. Raises TemplateError for
+    malformed input and TemplateVersionError for another version.
+    """
+    if len(data) < HEADER.size:
+        raise TemplateError("Template is too short")
+    magic, version, bins = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise TemplateError("Not a fingerprint template")
+    if version != TEMPLATE_VERSION:
+        raise TemplateVersionError(version)
+    if bins != BINS or len(data) != HEADER.size + bins * 4:
+        raise TemplateError(f"Expected {BINS} bins in {TEMPLATE_SIZE} bytes")
+    features = np.frombuffer(data, dtype='<f4', count=bins, offset=HEADER.size).astype(np.float64)
+    if not np.all(np.isfinite(features)) or np.any(features < 0):
+        raise TemplateError("Template holds invalid histogram values")
+    return features
+
+
+def template_from_image(image):
+    """Template for a decoded image (as cv2.imread returns it)"""
+    return encode_template(extract_features(preprocess_fingerprint(image)))
+
+
+def template_from_bytes(data):
+    """Template for encoded image file bytes (BMP, PNG, ...)"""
+    import cv2
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise TemplateError("Could not decode image")
+    return template_from_image(image)
+
+
+def template_from_file(path):
+    with open(path, 'rb') as file:
+        return template_from_bytes(file.read())
+
+
+def to_text(template):
+    """base64 form for JSON bodies"""
+    return base64.b64encode(template).decode('ascii')
+
+
+def from_text(text):
+    try:
+        return base64.b64decode(text, validate=True)
+    except (ValueError, TypeError):
+        raise TemplateError("Template is not valid base64")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract fingerprint templates locally and match them")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    extract_parser = subparsers.add_parser('extract', help='Write <image>.fpt templates')
+    extract_parser.add_argument('images', nargs='+')
+    extract_parser.add_argument('--output-dir', '-o', help='Defaults to next to each image')
+
+    match_parser = subparsers.add_parser('match', help='Identify an image or template via /match/template')
+    match_parser.add_argument('probe', help='Image file, or a .fpt template')
+    match_parser.add_argument('--nid-server-url', default=None)
+    for hint in ('gender', 'district', 'birth_year_min', 'birth_year_max'):
+        match_parser.add_argument(f"--{hint.replace('_', '-')}", dest=hint)
+
+    args = parser.parse_args()
+
+    if args.command == 'extract':
+        for path in args.images:
+            template = template_from_file(path)
+            name = os.path.splitext(os.path.basename(path))[0] + '.fpt'
+            output = os.path.join(args.output_dir or os.path.dirname(path), name)
+            with open(output, 'wb') as file:
+                file.write(template)
+            print(f"{path} -> {output} ({len(template)} bytes, v{TEMPLATE_VERSION})")
+    else:
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+        from thesis_client import NID_SERVER_URL, NIDClient
+        if args.probe.endswith('.fpt'):
+            with open(args.probe, 'rb') as file:
+                template = file.read()
+        else:
+            template = template_from_file(args.probe)
+        hints = {hint: getattr(args, hint) for hint in ('gender', 'district', 'birth_year_min', 'birth_year_max')
+                 if getattr(args, hint)}
+        with NIDClient(args.nid_server_url or NID_SERVER_URL) as client:
+            response = client.match_template(template, **hints)
+        print(f"Status {response.status_code}: {response.text.strip()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+import argparse
+import mmap
+import os
+import struct
+import time
+import zlib
+
+import numpy as np
+
+# Layout: header | image blobs ... | index
+#   header  MAGIC, version u16, flags u16, index_offset u64, count u64
+#   index   INDEX_DTYPE rows sorted by NID (binary searched in place)
+MAGIC = b'FPAR'
+VERSION = 1
+HEADER = struct.Struct('<4sHHQQ')
+INDEX_DTYPE = np.dtype([('nid', '<u8'), ('offset', '<u8'), ('length', '<u4'),
+                        ('raw_length', '<u4'), ('crc32', '<u4'), ('codec', 'u1'), ('pad', 'V3')])
+CODEC_RAW = 0
+CODEC_ZLIB = 1
+DEFAULT_ARCHIVE = 'fingerprints.fpa'
+
+
+class ArchiveWriter:
+    """
+    Stream images into a new archive.
+
+    Blobs are appended in the order added, so a later sequential scan reads
+    the file front to back; the NID index is written once at close. With
+    ``compress`` each image is zlib-compressed (lossless, the original file
+    bytes come back on read) unless that doesn't make it smaller.
+    """
+
+    def __init__(self, path, compress=True, level=6):
+        self.path = path
+        self.compress = compress
+        self.level = level
+        self._tmp_path = path + '.tmp'
+        self._file = open(self._tmp_path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION, 0, 0, 0))
+        self._rows = []
+        self._seen = set()
+
+    def add(self, nid, data):
+        nid = int(nid)
+        if nid in self._seen:
+            raise ValueError(f"NID {nid} is already in the archive")
+        self._seen.add(nid)
+        codec, blob = CODEC_RAW, data
+        if self.compress:
+            packed = zlib.compress(data, self.level)
+            if len(packed) < len(data):
+                codec, blob = CODEC_ZLIB, packed
+        offset = self._file.tell()
+        self._file.write(blob)
+        self._rows.append((nid, offset, len(blob), len(data), zlib.crc32(data), codec, b''))
+
+    def close(self):
+        if self._file.closed:
+            return
+        index = np.array(self._rows, dtype=INDEX_DTYPE)
+        index.sort(order='nid')
+        index_offset = self._file.tell()
+        self._file.write(index.tobytes())
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, VERSION, 0, index_offset, len(index)))
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        self._file.close()
+        os.unlink(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class FingerprintArchive:
+    """
+    Read-only, memory-mapped view of an archive.
+
+    ``get`` does a binary search over the mapped index and slices the blob
+    straight out of the page cache, so a lookup costs no open/stat calls.
+    ``iter_images`` walks blobs in file order for bulk enrollment.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, index_offset, count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a fingerprint archive")
+        if version != VERSION:
+            raise ValueError(f"{path}: unsupported archive version {version}")
+        self.index = np.frombuffer(self._mmap, dtype=INDEX_DTYPE, count=count, offset=index_offset)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, nid):
+        return self._find(nid) is not None
+
+    def ids(self):
+        return self.index['nid']
+
+    def _find(self, nid):
+        nid = int(nid)
+        position = np.searchsorted(self.index['nid'], nid)
+        if position < len(self.index) and self.index['nid'][position] == nid:
+            return self.index[position]
+        return None
+
+    def _decode(self, row, verify=False):
+        start = int(row['offset'])
+        blob = self._mmap[start:start + int(row['length'])]
+        data = zlib.decompress(blob) if row['codec'] == CODEC_ZLIB else blob
+        if verify and zlib.crc32(data) != row['crc32']:
+            raise ValueError(f"NID {int(row['nid'])}: checksum mismatch")
+        return data
+
+    def get(self, nid, verify=False):
+        """Original image file bytes for a NID, or None"""
+        row = self._find(nid)
+        return None if row is None else self._decode(row, verify)
+
+    def image(self, nid):
+        """Decoded image (as cv2.imread would return it), or None"""
+        import cv2
+        data = self.get(nid)
+        if data is None:
+            return None
+        return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+    def iter_images(self, verify=False):
+        """Yield (nid, bytes) in on-disk order using sequential reads"""
+        if hasattr(self._mmap, 'madvise'):
+            self._mmap.madvise(mmap.MADV_SEQUENTIAL)
+        for position in np.argsort(self.index['offset'], kind='stable'):
+            row = self.index[position]
+            yield int(row['nid']), self._decode(row, verify)
+
+    def close(self):
+        self.index = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Rows handed out by _find still view the map; it is freed with them
+            pass
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def is_archive(path):
+    if not os.path.isfile(path):
+        return False
+    with open(path, 'rb') as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def pack_directory(directory, archive_path, compress=True, level=6, extension='.bmp'):
+    """Pack every <nid><extension> file in a directory, in NID order"""
+    names = sorted(name for name in os.listdir(directory)
+                   if name.endswith(extension) and name[:-len(extension)].isdigit())
+    with ArchiveWriter(archive_path, compress, level) as writer:
+        for name in names:
+            with open(os.path.join(directory, name), 'rb') as file:
+                writer.add(int(name[:-len(extension)]), file.read())
+    return len(names)
+
+
+def unpack_archive(archive_path, directory, extension='.bmp'):
+    os.makedirs(directory, exist_ok=True)
+    count = 0
+    with FingerprintArchive(archive_path) as archive:
+        for nid, data in archive.iter_images(verify=True):
+            with open(os.path.join(directory, f"{nid}{extension}"), 'wb') as file:
+                file.write(data)
+            count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack fingerprint images into a single indexed archive")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    pack_parser = subparsers.add_parser('pack', help='Pack a directory of <nid>.bmp files')
+    pack_parser.add_argument('directory')
+    pack_parser.add_argument('--output', '-o', default=DEFAULT_ARCHIVE)
+    pack_parser.add_argument('--no-compress', action='store_true', help='Store images uncompressed')
+    pack_parser.add_argument('--level', type=int, default=6, help='zlib level 1-9')
+
+    unpack_parser = subparsers.add_parser('unpack', help='Restore <nid>.bmp files from an archive')
+    unpack_parser.add_argument('archive')
+    unpack_parser.add_argument('directory')
+
+    info_parser = subparsers.add_parser('info', help='Summarize an archive and verify checksums')
+    info_parser.add_argument('archive')
+    info_parser.add_argument('--verify', action='store_true')
+
+    args = parser.parse_args()
+    start = time.perf_counter()
+
+    if args.command == 'pack':
+        count = pack_directory(args.directory, args.output, not args.no_compress, args.level)
+        print(f"Packed {count} images into {args.output} ({os.path.getsize(args.output) / 1e6:.1f} MB) "
+              f"in {time.perf_counter() - start:.2f}s")
+    elif args.command == 'unpack':
+        count = unpack_archive(args.archive, args.directory)
+        print(f"Unpacked {count} images into {args.directory} in {time.perf_counter() - start:.2f}s")
+    else:
+        with FingerprintArchive(args.archive) as archive:
+            index = archive.index
+            raw = int(index['raw_length'].sum())
+            stored = int(index['length'].sum())
+            print(f"{args.archive}: {len(archive)} images, NIDs {index['nid'].min() if len(index) else '-'}"
+                  f"-{index['nid'].max() if len(index) else '-'}")
+            print(f"  {raw / 1e6:.1f} MB raw, {stored / 1e6:.1f} MB stored "
+                  f"({stored / raw if raw else 1:.2%}), {int((index['codec'] == CODEC_ZLIB).sum())} compressed")
+            if args.verify:
+                count = sum(1 for _ in archive.iter_images(verify=True))
+                print(f"  Verified {count} checksums in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from fingerprint_template import TEMPLATE_VERSION
+
+FIRST_ID = 5000000001
+LAST_ID = 5000000150
+
+
+def chisqr_distances(probes, gallery):
+    """
+    Chi-square distance of every probe against every gallery row.
+
+    Matches cv2.compareHist(probe, row, cv2.HISTCMP_CHISQR), which sums
+    (p - g)^2 / p over the bins where p != 0. Expanding the square turns
+    that into two matrix products, so an (m x d) probe block against an
+    (n x d) gallery block costs two BLAS calls instead of m * n Python
+    calls. Returns an (m x n) float64 matrix.
+    """
+    probes = np.atleast_2d(np.asarray(probes, dtype=np.float64))
+    gallery = np.atleast_2d(np.asarray(gallery, dtype=np.float64))
+    nonzero = probes != 0
+    inverse = np.divide(1.0, probes, out=np.zeros_like(probes), where=nonzero)
+    distances = probes.sum(axis=1)[:, None]
+    distances = distances - 2.0 * (nonzero.astype(np.float64) @ gallery.T)
+    distances += inverse @ np.square(gallery).T
+    np.maximum(distances, 0.0, out=distances)
+    return distances
+
+
+def nearest_non_match(features, sample=2048, block=256, seed=0):
+    """
+    Smallest distance between two different gallery rows, i.e. how close
+    a print can score to someone else's. Large galleries use a random
+    sample of ``sample`` rows as probes against every row, in blocks of
+    ``block`` probes. None for galleries with fewer than two rows.
+    """
+    features = np.asarray(features, dtype=np.float64)
+    count = len(features)
+    if count < 2:
+        return None
+    probes = np.arange(count)
+    if count > sample:
+        probes = np.sort(np.random.default_rng(seed).choice(count, sample, replace=False))
+    nearest = np.inf
+    for start in range(0, len(probes), block):
+        rows = probes[start:start + block]
+        distances = chisqr_distances(features[rows], features)
+        distances[np.arange(len(rows)), rows] = np.inf
+        nearest = min(nearest, float(distances.min()))
+    return nearest
+
+
+def save_features(path, ids, features, version=TEMPLATE_VERSION, source=None):
+    """
+    Store a feature gallery as a directory of .npy files (mmap friendly).
+    ``source`` (see source_key) records which images it was extracted from.
+    """
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, 'ids.npy'), np.asarray(ids, dtype=np.int64))
+    np.save(os.path.join(path, 'features.npy'), np.asarray(features, dtype=np.float32))
+    with open(os.path.join(path, 'template_version'), 'w') as f:
+        f.write(f"{version}\n")
+    source_path = os.path.join(path, 'source.json')
+    if source is not None:
+        with open(source_path, 'w') as f:
+            json.dump(source, f)
+    elif os.path.exists(source_path):
+        os.remove(source_path)
+
+
+def source_key(database_path, start_id=None, end_id=None):
+    """What a feature gallery was extracted from: image path, its mtime and the NID range"""
+    path = os.path.abspath(database_path)
+    return {'path': path, 'mtime': os.path.getmtime(path) if os.path.exists(path) else None,
+            'start_id': start_id, 'end_id': end_id}
+
+
+def features_source(path):
+    """source_key a saved gallery was written with, or None if unrecorded"""
+    source_path = os.path.join(path, 'source.json')
+    if not os.path.exists(source_path):
+        return None
+    with open(source_path) as f:
+        return json.load(f)
+
+
+def features_version(path):
+    """Template version a saved gallery was extracted with"""
+    version_path = os.path.join(path, 'template_version')
+    if not os.path.exists(version_path):
+        # Saved before templates were versioned, i.e. with version 1
+        return 1
+    with open(version_path) as f:
+        return int(f.read().strip())
+
+
+def load_features(path, mmap_mode=None):
+    """Return (ids, features) saved by save_features"""
+    ids = np.load(os.path.join(path, 'ids.npy'), mmap_mode=mmap_mode)
+    features = np.load(os.path.join(path, 'features.npy'), mmap_mode=mmap_mode)
+    return ids, features
+
+
+def _features_from_image(image):
+    from fingerprint_template import preprocess_fingerprint, extract_features
+    if image is None:
+        return None
+    return extract_features(preprocess_fingerprint(image))
+
+
+def _extract_one(image_path):
+    import cv2
+    return _features_from_image(cv2.imread(image_path))
+
+
+# Archive opened once per worker process
+_archive = None
+
+
+def _init_archive(archive_path):
+    global _archive
+    from fparchive import FingerprintArchive
+    _archive = FingerprintArchive(archive_path)
+
+
+def _extract_archived(fingerprint_id):
+    import cv2
+    data = _archive.get(fingerprint_id)
+    if data is None:
+        return None
+    return _features_from_image(cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR))
+
+
+def extract_directory(database_path, start_id=None, end_id=None, workers=None):
+    """
+    Compute LBP features for every <nid>.bmp in a directory, or every image
+    in a fingerprint archive, on a process pool.
+
+    Directories default to the FIRST_ID..LAST_ID range; archives default to
+    all of their NIDs. Returns (ids, features) with features as an
+    (n x bins) float32 matrix.
+    """
+    from fparchive import FingerprintArchive, is_archive
+
+    if is_archive(database_path):
+        with FingerprintArchive(database_path) as archive:
+            # Offset order keeps each worker's reads close to sequential
+            index = np.sort(archive.index, order='offset')
+            candidates = [int(nid) for nid in index['nid']
+                          if (start_id is None or nid >= start_id) and (end_id is None or nid <= end_id)]
+        pool_args = dict(initializer=_init_archive, initargs=(database_path,))
+        task, items = _extract_archived, candidates
+    else:
+        candidates, items = [], []
+        first = FIRST_ID if start_id is None else start_id
+        last = LAST_ID if end_id is None else end_id
+        for fingerprint_id in range(first, last + 1):
+            image_path = os.path.join(database_path, f"{fingerprint_id}.bmp")
+            if os.path.exists(image_path):
+                candidates.append(fingerprint_id)
+                items.append(image_path)
+        pool_args = {}
+        task = _extract_one
+
+    ids, rows = [], []
+    with ProcessPoolExecutor(max_workers=workers, **pool_args) as pool:
+        results = pool.map(task, items, chunksize=16)
+        for fingerprint_id, features in zip(candidates, results):
+            if features is not None:
+                ids.append(fingerprint_id)
+                rows.append(features)
+    features = np.vstack(rows).astype(np.float32) if rows else np.zeros((0, 0), dtype=np.float32)
+    order = np.argsort(ids, kind='stable')
+    return np.asarray(ids, dtype=np.int64)[order], features[order]
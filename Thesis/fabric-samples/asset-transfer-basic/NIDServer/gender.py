@@ -1,54 +1,299 @@
 import json
+import os
 import random
+import sys
 import argparse
+import importlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+
+from json_stream import iter_records
+
+GENDERS = ["Male", "Female"]
+DATE_FORMATS = ["%Y-%m-%d", "%d/%m/%Y", "%Y/%m/%d", "%d-%m-%Y", "%d.%m.%Y"]
+JSON_TYPES = {list: "array", str: "string", int: "number", float: "number", bool: "boolean", type(None): "null"}
+
+
+def random_gender(record):
+    """Assign a random gender (the original behaviour of this script)"""
+    record["gender"] = random.choice(GENDERS)
+    return record
+
+
+def normalize_gender(record):
+    """Map gender spellings such as 'm' or 'woman' onto Male/Female"""
+    value = str(record.get("gender") or "").strip().lower()
+    if value in ("m", "male", "man"):
+        record["gender"] = "Male"
+    elif value in ("f", "female", "woman"):
+        record["gender"] = "Female"
+    else:
+        record["gender"] = str(record.get("gender") or "").strip() or "Unknown"
+    return record
+
+
+def _parse_date(value):
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(str(value).strip(), fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def normalize_dates(record):
+    """Rewrite date_of_birth and visit_date as YYYY-MM-DD where they parse"""
+    for field in ("date_of_birth", "visit_date"):
+        if record.get(field):
+            parsed = _parse_date(record[field])
+            if parsed:
+                record[field] = parsed.isoformat()
+    return record
+
+
+def _age(date_of_birth):
+    born = _parse_date(date_of_birth) if date_of_birth else None
+    if born is None:
+        return None
+    today = date.today()
+    return today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+
+
+def derive_age(record):
+    """Add an integer age computed from date_of_birth"""
+    record["age"] = _age(record.get("date_of_birth"))
+    return record
+
+
+def derive_age_group(record):
+    """Add the age bucket used by the researcher views"""
+    age = _age(record.get("date_of_birth"))
+    if age is None or age < 0:
+        group = "Unknown"
+    elif age <= 20:
+        group = "0-20"
+    elif age <= 35:
+        group = "21-35"
+    elif age <= 50:
+        group = "36-50"
+    elif age <= 65:
+        group = "51-65"
+    else:
+        group = "65+"
+    record["age_group"] = group
+    return record
+
+
+TRANSFORMS = {
+    "random_gender": random_gender,
+    "normalize_gender": normalize_gender,
+    "normalize_dates": normalize_dates,
+    "derive_age": derive_age,
+    "derive_age_group": derive_age_group,
+}
+
+
+def resolve_transform(spec):
+    """
+    Turn a transform spec into a callable.
+
+    A spec is a built-in name from TRANSFORMS, ``set:field=value`` to add a
+    constant field, or ``module:function`` for a plugin taking and returning
+    a record dict.
+    """
+    if spec in TRANSFORMS:
+        return TRANSFORMS[spec]
+    if spec.startswith("set:"):
+        field, equals, value = spec[4:].partition("=")
+        if not equals or not field:
+            raise ValueError(f"Transform '{spec}' must be set:field=value")
+
+        def set_field(record):
+            record[field] = value
+            return record
+        return set_field
+    module_name, _, function_name = spec.partition(":")
+    if not function_name:
+        raise ValueError(f"Unknown transform '{spec}'")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+# Per-worker pipeline, built once by the pool initializer
+_pipeline = []
+
+
+def _init_worker(specs):
+    global _pipeline
+    _pipeline = [resolve_transform(spec) for spec in specs]
+
+
+def _apply_batch(batch, seed=None):
+    if seed is not None:
+        random.seed(seed)
+    out = []
+    for record in batch:
+        for transform in _pipeline:
+            record = transform(record)
+        out.append(record)
+    return out
+
+
+def _batches(records, batch_size):
+    batch = []
+    for position, record in enumerate(records):
+        # Transforms take dicts; reject anything else here rather than as a
+        # TypeError deep inside a worker
+        if not isinstance(record, dict):
+            kind = JSON_TYPES.get(type(record), type(record).__name__)
+            raise ValueError(f"Record {position} is a JSON {kind}, expected an object")
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _transformed_batches(records, specs, workers, batch_size, seed):
+    """Yield transformed batches in input order with a bounded number in flight"""
+    batches = _batches(records, batch_size)
+    batch_seed = (lambda index: None) if seed is None else (lambda index: f"{seed}:{index}")
+
+    if workers <= 1:
+        _init_worker(specs)
+        for index, batch in enumerate(batches):
+            yield _apply_batch(batch, batch_seed(index))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(specs,)) as pool:
+        pending = deque()
+        for index, batch in enumerate(batches):
+            pending.append(pool.submit(_apply_batch, batch, batch_seed(index)))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class RecordWriter:
+    """Stream records out as a JSON array or as NDJSON"""
+
+    def __init__(self, file, output_format="json", indent=2):
+        self.file = file
+        self.output_format = output_format
+        self.indent = indent
+        self.count = 0
+
+    def __enter__(self):
+        if self.output_format == "json":
+            self.file.write("[")
+        return self
+
+    def write(self, record):
+        if self.output_format == "ndjson":
+            self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        else:
+            text = json.dumps(record, indent=self.indent or None, ensure_ascii=False)
+            if self.indent:
+                pad = " " * self.indent
+                text = pad + text.replace("\n", "\n" + pad)
+                self.file.write((",\n" if self.count else "\n") + text)
+            else:
+                self.file.write(("," if self.count else "") + text)
+        self.count += 1
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.output_format == "json":
+            self.file.write("\n]\n" if self.count and self.indent else "]\n")
+
+
+def transform_file(input_file, output_file, specs, workers=None, batch_size=1000,
+                   output_format="json", indent=2, seed=None):
+    """
+    Apply a pipeline of per-record transforms to a large JSON file.
+
+    Args:
+        input_file (str): JSON array or NDJSON file, read incrementally
+        output_file (str): Path to write the transformed records to
+        specs (list): Transform specs, applied in order (see resolve_transform)
+        workers (int): Worker processes; 1 runs everything in this process
+        batch_size (int): Records handed to a worker at a time
+        output_format (str): "json" for a JSON array, "ndjson" for one record per line
+        indent (int): Indentation for JSON array output
+        seed: Optional seed making random transforms reproducible
+
+    Returns:
+        int: Number of records written
+    """
+    # Fail fast on bad specs before any worker starts
+    for spec in specs:
+        resolve_transform(spec)
+    workers = workers or os.cpu_count() or 1
+
+    # Write next to the output and swap it in only once everything succeeded,
+    # so in-place runs never truncate the input and failures leave no partial file
+    tmp_path = output_file + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as file, \
+                RecordWriter(file, output_format, indent) as writer:
+            for batch in _transformed_batches(iter_records(input_file), specs, workers, batch_size, seed):
+                for record in batch:
+                    writer.write(record)
+        os.replace(tmp_path, output_file)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return writer.count
+
 
 def add_gender_to_records(input_file, output_file):
     """
     Add a random gender field to each record in a JSON file.
-    
+
     Args:
         input_file (str): Path to the input JSON file
         output_file (str): Path to save the output JSON file
     """
-    # Define possible gender values
-    genders = ["Male", "Female"]
-    
     try:
-        # Load the JSON data from the input file
-        with open(input_file, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-        
-        # Check if the data is a list of records
-        if not isinstance(data, list):
-            print("Error: The JSON file should contain a list of records.")
-            return
-        
-        # Add gender to each record
-        for record in data:
-           
-            record["gender"] = random.choice(genders)
-        
-        # Save the updated data to the output file
-        with open(output_file, 'w', encoding='utf-8') as file:
-            json.dump(data, file, indent=2, ensure_ascii=False)
-        
-        print(f"Successfully added gender to {len(data)} records.")
+        count = transform_file(input_file, output_file, ["random_gender"])
+        print(f"Successfully added gender to {count} records.")
         print(f"Updated data saved to {output_file}")
-    
     except FileNotFoundError:
         print(f"Error: File '{input_file}' not found.")
-    except json.JSONDecodeError:
+    except (json.JSONDecodeError, ValueError):
         print(f"Error: Invalid JSON format in file '{input_file}'.")
     except Exception as e:
         print(f"An error occurred: {str(e)}")
 
+
 if __name__ == "__main__":
     # Set up command line arguments
-    parser = argparse.ArgumentParser(description="Add random gender to JSON records")
-    parser.add_argument("input_file", help="Path to the input JSON file")
-    parser.add_argument("--output", "-o", default="output.json", help="Path to save the output JSON file (default: output.json)")
-    
+    parser = argparse.ArgumentParser(
+        description="Streaming bulk transform for citizen JSON records",
+        epilog=f"Built-in transforms: {', '.join(TRANSFORMS)}; also set:field=value and module:function")
+    parser.add_argument("input_file", help="Path to the input JSON array or NDJSON file")
+    parser.add_argument("--output", "-o", default="output.json", help="Path to save the output file (default: output.json)")
+    parser.add_argument("--transform", "-t", action="append", dest="transforms",
+                        help="Transform to apply, repeatable (default: random_gender)")
+    parser.add_argument("--format", choices=["json", "ndjson"], default="json", help="Output format (default: json)")
+    parser.add_argument("--indent", type=int, default=2, help="Indentation for JSON output, 0 for compact")
+    parser.add_argument("--workers", "-w", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Records per worker task")
+    parser.add_argument("--seed", default=None, help="Seed for reproducible random transforms")
+
     args = parser.parse_args()
-    
-    # Run the function
-    add_gender_to_records(args.input_file, args.output)
\ No newline at end of file
+
+    transforms = args.transforms or ["random_gender"]
+    try:
+        count = transform_file(args.input_file, args.output, transforms, args.workers,
+                               args.batch_size, args.format, args.indent, args.seed)
+        print(f"Successfully applied {', '.join(transforms)} to {count} records.")
+        print(f"Updated data saved to {args.output}")
+    except FileNotFoundError:
+        print(f"Error: File '{args.input_file}' not found.")
+        sys.exit(1)
+    except (json.JSONDecodeError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
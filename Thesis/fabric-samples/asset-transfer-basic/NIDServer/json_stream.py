@@ -0,0 +1,81 @@
+import json
+
+CHUNK_SIZE = 1 << 20
+_WHITESPACE = ' \t\r\n'
+
+
+def _skip_whitespace(buffer, pos):
+    while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+        pos += 1
+    return pos
+
+
+def iter_json_array(file, chunk_size=CHUNK_SIZE):
+    """
+    Yield the elements of a top-level JSON array one at a time.
+
+    Only a window of the file is held in memory, so arrays much larger than
+    RAM can be processed. ``file`` is an open text file.
+    """
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size)
+    eof = not buffer
+    pos = _skip_whitespace(buffer, 0)
+    if pos >= len(buffer) or buffer[pos] != '[':
+        raise ValueError("Expected a JSON array")
+    pos += 1
+
+    while True:
+        pos = _skip_whitespace(buffer, pos)
+        if pos < len(buffer) and buffer[pos] == ',':
+            pos += 1
+            continue
+        if pos < len(buffer) and buffer[pos] == ']':
+            return
+        try:
+            if pos >= len(buffer):
+                raise json.JSONDecodeError("Need more data", buffer, pos)
+            element, end = decoder.raw_decode(buffer, pos)
+            # A value cut by the window edge may still decode (e.g. "2" of
+            # "2.5"), so only accept it once its delimiter is in the buffer
+            delimiter = _skip_whitespace(buffer, end)
+            if delimiter >= len(buffer) or buffer[delimiter] not in ',]':
+                raise json.JSONDecodeError("Expecting ',' delimiter", buffer, delimiter)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            more = file.read(chunk_size)
+            eof = not more
+            buffer = buffer[pos:] + more
+            pos = 0
+            continue
+        yield element
+        pos = end
+        if pos > chunk_size:
+            buffer = buffer[pos:]
+            pos = 0
+
+
+def iter_ndjson(file):
+    """Yield one record per non-empty line of an NDJSON file."""
+    for line in file:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_records(path, chunk_size=CHUNK_SIZE):
+    """
+    Stream records from either a JSON array file or an NDJSON file.
+
+    The format is detected from the first non-whitespace character.
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        head = file.read(1)
+        while head and head in _WHITESPACE:
+            head = file.read(1)
+        file.seek(0)
+        if head == '[':
+            yield from iter_json_array(file, chunk_size)
+        else:
+            yield from iter_ndjson(file)
@@ -0,0 +1,12 @@
+import numpy as np
+
+# Recent batches / requests kept for the rolling /metrics windows
+METRICS_WINDOW = 2048
+
+
+def percentile(values, pct, digits=3):
+    """``pct``-th percentile (0-100) of ``values``, rounded to ``digits``, or None when empty"""
+    if len(values) == 0:
+        return None
+    value = float(np.percentile(np.asarray(values), pct))
+    return value if digits is None else round(value, digits)
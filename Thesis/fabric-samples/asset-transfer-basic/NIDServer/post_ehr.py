@@ -1,16 +1,20 @@
 import json
-import requests
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from thesis_client import GatewayClient
 
 # Load JSON data
 with open("citizens.json", "r") as file:
     ehr_data = json.load(file)
 
-# Define API endpoint
-url = "http://localhost:3000/create_ehr"  # Replace with actual API
+# Pooled client for the gateway (GATEWAY_URL overrides http://localhost:8000)
+client = GatewayClient()
 
 # Send EHR records one by one
 for ehr in ehr_data:
-    # response = requests.post(url, json=ehr, headers={"Content-Type": "application/json"})
+    # response = client.create_ehr(ehr)
     
     # Print response status
     # print(f"Sent EHR for NID: {ehr['nid_no']} | Status: {response.status_code}")
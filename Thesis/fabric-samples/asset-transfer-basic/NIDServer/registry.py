@@ -0,0 +1,271 @@
+import argparse
+import json
+import os
+import queue
+import random
+import resource
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from json_stream import iter_records
+from metrics import percentile
+
+# Page cache per connection in KiB; bounds memory regardless of population size
+DEFAULT_CACHE_KIB = 64 * 1024
+# Connections shared by all request threads; memory is at most
+# DEFAULT_POOL_SIZE * DEFAULT_CACHE_KIB of page cache per process
+DEFAULT_POOL_SIZE = 4
+# SQLite caps the number of bound parameters per statement
+MAX_QUERY_PARAMS = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS citizens (
+    nid_no TEXT PRIMARY KEY,
+    phone TEXT,
+    email TEXT,
+    data TEXT NOT NULL
+) WITHOUT ROWID
+"""
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_citizens_phone ON citizens(phone)",
+    "CREATE INDEX IF NOT EXISTS idx_citizens_email ON citizens(email)",
+]
+
+
+class CitizenRegistry:
+    """
+    Disk-backed citizen registry built on SQLite.
+
+    Lookups by ``nid_no`` use the clustered primary key; ``phone`` and
+    ``email`` have secondary indexes. Threads borrow connections from a
+    pool of at most ``pool_size``, each with a bounded page cache, so the
+    caches stay warm across requests even when every request runs on a new
+    thread, and memory stays flat as the registry grows.
+    """
+
+    def __init__(self, db_path, cache_kib=DEFAULT_CACHE_KIB, mmap_bytes=0, pool_size=DEFAULT_POOL_SIZE):
+        self.db_path = db_path
+        self.cache_kib = cache_kib
+        self.mmap_bytes = mmap_bytes
+        self.pool_size = max(1, int(pool_size))
+        # LIFO hands out the most recently used, warmest connection first
+        self._pool = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+        with self._connection() as connection:
+            connection.execute(SCHEMA)
+
+    def _open(self):
+        connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        connection.execute(f"PRAGMA cache_size = -{int(self.cache_kib)}")
+        connection.execute(f"PRAGMA mmap_size = {int(self.mmap_bytes)}")
+        return connection
+
+    def _acquire(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            grow = self._opened < self.pool_size
+            if grow:
+                self._opened += 1
+        if grow:
+            try:
+                return self._open()
+            except Exception:
+                with self._lock:
+                    self._opened -= 1
+                raise
+        # Every connection is in use; wait for one to come back
+        return self._pool.get()
+
+    @contextmanager
+    def _connection(self):
+        connection = self._acquire()
+        try:
+            yield connection
+        finally:
+            self._pool.put(connection)
+
+    def close(self):
+        while True:
+            try:
+                connection = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            connection.close()
+            with self._lock:
+                self._opened -= 1
+
+    def import_records(self, records, batch_size=10000):
+        """Bulk load an iterable of citizen dicts; returns the number imported"""
+        with self._connection() as connection:
+            connection.execute("PRAGMA journal_mode = OFF")
+            connection.execute("PRAGMA synchronous = OFF")
+            # Secondary indexes are cheaper to build once after the bulk load
+            connection.execute("DROP INDEX IF EXISTS idx_citizens_phone")
+            connection.execute("DROP INDEX IF EXISTS idx_citizens_email")
+
+            total = 0
+            batch = []
+            for record in records:
+                batch.append((
+                    str(record['nid_no']),
+                    record.get('phone'),
+                    record.get('email'),
+                    json.dumps(record, ensure_ascii=False),
+                ))
+                if len(batch) >= batch_size:
+                    total += self._insert(connection, batch)
+                    batch = []
+            if batch:
+                total += self._insert(connection, batch)
+
+            for statement in INDEXES:
+                connection.execute(statement)
+            connection.commit()
+            connection.execute("PRAGMA journal_mode = DELETE")
+            connection.execute("PRAGMA synchronous = FULL")
+        return total
+
+    @staticmethod
+    def _insert(connection, batch):
+        with connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO citizens (nid_no, phone, email, data) VALUES (?, ?, ?, ?)",
+                batch)
+        return len(batch)
+
+    def import_json(self, json_path, batch_size=10000):
+        """Stream a citizens.json style file (JSON array or NDJSON) into the registry"""
+        return self.import_records(iter_records(json_path), batch_size)
+
+    def get(self, nid_no):
+        with self._connection() as connection:
+            row = connection.execute(
+                "SELECT data FROM citizens WHERE nid_no = ?", (str(nid_no),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_many(self, nid_nos):
+        """Return {nid_no: record} for the NIDs that exist"""
+        nid_nos = [str(nid_no) for nid_no in nid_nos]
+        found = {}
+        with self._connection() as connection:
+            for start in range(0, len(nid_nos), MAX_QUERY_PARAMS):
+                chunk = nid_nos[start:start + MAX_QUERY_PARAMS]
+                placeholders = ','.join('?' * len(chunk))
+                rows = connection.execute(
+                    f"SELECT nid_no, data FROM citizens WHERE nid_no IN ({placeholders})", chunk).fetchall()
+                for nid_no, data in rows:
+                    found[nid_no] = json.loads(data)
+        return found
+
+    def find_by_phone(self, phone):
+        with self._connection() as connection:
+            rows = connection.execute("SELECT data FROM citizens WHERE phone = ?", (phone,)).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def find_by_email(self, email):
+        with self._connection() as connection:
+            rows = connection.execute("SELECT data FROM citizens WHERE email = ?", (email,)).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def count(self):
+        with self._connection() as connection:
+            return connection.execute("SELECT COUNT(*) FROM citizens").fetchone()[0]
+
+
+def _synthetic_citizens(rows, first_nid=5000000001):
+    for offset in range(rows):
+        nid_no = first_nid + offset
+        yield {
+            "name": f"Citizen {nid_no}",
+            "nid_no": str(nid_no),
+            "date_of_birth": f"{1940 + offset % 70}-{1 + offset % 12:02d}-{1 + offset % 28:02d}",
+            "blood_group": "O+",
+            "address": "Dhaka, Bangladesh",
+            "father_name": f"Father {nid_no}",
+            "phone": f"01{nid_no % 1000000000:09d}",
+            "email": f"citizen{nid_no}@example.com",
+            "gender": "Male" if offset % 2 else "Female",
+        }
+
+
+def benchmark(db_path, rows, lookups, cache_kib=DEFAULT_CACHE_KIB):
+    """Import ``rows`` synthetic citizens and time random point lookups"""
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    registry = CitizenRegistry(db_path, cache_kib=cache_kib)
+
+    start = time.perf_counter()
+    registry.import_records(_synthetic_citizens(rows))
+    import_seconds = time.perf_counter() - start
+    print(f"Imported {rows} rows in {import_seconds:.1f}s ({rows / import_seconds:,.0f} rows/s)")
+
+    for label, lookup in (
+            ('nid_no', lambda n: registry.get(n)),
+            ('phone', lambda n: registry.find_by_phone(f"01{n % 1000000000:09d}")),
+            ('email', lambda n: registry.find_by_email(f"citizen{n}@example.com"))):
+        latencies = []
+        for _ in range(lookups):
+            nid_no = 5000000001 + random.randrange(rows)
+            t0 = time.perf_counter()
+            result = lookup(nid_no)
+            latencies.append(time.perf_counter() - t0)
+            assert result, f"Lookup by {label} failed for {nid_no}"
+        latencies.sort()
+        print(f"{label:>6}: p50 {percentile(latencies, 50, None) * 1e6:.0f}us  "
+              f"p99 {percentile(latencies, 99, None) * 1e6:.0f}us  "
+              f"max {latencies[-1] * 1e6:.0f}us")
+
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"Peak RSS: {peak_rss_mb:.1f} MB, database size: {os.path.getsize(db_path) / 2**20:.1f} MB")
+    registry.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Disk-backed citizen registry for the NID server")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="Stream citizens.json into a registry database")
+    import_parser.add_argument("json_file", help="citizens.json (JSON array) or NDJSON file")
+    import_parser.add_argument("db_file", help="SQLite registry to create or update")
+    import_parser.add_argument("--batch-size", type=int, default=10000)
+
+    get_parser = subparsers.add_parser("get", help="Look up a citizen")
+    get_parser.add_argument("db_file")
+    get_parser.add_argument("value", help="NID number, or phone/email with --by")
+    get_parser.add_argument("--by", choices=["nid_no", "phone", "email"], default="nid_no")
+
+    bench_parser = subparsers.add_parser("bench", help="Benchmark lookups on a synthetic population")
+    bench_parser.add_argument("--db", default="registry_bench.db")
+    bench_parser.add_argument("--rows", type=int, default=10000000)
+    bench_parser.add_argument("--lookups", type=int, default=10000)
+    bench_parser.add_argument("--cache-kib", type=int, default=DEFAULT_CACHE_KIB)
+
+    args = parser.parse_args()
+
+    if args.command == "import":
+        registry = CitizenRegistry(args.db_file)
+        start = time.perf_counter()
+        total = registry.import_json(args.json_file, args.batch_size)
+        print(f"Imported {total} citizens into {args.db_file} in {time.perf_counter() - start:.1f}s")
+    elif args.command == "get":
+        registry = CitizenRegistry(args.db_file)
+        if args.by == "nid_no":
+            result = registry.get(args.value)
+        elif args.by == "phone":
+            result = registry.find_by_phone(args.value)
+        else:
+            result = registry.find_by_email(args.value)
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    else:
+        benchmark(args.db, args.rows, args.lookups, args.cache_kib)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+import argparse
+import csv
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from fparchive import ArchiveWriter, FingerprintArchive, is_archive
+from gallery import chisqr_distances, load_features, save_features
+
+FIRST_SYNTHETIC_NID = 6000000001
+# Probe IDs are nid * 10 + impression, so at most 9 impressions per identity
+MAX_IMPRESSIONS = 9
+FEATURE_BINS = 26
+
+
+# --- Augmentations -------------------------------------------------------------
+# All take and return a uint8 grayscale image of unchanged shape; ``bg`` is the
+# paper colour used to fill uncovered pixels.
+
+def rotate(image, rng, max_degrees, bg):
+    h, w = image.shape
+    matrix = cv2.getRotationMatrix2D((w / 2, h / 2), rng.uniform(-max_degrees, max_degrees), 1.0)
+    return cv2.warpAffine(image, matrix, (w, h), borderValue=bg)
+
+
+def rescale(image, rng, low, high, bg):
+    """Change ridge spacing by zooming about the centre"""
+    h, w = image.shape
+    matrix = cv2.getRotationMatrix2D((w / 2, h / 2), 0, rng.uniform(low, high))
+    return cv2.warpAffine(image, matrix, (w, h), flags=cv2.INTER_LINEAR, borderValue=bg)
+
+
+def elastic_warp(image, rng, alpha, sigma, bg):
+    """Smooth random displacement field, like skin stretching on the sensor"""
+    h, w = image.shape
+    dx = cv2.GaussianBlur(rng.uniform(-1, 1, (h, w)).astype(np.float32), (0, 0), sigma)
+    dy = cv2.GaussianBlur(rng.uniform(-1, 1, (h, w)).astype(np.float32), (0, 0), sigma)
+    scale = alpha / max(float(np.abs(dx).max()), float(np.abs(dy).max()), 1e-6)
+    grid_x, grid_y = np.meshgrid(np.arange(w, dtype=np.float32), np.arange(h, dtype=np.float32))
+    return cv2.remap(image, grid_x + dx * scale, grid_y + dy * scale, cv2.INTER_LINEAR,
+                     borderMode=cv2.BORDER_CONSTANT, borderValue=bg)
+
+
+def add_noise(image, rng, sigma):
+    noisy = image.astype(np.float32) + rng.normal(0, sigma, image.shape)
+    return np.clip(noisy, 0, 255).astype(np.uint8)
+
+
+def partial_crop(image, rng, keep_min, bg):
+    """Keep a random window covering at least ``keep_min`` of each side"""
+    h, w = image.shape
+    ch, cw = int(h * rng.uniform(keep_min, 1)), int(w * rng.uniform(keep_min, 1))
+    top, left = rng.integers(0, h - ch + 1), rng.integers(0, w - cw + 1)
+    out = np.full_like(image, bg)
+    out[top:top + ch, left:left + cw] = image[top:top + ch, left:left + cw]
+    return out
+
+
+def pressure(image, rng, strength=1.0):
+    """
+    Heavier pressure thickens the dark ridges, lighter pressure thins them.
+    ``strength`` blends toward the eroded/dilated image; at these image sizes
+    a full 2x2 step already changes the texture as much as a new finger.
+    """
+    kernel = np.ones((2, 2), np.uint8)
+    choice = rng.integers(-1, 2)
+    if choice == 0:
+        return image
+    morphed = cv2.dilate(image, kernel) if choice < 0 else cv2.erode(image, kernel)
+    weight = rng.uniform(0, strength)
+    return cv2.addWeighted(image, 1 - weight, morphed, weight, 0)
+
+
+def contrast(image, rng, low, high):
+    gamma = rng.uniform(low, high)
+    gain = rng.uniform(low, high)
+    adjusted = 255 * (image.astype(np.float32) / 255) ** gamma
+    adjusted = (adjusted - 128) * gain + 128
+    return np.clip(adjusted, 0, 255).astype(np.uint8)
+
+
+def derive_identity(image, rng, bg):
+    """A new finger: mirrored, re-spaced and strongly warped from a source print"""
+    if rng.random() < 0.5:
+        image = cv2.flip(image, 1)
+    image = rescale(image, rng, 0.8, 1.25, bg)
+    image = elastic_warp(image, rng, alpha=6, sigma=5, bg=bg)
+    image = rotate(image, rng, 180, bg)
+    return pressure(image, rng, strength=1.0)
+
+
+def impression(image, rng, bg):
+    """Another capture of the same finger"""
+    image = rotate(image, rng, 10, bg)
+    image = elastic_warp(image, rng, alpha=1.5, sigma=6, bg=bg)
+    image = partial_crop(image, rng, 0.85, bg)
+    image = pressure(image, rng, strength=0.3)
+    image = contrast(image, rng, 0.85, 1.15)
+    return add_noise(image, rng, rng.uniform(2, 8))
+
+
+# --- Generation -----------------------------------------------------------------
+
+# Source prints, loaded once per worker process
+_sources = []
+
+
+def _load_sources(source_path):
+    if is_archive(source_path):
+        with FingerprintArchive(source_path) as archive:
+            items = list(archive.iter_images())
+    else:
+        items = []
+        for name in sorted(os.listdir(source_path)):
+            if name.endswith('.bmp') and name[:-4].isdigit():
+                with open(os.path.join(source_path, name), 'rb') as file:
+                    items.append((int(name[:-4]), file.read()))
+    sources = []
+    for nid, data in items:
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+        if image is not None:
+            border = np.concatenate([image[0], image[-1], image[:, 0], image[:, -1]])
+            sources.append((nid, image, int(np.median(border))))
+    return sources
+
+
+def _init_worker(source_path):
+    global _sources
+    _sources = _load_sources(source_path)
+
+
+def _features(image):
+    from fingerprint_template import preprocess_fingerprint, extract_features
+    return extract_features(preprocess_fingerprint(image)).astype(np.float32)
+
+
+def _encode(image, image_format):
+    ok, encoded = cv2.imencode(f'.{image_format}', image)
+    if not ok:
+        raise ValueError(f"Could not encode image as {image_format}")
+    return encoded.tobytes()
+
+
+def _make_identities(first_index, count, seed, first_nid, impressions, image_format, with_features):
+    """
+    Build ``count`` identities starting at ``first_index``.
+
+    Each identity gets its own generator seeded from (seed, index), so the
+    corpus is identical whatever the worker count or chunking.
+    """
+    out = []
+    for index in range(first_index, first_index + count):
+        rng = np.random.default_rng([seed, index])
+        source_nid, source, bg = _sources[index % len(_sources)]
+        base = derive_identity(source, rng, bg)
+        # The enrolled template is itself one capture of the new finger
+        enrolled = impression(base, rng, bg)
+        probes = [impression(base, rng, bg) for _ in range(impressions)]
+        out.append({
+            'nid': first_nid + index,
+            'source_nid': source_nid,
+            'image': _encode(enrolled, image_format),
+            'probes': [_encode(probe, image_format) for probe in probes],
+            'features': _features(enrolled) if with_features else None,
+            'probe_features': [_features(probe) for probe in probes] if with_features else None,
+        })
+    return out
+
+
+def generate(source_path, count, output, probes_output, truth_path, impressions=2, seed=0,
+             first_nid=FIRST_SYNTHETIC_NID, workers=None, chunk=64, image_format='bmp',
+             features_dir=None, progress=True):
+    """
+    Write ``count`` synthetic identities to a gallery archive, their genuine
+    impressions to a probe archive, and the probe -> NID ground truth as CSV.
+
+    With ``features_dir`` the LBP templates are extracted in the same worker
+    pass and saved under features_dir/gallery and features_dir/probes in the
+    gallery.save_features layout.
+    """
+    if not 0 <= impressions <= MAX_IMPRESSIONS:
+        raise ValueError(f"impressions must be between 0 and {MAX_IMPRESSIONS}")
+    workers = workers or os.cpu_count() or 1
+    with_features = features_dir is not None
+    gallery_features = np.empty((count, FEATURE_BINS), np.float32) if with_features else None
+    probe_features = np.empty((count * impressions, FEATURE_BINS), np.float32) if with_features else None
+    probe_ids = np.empty(count * impressions, np.int64)
+
+    start = time.perf_counter()
+    written = 0
+    with ArchiveWriter(output) as gallery_writer, ArchiveWriter(probes_output) as probe_writer, \
+            open(truth_path, 'w', newline='') as truth_file, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(source_path,)) as pool:
+        truth = csv.writer(truth_file)
+        truth.writerow(['probe_id', 'nid', 'source_nid'])
+
+        def write(identities):
+            nonlocal written
+            for identity in identities:
+                nid = identity['nid']
+                gallery_writer.add(nid, identity['image'])
+                if with_features:
+                    gallery_features[written] = identity['features']
+                for k, probe in enumerate(identity['probes']):
+                    probe_id = nid * 10 + k + 1
+                    probe_writer.add(probe_id, probe)
+                    truth.writerow([probe_id, nid, identity['source_nid']])
+                    row = written * impressions + k
+                    probe_ids[row] = probe_id
+                    if with_features:
+                        probe_features[row] = identity['probe_features'][k]
+                written += 1
+            if progress:
+                elapsed = time.perf_counter() - start
+                print(f"  {written}/{count} identities, {written / max(elapsed, 1e-9):,.0f}/s")
+
+        # Results are written in submission order with a bounded window so
+        # output is deterministic and memory stays flat
+        pending = deque()
+        for first_index in range(0, count, chunk):
+            pending.append(pool.submit(_make_identities, first_index, min(chunk, count - first_index), seed,
+                                       first_nid, impressions, image_format, with_features))
+            if len(pending) >= workers * 2:
+                write(pending.popleft().result())
+        while pending:
+            write(pending.popleft().result())
+
+    if with_features:
+        save_features(os.path.join(features_dir, 'gallery'), np.arange(first_nid, first_nid + count), gallery_features)
+        save_features(os.path.join(features_dir, 'probes'), probe_ids, probe_features)
+    return written, time.perf_counter() - start
+
+
+# --- Benchmark -----------------------------------------------------------------
+
+def load_truth(truth_path):
+    truth = {}
+    with open(truth_path, newline='') as file:
+        for row in csv.DictReader(file):
+            truth[int(row['probe_id'])] = int(row['nid'])
+    return truth
+
+
+def benchmark(features_dir, truth_path, sizes, batch=32, threshold=0.3, max_probes=2000, seed=0):
+    """
+    Identification latency and accuracy against the first N gallery templates.
+
+    Every probe whose mate is among those N is a candidate; up to
+    ``max_probes`` of them are scored, one at a time and in ``batch``-sized
+    blocks, mirroring /match with and without micro-batching.
+    """
+    gallery_ids, gallery_features = load_features(os.path.join(features_dir, 'gallery'), mmap_mode='r')
+    probe_ids, probe_features = load_features(os.path.join(features_dir, 'probes'), mmap_mode='r')
+    truth = load_truth(truth_path)
+    mates = np.array([truth[int(p)] for p in probe_ids])
+    rng = np.random.default_rng(seed)
+
+    results = []
+    for size in sizes:
+        size = min(size, len(gallery_ids))
+        ids = np.asarray(gallery_ids[:size])
+        templates = np.asarray(gallery_features[:size], dtype=np.float64)
+        candidates = np.nonzero(np.isin(mates, ids))[0]
+        chosen = np.sort(rng.choice(candidates, min(max_probes, len(candidates)), replace=False))
+        probes = np.asarray(probe_features[chosen], dtype=np.float64)
+        expected = mates[chosen]
+
+        single = min(len(probes), 100)
+        start = time.perf_counter()
+        for probe in probes[:single]:
+            chisqr_distances(probe, templates).argmin()
+        single_ms = (time.perf_counter() - start) / max(single, 1) * 1000
+
+        best_ids, best_scores = [], []
+        start = time.perf_counter()
+        for offset in range(0, len(probes), batch):
+            distances = chisqr_distances(probes[offset:offset + batch], templates)
+            best = distances.argmin(axis=1)
+            best_ids.append(ids[best])
+            best_scores.append(distances[np.arange(len(best)), best])
+        batched_seconds = time.perf_counter() - start
+        best_ids = np.concatenate(best_ids) if best_ids else np.array([])
+        best_scores = np.concatenate(best_scores) if best_scores else np.array([])
+
+        correct = best_ids == expected
+        accepted = best_scores < threshold
+        results.append({
+            'gallery_size': int(size),
+            'probes': int(len(probes)),
+            'single_probe_ms': round(single_ms, 3),
+            'batched_probe_ms': round(batched_seconds / max(len(probes), 1) * 1000, 3),
+            'batched_probes_per_second': round(len(probes) / batched_seconds, 1) if batched_seconds else None,
+            'rank1_accuracy': round(float(correct.mean()), 4) if len(probes) else None,
+            'true_match_rate': round(float((correct & accepted).mean()), 4) if len(probes) else None,
+            'false_match_rate': round(float((~correct & accepted).mean()), 4) if len(probes) else None,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scale the fingerprint corpus with seeded synthetic prints")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    generate_parser = subparsers.add_parser('generate', help='Derive synthetic identities and impressions')
+    generate_parser.add_argument('--source', default='fingerprints_raw', help='Source directory or archive')
+    generate_parser.add_argument('--count', '-n', type=int, required=True, help='Synthetic identities to create')
+    generate_parser.add_argument('--impressions', type=int, default=2, help='Genuine probes per identity')
+    generate_parser.add_argument('--output', '-o', default='synthetic.fpa', help='Gallery archive')
+    generate_parser.add_argument('--probes', default='synthetic_probes.fpa', help='Probe archive')
+    generate_parser.add_argument('--truth', default='synthetic_truth.csv', help='probe_id,nid ground truth')
+    generate_parser.add_argument('--features', help='Also save LBP templates under this directory')
+    generate_parser.add_argument('--first-nid', type=int, default=FIRST_SYNTHETIC_NID)
+    generate_parser.add_argument('--format', choices=('bmp', 'png'), default='bmp')
+    generate_parser.add_argument('--seed', type=int, default=0)
+    generate_parser.add_argument('--workers', '-w', type=int, default=None)
+    generate_parser.add_argument('--chunk', type=int, default=64, help='Identities per worker task')
+
+    bench_parser = subparsers.add_parser('bench', help='Identification latency and accuracy by gallery size')
+    bench_parser.add_argument('--features', required=True, help='Directory written by generate --features')
+    bench_parser.add_argument('--truth', default='synthetic_truth.csv')
+    bench_parser.add_argument('--sizes', default='10000,100000,1000000',
+                              help='Comma separated gallery sizes (capped at the corpus size)')
+    bench_parser.add_argument('--batch', type=int, default=32)
+    bench_parser.add_argument('--threshold', type=float, default=0.3)
+    bench_parser.add_argument('--max-probes', type=int, default=2000)
+
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        written, seconds = generate(args.source, args.count, args.output, args.probes, args.truth,
+                                    args.impressions, args.seed, args.first_nid, args.workers, args.chunk,
+                                    args.format, args.features)
+        print(f"Wrote {written} identities ({written * args.impressions} probes) in {seconds:.1f}s "
+              f"-> {args.output}, {args.probes}, {args.truth}")
+        return
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    print(f"{'gallery':>10} {'probes':>7} {'single ms':>10} {'batched ms':>11} {'probes/s':>10} "
+          f"{'rank-1':>7} {'TMR':>7} {'FMR':>7}")
+    for row in benchmark(args.features, args.truth, sizes, args.batch, args.threshold, args.max_probes):
+        print(f"{row['gallery_size']:>10} {row['probes']:>7} {row['single_probe_ms']:>10} "
+              f"{row['batched_probe_ms']:>11} {row['batched_probes_per_second']!s:>10} "
+              f"{row['rank1_accuracy']!s:>7} {row['true_match_rate']!s:>7} {row['false_match_rate']!s:>7}")
+
+
+if __name__ == '__main__':
+    main()
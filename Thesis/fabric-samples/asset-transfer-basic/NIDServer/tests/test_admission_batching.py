@@ -0,0 +1,40 @@
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+NID_SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, NID_SERVER_DIR)
+import fingerprint
+from admission import AdmissionController
+from batcher import MatchBatcher
+
+
+def test_default_admission_cap_lets_a_batch_fill():
+    assert fingerprint.ADMISSION_MAX_IN_FLIGHT >= fingerprint.MATCH_BATCH_SIZE
+
+    rng = np.random.default_rng(0)
+    features = rng.random((64, 16))
+    # A long wait so the flush size shows how many probes admission let
+    # through at once, independent of thread start-up jitter
+    batcher = MatchBatcher(np.arange(64), features, fingerprint.MATCH_BATCH_SIZE, max_wait_ms=2000)
+    admission = AdmissionController(fingerprint.ADMISSION_MAX_IN_FLIGHT, fingerprint.ADMISSION_MAX_QUEUE)
+    start = threading.Barrier(fingerprint.MATCH_BATCH_SIZE)
+    deadline = time.perf_counter() + 30
+
+    def probe(row):
+        start.wait()
+        with admission.slot(deadline):
+            batcher.submit(features[row]).result(timeout=30)
+
+    threads = [threading.Thread(target=probe, args=(row,)) for row in range(fingerprint.MATCH_BATCH_SIZE)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    metrics = batcher.metrics()
+    assert metrics['mean_batch_fill'] == fingerprint.MATCH_BATCH_SIZE
+    assert metrics['flushed_by_timeout_ratio'] == 0.0
@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pytest
+
+NID_SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, NID_SERVER_DIR)
+import fingerprint
+from demographics import parse_hints
+from fingerprint_template import extract_features, preprocess_fingerprint
+
+FINGERPRINTS = os.path.join(NID_SERVER_DIR, 'fingerprints_raw')
+# 5000000007 is Female in citizens.json
+PROBE_ID = 5000000007
+
+
+@pytest.fixture(scope='module')
+def probe():
+    import cv2
+    fingerprint.load_database(FINGERPRINTS)
+    return extract_features(preprocess_fingerprint(cv2.imread(os.path.join(FINGERPRINTS, f'{PROBE_ID}.bmp'))))
+
+
+def test_matching_hint_is_trusted_without_fallback(probe):
+    match_id, search = fingerprint.match_fingerprint(probe, hints=parse_hints({'gender': 'Female'}))
+    assert match_id == PROBE_ID
+    assert search['fallback'] is False
+    assert search['candidates'] < len(fingerprint.match_batcher.ids)
+
+
+def test_wrong_hint_still_returns_true_identity(probe):
+    match_id, search = fingerprint.match_fingerprint(probe, hints=parse_hints({'gender': 'Male'}))
+    assert match_id == PROBE_ID
+    assert search['fallback'] is True
@@ -1,54 +1,83 @@
-import requests
+import os
+import sys
 import time
 import json
+import argparse
 import threading
-from concurrent.futures import ThreadPoolExecutor
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, wait
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from thesis_client import NO_RETRY, ApiClient
 
 # Configuration
 BASE_URL = "http://localhost:8000"  # Matches app.js port 8000
 VALID_NID = "5000000001"  # Replace with a valid NID
 HEADERS = {"Content-Type": "application/json"}  # Removed JWT
+REQUEST_TIMEOUT = 15  # Seconds per HTTP call
+REPLAY_DELAY = 0  # createEHR returns after commit, so a replay needs no wait
+DOS_REQUESTS = 1000
+DOS_WORKERS = 50
+
+# One pooled keep-alive client shared by every check. Retries are off so
+# each probe (especially the replay check) is sent exactly once
+client = ApiClient(BASE_URL, timeout=REQUEST_TIMEOUT, retry=NO_RETRY,
+                   pool_maxsize=DOS_WORKERS + 8, headers=HEADERS)
+
+_log_lock = threading.Lock()
 
 # Function to log results
 def log_result(test_name, success, message):
-    with open("security_test_results.txt", "a") as f:
-        f.write(f"{time.ctime()}: {test_name} - Success: {success}, Message: {message}\n")
+    with _log_lock:
+        with open("security_test_results.txt", "a") as f:
+            f.write(f"{time.ctime()}: {test_name} - Success: {success}, Message: {message}\n")
+    return success, message
+
+def post(url, payload):
+    return client.post(url, data=json.dumps(payload))
+
+def check(name):
+    """Give a check the name it logs under; it is called as test(test_name)"""
+    def register(test):
+        test.check_name = name
+        return test
+    return register
 
 # 1. IDOR Vulnerability Check
-def test_idor_vulnerability():
-    test_name = "IDOR Vulnerability Check"
+@check("IDOR Vulnerability Check")
+def test_idor_vulnerability(test_name):
     try:
         # Attempt to access another patient's EHR with a manipulated NID
         invalid_nid = "9999999999"  # Assumed invalid NID
         url = f"{BASE_URL}/patient/ehrs"
         payload = {"nid_no": invalid_nid}
-        response = requests.post(url, headers=HEADERS, data=json.dumps(payload))
+        response = post(url, payload)
         
         if response.status_code == 200 and "patient_info" not in response.json():
-            log_result(test_name, True, f"IDOR detected! Accessed EHR with NID {invalid_nid}: {response.text}")
+            return log_result(test_name, True, f"IDOR detected! Accessed EHR with NID {invalid_nid}: {response.text}")
         else:
-            log_result(test_name, False, f"IDOR prevented. Status: {response.status_code}, Message: {response.json().get('error', 'No error')}")
+            return log_result(test_name, False, f"IDOR prevented. Status: {response.status_code}, Message: {response.json().get('error', 'No error')}")
     except Exception as e:
-        log_result(test_name, False, f"Error: {str(e)}")
+        return log_result(test_name, False, f"Error: {str(e)}")
 
 # 2. Unauthorized Network Join Attempt
-def test_unauthorized_join():
-    test_name = "Unauthorized Network Join Attempt"
+@check("Unauthorized Network Join Attempt")
+def test_unauthorized_join(test_name):
     try:
         # Simulate a request without valid credentials (no NID or biometric data)
         url = f"{BASE_URL}/patient/ehrs"  # Test a protected endpoint
-        response = requests.post(url, headers=HEADERS, data=json.dumps({}))
+        response = post(url, {})
         
         if response.status_code == 400 or response.status_code == 404:
-            log_result(test_name, False, f"Unauthorized join prevented. Status: {response.status_code}, Message: {response.json().get('error', 'No error')}")
+            return log_result(test_name, False, f"Unauthorized join prevented. Status: {response.status_code}, Message: {response.json().get('error', 'No error')}")
         else:
-            log_result(test_name, True, f"Unauthorized join succeeded! Status: {response.status_code}, Response: {response.text}")
+            return log_result(test_name, True, f"Unauthorized join succeeded! Status: {response.status_code}, Response: {response.text}")
     except Exception as e:
-        log_result(test_name, False, f"Error: {str(e)}")
+        return log_result(test_name, False, f"Error: {str(e)}")
 
 # 3. Malicious Ordering Simulation
-def test_malicious_ordering():
-    test_name = "Malicious Ordering Simulation"
+@check("Malicious Ordering Simulation")
+def test_malicious_ordering(test_name):
     try:
         # Submit a valid EHR creation, then attempt a malicious override
         url = f"{BASE_URL}/ehr/create/nid"
@@ -58,7 +87,7 @@ def test_malicious_ordering():
             "ehr_details": json.dumps({"diagnosis": "Test", "visit_date": "2025-06-14"}),
             "nid_no": VALID_NID
         }
-        response = requests.post(url, headers=HEADERS, data=json.dumps(valid_payload))
+        response = post(url, valid_payload)
         
         if response.status_code == 201:
             ehr_id = response.json()["ehr_info"]["ehr_id"]
@@ -69,20 +98,20 @@ def test_malicious_ordering():
                 "nid_no": VALID_NID,
                 "ehr_id": ehr_id  # Attempt to overwrite
             }
-            malicious_response = requests.post(url, headers=HEADERS, data=json.dumps(malicious_payload))
+            malicious_response = post(url, malicious_payload)
             
             if malicious_response.status_code == 400 or "already exists" in malicious_response.text.lower():
-                log_result(test_name, False, f"Malicious ordering detected and prevented. Status: {malicious_response.status_code}")
+                return log_result(test_name, False, f"Malicious ordering detected and prevented. Status: {malicious_response.status_code}")
             else:
-                log_result(test_name, True, f"Malicious ordering succeeded! Response: {malicious_response.text}")
+                return log_result(test_name, True, f"Malicious ordering succeeded! Response: {malicious_response.text}")
         else:
-            log_result(test_name, False, f"Failed to submit initial EHR. Status: {response.status_code}")
+            return log_result(test_name, False, f"Failed to submit initial EHR. Status: {response.status_code}")
     except Exception as e:
-        log_result(test_name, False, f"Error: {str(e)}")
+        return log_result(test_name, False, f"Error: {str(e)}")
 
 # 4. Replay Attack Testing
-def test_replay_attack():
-    test_name = "Replay Attack Testing"
+@check("Replay Attack Testing")
+def test_replay_attack(test_name):
     try:
         # Submit a valid EHR creation and replay it
         url = f"{BASE_URL}/ehr/create/nid"
@@ -92,62 +121,157 @@ def test_replay_attack():
             "ehr_details": json.dumps({"diagnosis": "ReplayTest", "visit_date": "2025-06-14"}),
             "nid_no": VALID_NID
         }
-        response = requests.post(url, headers=HEADERS, data=json.dumps(valid_payload))
+        response = post(url, valid_payload)
         
         if response.status_code == 201:
             replay_data = json.dumps(valid_payload)  # Capture the request payload
-            time.sleep(1)  # Allow time for processing
-            replay_response = requests.post(url, headers=HEADERS, data=replay_data)
+            if REPLAY_DELAY:
+                time.sleep(REPLAY_DELAY)
+            replay_response = client.post(url, data=replay_data)
             
             if replay_response.status_code == 400 or "duplicate" in replay_response.text.lower():
-                log_result(test_name, False, f"Replay attack prevented. Status: {replay_response.status_code}")
+                return log_result(test_name, False, f"Replay attack prevented. Status: {replay_response.status_code}")
             else:
-                log_result(test_name, True, f"Replay attack succeeded! Response: {replay_response.text}")
+                return log_result(test_name, True, f"Replay attack succeeded! Response: {replay_response.text}")
         else:
-            log_result(test_name, False, f"Failed to submit initial EHR. Status: {response.status_code}")
+            return log_result(test_name, False, f"Failed to submit initial EHR. Status: {response.status_code}")
     except Exception as e:
-        log_result(test_name, False, f"Error: {str(e)}")
+        return log_result(test_name, False, f"Error: {str(e)}")
 
 # 5. DoS Attack Simulation
-def test_dos_attack():
-    test_name = "DoS Attack Simulation"
+@check("DoS Attack Simulation")
+def test_dos_attack(test_name):
     def send_request():
         try:
             url = f"{BASE_URL}/patient/ehrs"
             payload = {"nid_no": VALID_NID}
-            response = requests.post(url, headers=HEADERS, data=json.dumps(payload))
+            response = post(url, payload)
             return response.status_code
         except Exception:
             return 500
 
     try:
-        with ThreadPoolExecutor(max_workers=50) as executor:
-            # Simulate 1000 concurrent requests
-            futures = [executor.submit(send_request) for _ in range(1000)]
+        with ThreadPoolExecutor(max_workers=DOS_WORKERS) as executor:
+            # Simulate concurrent requests
+            futures = [executor.submit(send_request) for _ in range(DOS_REQUESTS)]
             results = [f.result() for f in futures]
             success_count = sum(1 for r in results if r == 200)
             error_count = sum(1 for r in results if r >= 400)
             
             if error_count > success_count:
-                log_result(test_name, True, f"DoS simulation succeeded. Errors: {error_count}, Successes: {success_count}")
+                return log_result(test_name, True, f"DoS simulation succeeded. Errors: {error_count}, Successes: {success_count}")
             else:
-                log_result(test_name, False, f"DoS simulation failed. Errors: {error_count}, Successes: {success_count}")
+                return log_result(test_name, False, f"DoS simulation failed. Errors: {error_count}, Successes: {success_count}")
     except Exception as e:
-        log_result(test_name, False, f"Error: {str(e)}")
+        return log_result(test_name, False, f"Error: {str(e)}")
+
+# Checks that can share the server; the DoS simulation floods it, so it
+# runs on its own afterwards to keep it from skewing the others
+INDEPENDENT_TESTS = [
+    test_idor_vulnerability,
+    test_unauthorized_join,
+    test_malicious_ordering,
+    test_replay_attack,
+]
+EXCLUSIVE_TESTS = [
+    test_dos_attack,
+]
+
+def _timed(test):
+    start = time.perf_counter()
+    success, message = test(test.check_name)
+    return success, message, time.perf_counter() - start
+
+def _result(test, success, message, duration):
+    if success:
+        status = "vulnerable"
+    elif message.startswith("Error:") or message.startswith("Timed out"):
+        status = "error"
+    else:
+        status = "passed"
+    return {
+        "name": test.__name__,
+        "status": status,
+        "vulnerability_detected": success,
+        "message": message,
+        "duration_seconds": round(duration, 3),
+    }
+
+def _run_batch(tests, timeout):
+    executor = ThreadPoolExecutor(max_workers=len(tests))
+    started = time.perf_counter()
+    futures = {executor.submit(_timed, test): test for test in tests}
+    wait(futures, timeout=timeout)
+    results = []
+    for future, test in futures.items():
+        if future.done():
+            results.append(_result(test, *future.result()))
+        else:
+            message = f"Timed out after {timeout}s"
+            log_result(test.check_name, False, message)
+            results.append(_result(test, False, message, time.perf_counter() - started))
+    # Don't wait for hung checks; their HTTP calls are bounded by REQUEST_TIMEOUT
+    executor.shutdown(wait=False, cancel_futures=True)
+    return results
+
+def run_group(tests, parallel, timeout):
+    """Run tests concurrently (or one by one) with a per-test time budget"""
+    if parallel:
+        return _run_batch(tests, timeout)
+    # Each check gets its own worker so a hung one can't hold up the next
+    return [result for test in tests for result in _run_batch([test], timeout)]
+
+def run_suite(parallel=True, timeout=120, include_dos=True):
+    start = time.perf_counter()
+    results = run_group(INDEPENDENT_TESTS, parallel, timeout)
+    if include_dos:
+        results += run_group(EXCLUSIVE_TESTS, parallel, timeout)
+    return {
+        "base_url": BASE_URL,
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "duration_seconds": round(time.perf_counter() - start, 3),
+        "results": results,
+    }
+
+def write_junit(report, path):
+    suite = ET.Element("testsuite", {
+        "name": "gateway-security",
+        "tests": str(len(report["results"])),
+        "failures": str(sum(r["status"] == "vulnerable" for r in report["results"])),
+        "errors": str(sum(r["status"] == "error" for r in report["results"])),
+        "time": str(report["duration_seconds"]),
+    })
+    for result in report["results"]:
+        case = ET.SubElement(suite, "testcase", {
+            "classname": "Tester", "name": result["name"], "time": str(result["duration_seconds"])})
+        if result["status"] == "vulnerable":
+            ET.SubElement(case, "failure", {"message": "Vulnerability detected"}).text = result["message"]
+        elif result["status"] == "error":
+            ET.SubElement(case, "error", {"message": "Check could not run"}).text = result["message"]
+        else:
+            ET.SubElement(case, "system-out").text = result["message"]
+    ET.ElementTree(suite).write(path, encoding="utf-8", xml_declaration=True)
 
 # Run all tests
 if __name__ == "__main__":
-    tests = [
-        test_idor_vulnerability,
-        test_unauthorized_join,
-        test_malicious_ordering,
-        test_replay_attack,
-        test_dos_attack
-    ]
-    
+    parser = argparse.ArgumentParser(description="Gateway security checks")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--serial", action="store_true", help="Run checks one at a time")
+    parser.add_argument("--timeout", type=float, default=120, help="Time budget per check in seconds")
+    parser.add_argument("--skip-dos", action="store_true", help="Skip the DoS simulation")
+    parser.add_argument("--json", help="Write structured results to this JSON file")
+    parser.add_argument("--junit", help="Write results as JUnit XML to this file")
+    args = parser.parse_args()
+    BASE_URL = client.base_url = args.base_url.rstrip("/")
+
     print("Starting security vulnerability tests...")
-    for test in tests:
-        test()
-        time.sleep(2)  # Avoid overwhelming the server
-    
-    print("Tests completed. Check security_test_results.txt for details.")
\ No newline at end of file
+    report = run_suite(parallel=not args.serial, timeout=args.timeout, include_dos=not args.skip_dos)
+    for result in report["results"]:
+        print(f"  {result['name']}: {result['status']} ({result['duration_seconds']}s)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.junit:
+        write_junit(report, args.junit)
+    print(f"Tests completed in {report['duration_seconds']}s. Check security_test_results.txt for details.")
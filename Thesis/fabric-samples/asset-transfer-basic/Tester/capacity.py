@@ -0,0 +1,264 @@
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from thesis_client import GATEWAY_URL, NID_SERVER_URL, NO_RETRY, ApiClient
+from stats import percentile
+
+VALID_NID = "5000000001"
+DEFAULT_IMAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'NIDServer',
+                             'fingerprints_raw', f'{VALID_NID}.bmp')
+DOCTOR_IDS = ['d0001', 'd0002', 'd0003']
+HOSPITAL_IDS = ['h001', 'h002', 'h003']
+
+
+def _ehr_payload(nid_no):
+    return {
+        "doctor_id": random.choice(DOCTOR_IDS),
+        "hospital_id": random.choice(HOSPITAL_IDS),
+        "nid_no": nid_no,
+        "ehr_details": json.dumps({"diagnosis": "Capacity test", "visit_date": time.strftime("%Y-%m-%d")}),
+    }
+
+
+def make_target(name, gateway_url, nid_server_url, nid_no, image_path, pool_size):
+    """Return (description, send) where send() -> HTTP status for one request"""
+    if name == "match":
+        client = ApiClient(nid_server_url, retry=NO_RETRY, pool_maxsize=pool_size)
+        with open(image_path, "rb") as f:
+            image = f.read()
+        return f"POST {nid_server_url}/match", lambda: client.post(
+            "/match", files={"image": ("probe.bmp", image)}).status_code
+    if name == "nid":
+        client = ApiClient(nid_server_url, retry=NO_RETRY, pool_maxsize=pool_size)
+        return f"POST {nid_server_url}/nid", lambda: client.post("/nid", data={"nid_no": nid_no}).status_code
+    client = ApiClient(gateway_url, retry=NO_RETRY, pool_maxsize=pool_size)
+    if name == "patient-ehrs":
+        return f"POST {gateway_url}/patient/ehrs", lambda: client.post(
+            "/patient/ehrs", json={"nid_no": nid_no}).status_code
+    if name == "ehr-create":
+        return f"POST {gateway_url}/ehr/create/nid", lambda: client.post(
+            "/ehr/create/nid", json=_ehr_payload(nid_no)).status_code
+    raise ValueError(f"Unknown target '{name}'")
+
+
+def _call(send):
+    try:
+        status = send()
+        return status, 200 <= status < 300
+    except Exception:
+        return None, False
+
+
+def run_closed(send, concurrency, duration, warmup):
+    """``concurrency`` workers each send back-to-back requests"""
+    samples = []
+    lock = threading.Lock()
+    start = time.perf_counter()
+    measure_from, stop_at = start + warmup, start + warmup + duration
+
+    def worker():
+        local = []
+        while True:
+            sent = time.perf_counter()
+            if sent >= stop_at:
+                break
+            _, ok = _call(send)
+            if sent >= measure_from:
+                local.append((sent, time.perf_counter() - sent, ok))
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(int(concurrency))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, 0
+
+
+def run_open(send, rate, duration, warmup, max_in_flight):
+    """
+    Requests arrive at a fixed ``rate`` regardless of how fast the server
+    answers. Latency is measured from each request's scheduled time, so
+    queueing behind a slow server is counted rather than hidden.
+    """
+    samples = []
+    lock = threading.Lock()
+    in_flight = [0]
+    dropped = 0
+    start = time.perf_counter()
+    measure_from = start + warmup
+
+    def task(due):
+        _, ok = _call(send)
+        finished = time.perf_counter()
+        with lock:
+            in_flight[0] -= 1
+            if due >= measure_from:
+                samples.append((due, finished - due, ok))
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        for i in range(int(rate * (warmup + duration))):
+            due = start + i / rate
+            wait = due - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            with lock:
+                if in_flight[0] >= max_in_flight:
+                    # The load generator itself is out of workers; count it
+                    # as a failure instead of silently slowing the arrivals
+                    if due >= measure_from:
+                        dropped += 1
+                        samples.append((due, time.perf_counter() - due, False))
+                    continue
+                in_flight[0] += 1
+            pool.submit(task, due)
+    return samples, dropped
+
+
+def measure_step(send, mode, level, duration, warmup, max_in_flight):
+    if mode == "concurrency":
+        samples, dropped = run_closed(send, level, duration, warmup)
+    else:
+        samples, dropped = run_open(send, level, duration, warmup, max_in_flight)
+    latencies = sorted(latency for _, latency, _ in samples)
+    successes = sum(1 for _, _, ok in samples if ok)
+    # Requests started in the window may finish after it; spread their
+    # completions over the real span so throughput isn't overstated
+    span = duration
+    if samples:
+        first_sent = min(sent for sent, _, _ in samples)
+        last_done = max(sent + latency for sent, latency, _ in samples)
+        span = max(duration, last_done - first_sent)
+
+    def ms(value):
+        return round(value * 1000, 2) if value is not None else None
+
+    return {
+        "level": level,
+        "requests": len(samples),
+        "throughput": round(successes / span, 2),
+        "error_rate": round(1 - successes / len(samples), 4) if samples else 1.0,
+        "dropped": dropped,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+    }
+
+
+def find_saturation(send, mode="concurrency", start=1, factor=2.0, max_level=1024, refine=3,
+                    slo_p99_ms=1000, max_error_rate=0.01, duration=10, warmup=2, max_in_flight=512,
+                    progress=True):
+    """
+    Step the load up geometrically until a step breaks the SLO, then bisect
+    between the last passing and first failing level ``refine`` times.
+
+    A step passes when its p99 latency and error rate are both within the
+    SLO. Returns the knee (highest passing level), the best sustained
+    throughput and every measured step, sorted by level.
+    """
+    curve = []
+
+    def run(level):
+        step = measure_step(send, mode, level, duration, warmup, max_in_flight)
+        step["passed"] = (step["requests"] > 0 and step["error_rate"] <= max_error_rate
+                          and step["p99_ms"] is not None and step["p99_ms"] <= slo_p99_ms)
+        curve.append(step)
+        if progress:
+            print(f"  {mode} {level:>8}: {step['throughput']:>9} req/s, p99 {step['p99_ms']} ms, "
+                  f"errors {step['error_rate']:.2%} -> {'ok' if step['passed'] else 'SLO broken'}")
+        return step["passed"]
+
+    integral = mode == "concurrency"
+    good, bad = None, None
+    level = start
+    while level <= max_level:
+        if not run(level):
+            bad = level
+            break
+        good = level
+        next_level = level * factor
+        level = max(level + 1, int(next_level)) if integral else round(next_level, 2)
+
+    for _ in range(refine):
+        if bad is None:
+            break
+        low = good or 0
+        mid = (low + bad) // 2 if integral else round((low + bad) / 2, 2)
+        if mid <= low or mid >= bad:
+            break
+        if run(mid):
+            good = mid
+        else:
+            bad = mid
+
+    passing = [step for step in curve if step["passed"]]
+    best = max(passing, key=lambda step: step["throughput"]) if passing else None
+    return {
+        "mode": mode,
+        "slo": {"p99_ms": slo_p99_ms, "max_error_rate": max_error_rate},
+        "knee_level": good,
+        "first_failing_level": bad,
+        "max_sustainable_throughput": best["throughput"] if best else 0,
+        "max_sustainable_at": best["level"] if best else None,
+        "curve": sorted(curve, key=lambda step: step["level"]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find the load at which a route stops meeting its latency SLO")
+    parser.add_argument("target", choices=("patient-ehrs", "ehr-create", "match", "nid"))
+    parser.add_argument("--mode", choices=("concurrency", "rate"), default="concurrency",
+                        help="Step closed-loop workers, or open-loop arrivals per second")
+    parser.add_argument("--start", type=float, default=1, help="First concurrency or rate")
+    parser.add_argument("--factor", type=float, default=2.0, help="Growth per step before the SLO breaks")
+    parser.add_argument("--max-level", type=float, default=1024)
+    parser.add_argument("--refine", type=int, default=3, help="Bisection steps around the knee")
+    parser.add_argument("--slo-p99-ms", type=float, default=1000)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--duration", type=float, default=10, help="Measured seconds per step")
+    parser.add_argument("--warmup", type=float, default=2, help="Unmeasured seconds before each step")
+    parser.add_argument("--max-in-flight", type=int, default=512, help="Open-loop worker cap")
+    parser.add_argument("--gateway-url", default=GATEWAY_URL)
+    parser.add_argument("--nid-server-url", default=NID_SERVER_URL)
+    parser.add_argument("--nid", default=VALID_NID)
+    parser.add_argument("--image", default=DEFAULT_IMAGE, help="Probe image for the match target")
+    parser.add_argument("--json", help="Write the report with the full curve to this file")
+    args = parser.parse_args()
+
+    start = int(args.start) if args.mode == "concurrency" else args.start
+    max_level = int(args.max_level) if args.mode == "concurrency" else args.max_level
+    pool_size = int(max_level) if args.mode == "concurrency" else args.max_in_flight
+    description, send = make_target(args.target, args.gateway_url, args.nid_server_url, args.nid,
+                                    args.image, pool_size)
+    print(f"Searching capacity of {description} (p99 <= {args.slo_p99_ms} ms, "
+          f"errors <= {args.max_error_rate:.1%})")
+
+    report = find_saturation(send, args.mode, start, args.factor, max_level, args.refine, args.slo_p99_ms,
+                             args.max_error_rate, args.duration, args.warmup, args.max_in_flight)
+    report["target"] = description
+
+    print(f"{args.mode:>12} {'req/s':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'errors':>8}  SLO")
+    for step in report["curve"]:
+        print(f"{step['level']:>12} {step['throughput']:>9} {step['p50_ms']!s:>9} {step['p95_ms']!s:>9} "
+              f"{step['p99_ms']!s:>9} {step['error_rate']:>8.2%}  {'ok' if step['passed'] else 'broken'}")
+    if report["knee_level"] is None:
+        print("The SLO was broken at the first step; lower --start")
+    else:
+        print(f"Knee at {args.mode} {report['knee_level']} (first failure: {report['first_failing_level']}); "
+              f"max sustainable throughput {report['max_sustainable_throughput']} req/s "
+              f"at {report['max_sustainable_at']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
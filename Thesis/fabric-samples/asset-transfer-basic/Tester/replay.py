@@ -0,0 +1,264 @@
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from thesis_client import NO_RETRY, ApiClient
+from thesis_client.capture import TrafficRecorder, entry_body, normalize_route, read_capture
+from stats import percentile
+
+# Headers that belong to a single hop and must not be forwarded
+HOP_HEADERS = {"connection", "keep-alive", "proxy-connection", "transfer-encoding", "te", "trailer",
+               "upgrade", "host", "content-length", "content-encoding"}
+PROXY_TIMEOUT = (3.05, 300)
+MAX_CONCURRENCY = 256
+
+
+def peak_concurrency(entries):
+    """Most requests that were in flight at once in the capture"""
+    events = []
+    for entry in entries:
+        events.append((entry["ts"], 1))
+        events.append((entry["ts"] + (entry.get("elapsed") or 0), -1))
+    peak = current = 0
+    # Ends sort before starts at the same instant
+    for _, change in sorted(events):
+        current += change
+        peak = max(peak, current)
+    return peak
+
+
+# --- Capture proxy -----------------------------------------------------------
+
+def make_proxy(listen_port, upstream, recorder):
+    """Reverse proxy in front of the gateway or NID server that records every request"""
+    client = recorder.attach(ApiClient(upstream, timeout=PROXY_TIMEOUT, retry=NO_RETRY, pool_maxsize=64))
+
+    class ProxyHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _forward(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else None
+            headers = {k: v for k, v in self.headers.items() if k.lower() not in HOP_HEADERS}
+            if self.headers.get("Content-Encoding"):
+                headers["Content-Encoding"] = self.headers["Content-Encoding"]
+            try:
+                response = client.request(self.command, self.path, data=body, headers=headers,
+                                          allow_redirects=False)
+            except Exception as e:
+                message = f"Upstream error: {e}".encode()
+                self.send_response(502)
+                self.send_header("Content-Length", str(len(message)))
+                self.end_headers()
+                self.wfile.write(message)
+                return
+            # requests already decoded the body, so drop the upstream encoding
+            self.send_response(response.status_code)
+            for key, value in response.headers.items():
+                if key.lower() not in HOP_HEADERS:
+                    self.send_header(key, value)
+            self.send_header("Content-Length", str(len(response.content)))
+            self.end_headers()
+            self.wfile.write(response.content)
+
+        do_GET = do_POST = do_PUT = do_DELETE = do_PATCH = _forward
+
+    server = ThreadingHTTPServer(("0.0.0.0", listen_port), ProxyHandler)
+    server.daemon_threads = True
+    return server
+
+
+# --- Replay ------------------------------------------------------------------
+
+def replay(entries, speed=1.0, concurrency=None, target=None, mapping=None, timeout=30):
+    """
+    Re-issue captured requests and measure them.
+
+    With a ``speed`` factor each request is dispatched at its original
+    offset divided by the factor, so bursts and gaps keep their shape.
+    ``speed=None`` sends as fast as ``concurrency`` allows, which defaults
+    to the capture's peak in-flight count. Dispatch lag (how late a
+    request left versus its schedule) is reported so a replayer that
+    can't keep up is visible.
+    """
+    mapping = mapping or {}
+    playable, skipped = [], 0
+    for entry in entries:
+        body = entry_body(entry)
+        if body is None:
+            skipped += 1
+            continue
+        playable.append((entry, body))
+    if not playable:
+        raise ValueError("Capture has no replayable requests (recorded with --bodies hash/none?)")
+
+    peak = peak_concurrency(entries)
+    if concurrency is None:
+        concurrency = peak if speed is None else peak * math.ceil(speed)
+        concurrency = max(4, min(MAX_CONCURRENCY, concurrency))
+
+    clients = {}
+    for entry, _ in playable:
+        service = target or mapping.get(entry["service"], entry["service"])
+        if service not in clients:
+            clients[service] = ApiClient(service, timeout=timeout, retry=NO_RETRY, pool_maxsize=concurrency)
+
+    results = []
+    results_lock = threading.Lock()
+    slots = threading.BoundedSemaphore(concurrency)
+    in_flight = {"now": 0, "peak": 0}
+
+    def send(entry, body, lag):
+        service = target or mapping.get(entry["service"], entry["service"])
+        start = time.perf_counter()
+        status, error = None, None
+        try:
+            response = clients[service].request(entry["method"], entry["path"], data=body or None,
+                                                headers=entry.get("headers"), allow_redirects=False)
+            status = response.status_code
+        except Exception as e:
+            error = type(e).__name__
+        elapsed = time.perf_counter() - start
+        with results_lock:
+            in_flight["now"] -= 1
+            results.append({"route": f"{entry['method']} {normalize_route(entry['path'])}",
+                            "status": status, "error": error, "elapsed": elapsed,
+                            "recorded_elapsed": entry.get("elapsed"), "lag": lag})
+        slots.release()
+
+    origin = playable[0][0]["ts"]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for entry, body in playable:
+            due = 0.0 if speed is None else (entry["ts"] - origin) / speed
+            wait = due - (time.perf_counter() - start)
+            if wait > 0:
+                time.sleep(wait)
+            slots.acquire()
+            lag = max(0.0, time.perf_counter() - start - due) if speed is not None else 0.0
+            with results_lock:
+                in_flight["now"] += 1
+                in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+            pool.submit(send, entry, body, lag)
+    duration = time.perf_counter() - start
+    for client in clients.values():
+        client.close()
+
+    return summarize(results, duration, speed, concurrency, peak, in_flight["peak"], skipped)
+
+
+def summarize(results, duration, speed, concurrency, recorded_peak, replay_peak, skipped):
+    by_route = defaultdict(list)
+    for result in results:
+        by_route[result["route"]].append(result)
+
+    def ms(value):
+        return round(value * 1000, 2) if value is not None else None
+
+    routes = {}
+    for route, items in sorted(by_route.items()):
+        latencies = sorted(r["elapsed"] for r in items)
+        recorded = sorted(r["recorded_elapsed"] for r in items if r["recorded_elapsed"] is not None)
+        routes[route] = {
+            "count": len(items),
+            "errors": sum(1 for r in items if r["error"] or (r["status"] or 0) >= 500),
+            "p50_ms": ms(percentile(latencies, 50)),
+            "p95_ms": ms(percentile(latencies, 95)),
+            "p99_ms": ms(percentile(latencies, 99)),
+            "max_ms": ms(latencies[-1]),
+            "recorded_p50_ms": ms(percentile(recorded, 50)),
+            "recorded_p95_ms": ms(percentile(recorded, 95)),
+        }
+    lags = sorted(r["lag"] for r in results)
+    return {
+        "speed": speed,
+        "concurrency": concurrency,
+        "requests": len(results),
+        "skipped": skipped,
+        "seconds": round(duration, 3),
+        "requests_per_second": round(len(results) / duration, 1) if duration else None,
+        "recorded_peak_in_flight": recorded_peak,
+        "replay_peak_in_flight": replay_peak,
+        "dispatch_lag_p99_ms": ms(percentile(lags, 99)),
+        "routes": routes,
+    }
+
+
+def parse_speed(value):
+    if value.lower() == "max":
+        return None
+    value = value.lower().rstrip("x")
+    speed = float(value)
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be positive or 'max'")
+    return speed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture gateway / NID server traffic and replay it")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    proxy_parser = subparsers.add_parser("proxy", help="Record traffic through a local reverse proxy")
+    proxy_parser.add_argument("--listen", type=int, default=18000, help="Port clients should point at")
+    proxy_parser.add_argument("--upstream", default="http://localhost:8000")
+    proxy_parser.add_argument("--output", "-o", default="capture.ndjson.gz")
+    proxy_parser.add_argument("--bodies", choices=("full", "hash", "none"), default="full",
+                              help="Store bodies (replayable), only their SHA-256, or neither")
+
+    replay_parser = subparsers.add_parser("replay", help="Re-issue a capture and report latency per route")
+    replay_parser.add_argument("capture")
+    replay_parser.add_argument("--speed", type=parse_speed, default=1.0, help="1, 10, 10x ... or max")
+    replay_parser.add_argument("--concurrency", type=int, default=None,
+                               help="Max in-flight requests (default: from the capture)")
+    replay_parser.add_argument("--target", help="Send every request to this base URL")
+    replay_parser.add_argument("--map", action="append", default=[], metavar="RECORDED=TARGET",
+                               help="Redirect one recorded service, e.g. http://localhost:8000=http://staging:8000")
+    replay_parser.add_argument("--timeout", type=float, default=30)
+    replay_parser.add_argument("--json", help="Write the report to this JSON file")
+
+    args = parser.parse_args()
+
+    if args.command == "proxy":
+        recorder = TrafficRecorder(args.output, bodies=args.bodies)
+        server = make_proxy(args.listen, args.upstream, recorder)
+        print(f"Recording http://localhost:{args.listen} -> {args.upstream} into {args.output} (Ctrl+C to stop)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            recorder.close()
+        return
+
+    mapping = dict(item.split("=", 1) for item in args.map)
+    entries = read_capture(args.capture)
+    speed_label = "max speed" if args.speed is None else f"{args.speed:g}x"
+    print(f"Replaying {len(entries)} requests at {speed_label}...")
+    report = replay(entries, args.speed, args.concurrency, args.target, mapping, args.timeout)
+
+    print(f"{report['requests']} requests in {report['seconds']}s ({report['requests_per_second']} req/s), "
+          f"{report['skipped']} skipped, peak in flight {report['replay_peak_in_flight']} "
+          f"(recorded {report['recorded_peak_in_flight']}), dispatch lag p99 {report['dispatch_lag_p99_ms']} ms")
+    print(f"{'route':40} {'count':>7} {'errors':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'rec p50':>9}")
+    for route, stats in report["routes"].items():
+        print(f"{route:40} {stats['count']:>7} {stats['errors']:>7} {stats['p50_ms']:>9} "
+              f"{stats['p95_ms']:>9} {stats['p99_ms']:>9} {stats['recorded_p50_ms']!s:>9}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
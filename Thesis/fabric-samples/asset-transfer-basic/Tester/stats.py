@@ -0,0 +1,9 @@
+import math
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank ``pct``-th percentile (0-100) of already sorted values, or None when empty"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
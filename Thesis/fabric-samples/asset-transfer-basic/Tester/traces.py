@@ -0,0 +1,192 @@
+import argparse
+import gzip
+import json
+import os
+import sys
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from thesis_client.capture import normalize_route
+from stats import percentile
+
+BAR_WIDTH = 40
+
+
+def read_spans(paths):
+    """Spans from one or more NDJSON files (any mix of Python, gateway and NID server output)"""
+    spans = []
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    span = json.loads(line)
+                except ValueError:
+                    # A process killed mid-write leaves a partial last line
+                    continue
+                if "trace_id" in span and "span_id" in span:
+                    spans.append(span)
+    return spans
+
+
+def group_traces(spans):
+    traces = defaultdict(list)
+    for span in spans:
+        traces[span["trace_id"]].append(span)
+    for trace in traces.values():
+        trace.sort(key=lambda span: span["start"])
+    return traces
+
+
+def build_tree(trace):
+    """(roots, children by span_id); spans whose parent wasn't recorded become roots"""
+    ids = {span["span_id"] for span in trace}
+    children = defaultdict(list)
+    roots = []
+    for span in trace:
+        if span.get("parent_id") in ids:
+            children[span["parent_id"]].append(span)
+        else:
+            roots.append(span)
+    return roots, children
+
+
+def self_times(trace):
+    """{span_id: duration minus time covered by its direct children}"""
+    _, children = build_tree(trace)
+    result = {}
+    for span in trace:
+        covered = 0.0
+        cursor = span["start"]
+        # Children may overlap (parallel IPFS/Fabric calls), count covered time once
+        for child in sorted(children.get(span["span_id"], []), key=lambda c: c["start"]):
+            begin = max(cursor, child["start"])
+            end = child["start"] + child["duration"]
+            if end > begin:
+                covered += end - begin
+                cursor = end
+        result[span["span_id"]] = max(0.0, span["duration"] - covered)
+    return result
+
+
+def trace_duration(trace):
+    start = min(span["start"] for span in trace)
+    return max(span["start"] + span["duration"] for span in trace) - start
+
+
+def waterfall(trace):
+    """Lines of an indented timeline, offsets and durations in ms"""
+    roots, children = build_tree(trace)
+    origin = min(span["start"] for span in trace)
+    total = trace_duration(trace) or 1e-9
+    selfs = self_times(trace)
+    lines = []
+
+    def walk(span, depth):
+        offset = span["start"] - origin
+        left = int(offset / total * BAR_WIDTH)
+        width = max(1, int(round(span["duration"] / total * BAR_WIDTH)))
+        bar = " " * left + "#" * min(width, BAR_WIDTH - left)
+        attrs = span.get("attrs") or {}
+        note = f" [{attrs['status']}]" if attrs.get("status") is not None else ""
+        if attrs.get("error"):
+            note += f" !{attrs['error']}"
+        lines.append(f"{offset * 1000:>9.1f} {span['duration'] * 1000:>9.1f} {selfs[span['span_id']] * 1000:>9.1f}"
+                     f"  |{bar:<{BAR_WIDTH}}|  {'  ' * depth}{span['service']}: {span['name']}{note}")
+        for child in sorted(children.get(span["span_id"], []), key=lambda c: c["start"]):
+            walk(child, depth + 1)
+
+    for root in sorted(roots, key=lambda span: span["start"]):
+        walk(root, 0)
+    return lines
+
+
+def group_name(name):
+    """'GET /doctor/d0001' -> 'GET /doctor/:id' so per-id requests aggregate"""
+    method, _, path = name.partition(" ")
+    return f"{method} {normalize_route(path)}" if path.startswith("/") else name
+
+
+def hotspots(traces):
+    """
+    Aggregate by (service, span name): how often it ran, its total and
+    self time, and latency percentiles. Self time is where a stage spent
+    time itself rather than waiting on the hops below it.
+    """
+    stats = defaultdict(lambda: {"count": 0, "total": 0.0, "self": 0.0, "durations": []})
+    wall = 0.0
+    for trace in traces.values():
+        wall += trace_duration(trace)
+        selfs = self_times(trace)
+        for span in trace:
+            entry = stats[(span["service"], group_name(span["name"]))]
+            entry["count"] += 1
+            entry["total"] += span["duration"]
+            entry["self"] += selfs[span["span_id"]]
+            entry["durations"].append(span["duration"])
+    rows = []
+    for (service, name), entry in stats.items():
+        durations = sorted(entry["durations"])
+        rows.append({
+            "service": service,
+            "name": name,
+            "count": entry["count"],
+            "total_ms": round(entry["total"] * 1000, 2),
+            "self_ms": round(entry["self"] * 1000, 2),
+            "self_share": round(entry["self"] / wall, 4) if wall else None,
+            "p50_ms": round(percentile(durations, 50) * 1000, 2),
+            "p95_ms": round(percentile(durations, 95) * 1000, 2),
+            "max_ms": round(durations[-1] * 1000, 2),
+        })
+    rows.sort(key=lambda row: row["self_ms"], reverse=True)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge THESIS_TRACE span files into waterfalls and hot spots")
+    parser.add_argument("files", nargs="+", help="NDJSON span files from the clients, gateway and NID server")
+    parser.add_argument("--trace", help="Show only this trace id")
+    parser.add_argument("--slowest", type=int, default=3, help="Waterfalls for the N slowest traces")
+    parser.add_argument("--top", type=int, default=15, help="Hot spot rows to print")
+    parser.add_argument("--json", help="Write hot spots and per-trace durations to this file")
+    args = parser.parse_args()
+
+    traces = group_traces(read_spans(args.files))
+    if args.trace:
+        traces = {trace_id: trace for trace_id, trace in traces.items() if trace_id.startswith(args.trace)}
+    if not traces:
+        print("No spans found")
+        return
+
+    durations = sorted(trace_duration(trace) for trace in traces.values())
+    print(f"{sum(len(t) for t in traces.values())} spans in {len(traces)} traces; "
+          f"end-to-end p50 {percentile(durations, 50) * 1000:.1f} ms, "
+          f"p95 {percentile(durations, 95) * 1000:.1f} ms, max {durations[-1] * 1000:.1f} ms")
+
+    slowest = sorted(traces.items(), key=lambda item: trace_duration(item[1]), reverse=True)
+    for trace_id, trace in slowest[:args.slowest]:
+        print(f"\nTrace {trace_id} ({trace_duration(trace) * 1000:.1f} ms, {len(trace)} spans)")
+        print(f"{'start ms':>9} {'dur ms':>9} {'self ms':>9}  {'':<{BAR_WIDTH + 2}}  span")
+        for line in waterfall(trace):
+            print(line)
+
+    rows = hotspots(traces)
+    print("\nHot spots by self time")
+    print(f"{'service':<16} {'span':<40} {'count':>6} {'self ms':>10} {'share':>7} {'p50 ms':>9} {'p95 ms':>9}")
+    for row in rows[:args.top]:
+        share = f"{row['self_share']:.1%}" if row["self_share"] is not None else "-"
+        print(f"{row['service']:<16} {row['name'][:40]:<40} {row['count']:>6} {row['self_ms']:>10.1f} "
+              f"{share:>7} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"hotspots": rows,
+                       "traces": {trace_id: round(trace_duration(trace) * 1000, 2)
+                                  for trace_id, trace in traces.items()}}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
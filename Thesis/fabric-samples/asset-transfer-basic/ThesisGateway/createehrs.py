@@ -1,3 +1,4 @@
+import argparse
 import random
 import json
 import time
@@ -111,7 +112,20 @@ def invoke_smart_contract(ehr_data):
     time.sleep(0.1)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic EHR records")
+    parser.add_argument("--output", "-o", default="ehr_records.json", help="Output file (default: ehr_records.json)")
+    parser.add_argument("--format", choices=["json", "ndjson"], default="json",
+                        help="json writes one array; ndjson writes one record per line")
+    parser.add_argument("--append", action="store_true",
+                        help="Append to an existing NDJSON log instead of overwriting it")
+    args = parser.parse_args()
+
     ehr_list = generate_patient_ehrs()
-    with open("ehr_records.json", "w") as file:
-        json.dump(ehr_list, file, indent=4)
-    print("EHR data generation complete. Records saved to ehr_records.json.")
+    if args.format == "ndjson":
+        with open(args.output, "a" if args.append else "w") as file:
+            for ehr in ehr_list:
+                file.write(json.dumps(ehr) + "\n")
+    else:
+        with open(args.output, "w") as file:
+            json.dump(ehr_list, file, indent=4)
+    print(f"EHR data generation complete. Records saved to {args.output}.")
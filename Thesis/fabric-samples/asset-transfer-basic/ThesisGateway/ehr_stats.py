@@ -0,0 +1,203 @@
+import argparse
+import json
+import os
+import time
+from collections import Counter, defaultdict
+
+from research_export import (calculate_age, calculate_age_group, flatten_medications,
+                             normalize_gender, parse_date, split_diagnoses)
+
+SNAPSHOT_VERSION = 1
+DEFAULT_SNAPSHOT = 'ehr_stats.json'
+# Records processed between checkpoints of the snapshot and offsets
+CHECKPOINT_EVERY = 50000
+
+
+def _bucket(value, width):
+    digits = ''.join(c for c in str(value or '').split('/')[0] if c.isdigit())
+    if not digits:
+        return 'Unknown'
+    low = int(digits) // width * width
+    return f'{low}-{low + width - 1}'
+
+
+class StatsMaterializer:
+    """
+    Running EHR aggregates that can be advanced one record at a time.
+
+    The public ``stats`` mirror the fields of getEHRStats in ehrService.js
+    plus histograms and per-hospital / per-age-group breakdowns. Distinct
+    ID sets needed for the totals are kept in a separate state file so the
+    snapshot dashboards read stays small.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.distinct = {'patients': set(), 'doctors': set(), 'hospitals': set()}
+        self.counters = defaultdict(Counter)
+        self.breakdowns = {'byHospital': defaultdict(Counter), 'byAgeGroup': defaultdict(Counter)}
+        self.offsets = {}
+
+    def add(self, record):
+        details = record.get('ehr_details') or record.get('details') or {}
+        if isinstance(details, str):
+            details = json.loads(details)
+        tests = details.get('test_results') or {}
+        hospital = record.get('hospital_id') or 'Unknown'
+        # Age at the visit keeps a record's bucket stable across runs
+        visit = parse_date(details.get('visit_date'))
+        age_group = calculate_age_group(calculate_age(details.get('date_of_birth'), visit))
+
+        self.total += 1
+        patient = record.get('patient_id') or record.get('nid_no')
+        if patient:
+            self.distinct['patients'].add(str(patient))
+        if record.get('doctor_id'):
+            self.distinct['doctors'].add(record['doctor_id'])
+        self.distinct['hospitals'].add(hospital)
+
+        diagnoses = split_diagnoses(details.get('diagnosis')) if details else []
+        self.counters['diagnosisCount'].update(diagnoses)
+        self.counters['medicationCount'].update(flatten_medications(details.get('medications')))
+        self.counters['hospitalCount'][hospital] += 1
+        self.counters['doctorCount'][record.get('doctor_id') or 'Unknown'] += 1
+        if details:
+            self.counters['allergyCount'][tests.get('allergy') or 'None'] += 1
+            self.counters['ageGroupCount'][age_group] += 1
+            self.counters['genderCount'][normalize_gender(details.get('gender'))] += 1
+            self.counters['visitMonthCount'][visit.strftime('%Y-%m') if visit else 'Unknown'] += 1
+            self.counters['cholesterolHistogram'][_bucket(tests.get('cholesterol'), 25)] += 1
+            self.counters['systolicHistogram'][_bucket(tests.get('blood_pressure'), 10)] += 1
+            self.breakdowns['byHospital'][hospital].update(diagnoses)
+            self.breakdowns['byAgeGroup'][age_group].update(diagnoses)
+
+    def consume(self, path, checkpoint=None):
+        """
+        Process the NDJSON lines appended to ``path`` since the last run.
+
+        A trailing line without a newline is treated as still being written
+        and is left for the next run. Returns the number of new records.
+        """
+        key = os.path.abspath(path)
+        position = self.offsets.get(key, {'offset': 0})
+        size = os.path.getsize(path)
+        offset = position['offset']
+        if size < offset:
+            print(f"Warning: {path} shrank below its checkpoint, reading it from the start")
+            offset = 0
+
+        processed = 0
+        with open(path, 'rb') as file:
+            file.seek(offset)
+            for line in file:
+                if not line.endswith(b'\n'):
+                    break
+                offset += len(line)
+                if not line.strip():
+                    continue
+                self.add(json.loads(line))
+                processed += 1
+                if checkpoint and processed % CHECKPOINT_EVERY == 0:
+                    self.offsets[key] = {'offset': offset}
+                    checkpoint(self)
+        self.offsets[key] = {'offset': offset}
+        return processed
+
+    def stats(self):
+        stats = {
+            'totalEHRs': self.total,
+            'totalPatients': len(self.distinct['patients']),
+            'totalDoctors': len(self.distinct['doctors']),
+            'totalHospitals': len(self.distinct['hospitals']),
+        }
+        for name, counter in self.counters.items():
+            stats[name] = dict(counter.most_common())
+        for name, breakdown in self.breakdowns.items():
+            stats[name] = {key: dict(counter.most_common()) for key, counter in sorted(breakdown.items())}
+        return stats
+
+    def save(self, snapshot_path):
+        """Atomically write the public snapshot and its private state file"""
+        _write_json(snapshot_path, {
+            'version': SNAPSHOT_VERSION,
+            'updated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'offsets': self.offsets,
+            'stats': self.stats(),
+        })
+        _write_json(_state_path(snapshot_path), {
+            'version': SNAPSHOT_VERSION,
+            'offsets': self.offsets,
+            'total': self.total,
+            'distinct': {name: sorted(values) for name, values in self.distinct.items()},
+            'counters': self.counters,
+            'breakdowns': self.breakdowns,
+        })
+
+    @classmethod
+    def load(cls, snapshot_path):
+        materializer = cls()
+        state_path = _state_path(snapshot_path)
+        if not os.path.exists(state_path):
+            return materializer
+        with open(state_path, 'r', encoding='utf-8') as file:
+            state = json.load(file)
+        if state.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"{state_path}: unsupported snapshot version {state.get('version')}")
+        materializer.offsets = state['offsets']
+        materializer.distinct = {name: set(values) for name, values in state['distinct'].items()}
+        for name, counts in state['counters'].items():
+            materializer.counters[name] = Counter(counts)
+        for name, breakdown in state['breakdowns'].items():
+            for key, counts in breakdown.items():
+                materializer.breakdowns[name][key] = Counter(counts)
+        materializer.total = state['total']
+        return materializer
+
+
+def _state_path(snapshot_path):
+    return snapshot_path + '.state'
+
+
+def _write_json(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(data, file, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(snapshot_path=DEFAULT_SNAPSHOT):
+    """Return the precomputed stats for dashboards"""
+    with open(snapshot_path, 'r', encoding='utf-8') as file:
+        return json.load(file)['stats']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally materialize EHR statistics from NDJSON record logs")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    update_parser = subparsers.add_parser('update', help='Fold newly appended records into the snapshot')
+    update_parser.add_argument('inputs', nargs='+', help='NDJSON record or event logs')
+    update_parser.add_argument('--snapshot', '-s', default=DEFAULT_SNAPSHOT)
+    update_parser.add_argument('--rebuild', action='store_true', help='Ignore the existing snapshot and start over')
+
+    show_parser = subparsers.add_parser('show', help='Print the precomputed stats')
+    show_parser.add_argument('--snapshot', '-s', default=DEFAULT_SNAPSHOT)
+
+    args = parser.parse_args()
+
+    if args.command == 'show':
+        print(json.dumps(read_snapshot(args.snapshot), indent=2, ensure_ascii=False))
+        return
+
+    materializer = StatsMaterializer() if args.rebuild else StatsMaterializer.load(args.snapshot)
+    start = time.perf_counter()
+    processed = 0
+    for path in args.inputs:
+        processed += materializer.consume(path, checkpoint=lambda m: m.save(args.snapshot))
+    materializer.save(args.snapshot)
+    print(f"Processed {processed} new records in {time.perf_counter() - start:.2f}s; "
+          f"snapshot covers {materializer.total} EHRs -> {args.snapshot}")
+
+
+if __name__ == '__main__':
+    main()
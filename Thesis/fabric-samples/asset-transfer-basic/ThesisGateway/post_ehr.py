@@ -1,47 +1,93 @@
+import argparse
 import json
 import os
-import requests
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'NIDServer'))
+from thesis_client import GatewayClient
+from fparchive import FingerprintArchive
+
+parser = argparse.ArgumentParser(description="Post ehr_records.json to the gateway")
+parser.add_argument("--batch-size", type=int, default=1,
+                    help="Above 1, send records by NID through /ehr/create/batch without fingerprints "
+                         "(patients must already be registered)")
+args = parser.parse_args()
 
 # Load EHR JSON data
 with open("ehr_records.json", "r") as file:
     ehr_data = json.load(file)
 
-# API endpoint
-url = "http://localhost:8000/ehr/create"  # Replace with actual API URL
+# Pooled client for the gateway (GATEWAY_URL overrides http://localhost:8000)
+client = GatewayClient()
 
 # Path to fingerprint images
 fingerprint_folder = "fingerprints_raw"
+# Packed archive (NIDServer/fparchive.py), read instead of the folder when present
+fingerprint_archive = "fingerprints.fpa"
+archive = FingerprintArchive(fingerprint_archive) if os.path.exists(fingerprint_archive) else None
+
+def read_fingerprint(nid_no):
+    """Image bytes for a NID, or None if there is no fingerprint"""
+    if archive is not None:
+        return archive.get(nid_no) if str(nid_no).isdigit() else None
+    fingerprint_path = os.path.join(fingerprint_folder, f"{nid_no}.bmp")
+    if not os.path.exists(fingerprint_path):
+        return None
+    with open(fingerprint_path, "rb") as fingerprint_file:
+        return fingerprint_file.read()
+
+def post_batches(batch_size):
+    """Send records in /ehr/create/batch requests of batch_size"""
+    for i in range(0, len(ehr_data), batch_size):
+        batch = ehr_data[i:i + batch_size]
+        payloads = [{
+            "nid_no": ehr.get("nid_no", ""),
+            "doctor_id": ehr["doctor_id"],
+            "hospital_id": ehr["hospital_id"],
+            "ehr_details": json.dumps(ehr["ehr_details"], ensure_ascii=False)
+        } for ehr in batch]
+        response = client.create_ehr_batch(payloads)
+        print(f"📤 Sent batch of {len(batch)} EHRs | Status: {response.status_code}")
+        try:
+            body = response.json()
+        except Exception:
+            print(f"❌ Error in response: {response.text}")
+            continue
+        for result in body.get("results", []):
+            if result["status"] != 201:
+                print(f"❌ NID {result['nid_no']}: {result['status']} - {result.get('error')}")
+        print(f"✅ Created {body.get('created', 0)}, failed {body.get('failed', 0)}")
+
+if args.batch_size > 1:
+    post_batches(args.batch_size)
+    sys.exit(0)
 
 counter = 5
 # Process and send each EHR record
 for ehr in ehr_data:
     nid_no = ehr.get("nid_no", "")
-    fingerprint_path = os.path.join(fingerprint_folder, f"{nid_no}.bmp")
+    fingerprint = read_fingerprint(nid_no)
 
-    if not os.path.exists(fingerprint_path):
+    if fingerprint is None:
         print(f"⚠️ No fingerprint file found for NID: {nid_no}, skipping...")
         continue
 
     # Debugging: Check ehr_details format before sending
     # print(f"📄 EHR Details for {nid_no}: {json.dumps(ehr['ehr_details'], indent=2, ensure_ascii=False)}")
 
-    with open(fingerprint_path, "rb") as fingerprint_file:
-        files = {"fingerprint": fingerprint_file}
-        data = {
-            "nid_no": nid_no,
-            "doctor_id": ehr["doctor_id"],
-            "hospital_id": ehr["hospital_id"],
-            "ehr_details": json.dumps(ehr["ehr_details"], ensure_ascii=False)  # Proper JSON format
-        }
-
-        response = requests.post(url, data=data, files=files)
-
-        # Print API response
-        print(f"📤 Sent EHR for NID: {nid_no} | Status: {response.status_code}")
-        try:
-            print(f"✅ Response: {response.json()}")
-        except Exception:
-            print(f"❌ Error in response: {response.text}")
+    data = {
+        "nid_no": nid_no,
+        "doctor_id": ehr["doctor_id"],
+        "hospital_id": ehr["hospital_id"],
+        "ehr_details": json.dumps(ehr["ehr_details"], ensure_ascii=False)  # Proper JSON format
+    }
 
+    response = client.create_ehr_with_fingerprint(data, fingerprint, f"{nid_no}.bmp")
 
-    
+    # Print API response
+    print(f"📤 Sent EHR for NID: {nid_no} | Status: {response.status_code}")
+    try:
+        print(f"✅ Response: {response.json()}")
+    except Exception:
+        print(f"❌ Error in response: {response.text}")
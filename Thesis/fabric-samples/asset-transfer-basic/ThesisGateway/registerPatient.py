@@ -1,29 +1,46 @@
 import os
-import requests
+import sys
 
-# API endpoint for patient registration
-url = "http://localhost:8000/patient/register"  # Replace with actual API URL
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'NIDServer'))
+from thesis_client import GatewayClient
+from thesis_client.tracing import shared_tracer
+from fparchive import FingerprintArchive
+
+# Pooled client for the gateway (GATEWAY_URL overrides http://localhost:8000)
+client = GatewayClient()
+# With THESIS_TRACE set, each registration is one trace through the gateway
+# and NID server (Tester/traces.py merges the span files)
+tracer = shared_tracer()
 
 # Path to fingerprint images
 fingerprint_folder = "fingerprints_raw"  # Update if needed
+# Packed archive (NIDServer/fparchive.py), read instead of the folder when present
+fingerprint_archive = "fingerprints.fpa"
+
+def iter_fingerprints():
+    """Yield (filename, image bytes) from the archive or the folder"""
+    if os.path.exists(fingerprint_archive):
+        with FingerprintArchive(fingerprint_archive) as archive:
+            for nid, data in archive.iter_images():
+                yield f"{nid}.bmp", data
+        return
+    for filename in os.listdir(fingerprint_folder):
+        if filename.endswith(".bmp"):  # Ensure only BMP files are processed
+            with open(os.path.join(fingerprint_folder, filename), "rb") as fingerprint_file:
+                yield filename, fingerprint_file.read()
 
 counter = 5
 # Process and send each fingerprint image
-for filename in os.listdir(fingerprint_folder):
-    if filename.endswith(".bmp"):  # Ensure only BMP files are processed
-        fingerprint_path = os.path.join(fingerprint_folder, filename)
-
-        print(f"📄 Processing: {filename}")
-
-        with open(fingerprint_path, "rb") as fingerprint_file:
-            files = {"fingerprint": fingerprint_file}
+for filename, fingerprint in iter_fingerprints():
+    print(f"📄 Processing: {filename}")
 
-            response = requests.post(url, files=files)
+    with tracer.span("register_patient", filename=filename):
+        response = client.register_patient(fingerprint, filename)
 
-            # Print API response
-            print(f"📤 Sent {filename} | Status: {response.status_code}")
-            try:
-                print(f"✅ Response: {response.json()}")
-            except Exception:
-                print(f"❌ Error in response: {response.text}")
-    
+    # Print API response
+    print(f"📤 Sent {filename} | Status: {response.status_code}")
+    try:
+        print(f"✅ Response: {response.json()}")
+    except Exception:
+        print(f"❌ Error in response: {response.text}")
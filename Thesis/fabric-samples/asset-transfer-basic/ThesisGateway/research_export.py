@@ -0,0 +1,394 @@
+import argparse
+import json
+import os
+import sys
+import time
+from array import array
+from datetime import date, datetime
+from functools import lru_cache
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'NIDServer'))
+from json_stream import iter_records
+
+# Same buckets as calculateAgeGroup in src/services/researcherService.js
+AGE_GROUPS = ['0-20', '21-35', '36-50', '51-65', '65+', 'Unknown']
+DATE_FORMATS = ['%Y-%m-%d', '%d/%m/%Y']
+UNKNOWN = 'Unknown'
+
+# Single-valued categorical columns, stored as int32 codes into a dictionary
+CATEGORICAL = ['doctor', 'hospital', 'gender', 'age_group', 'blood_group', 'allergy']
+# Multi-valued columns, stored as (row index, code) pairs
+MULTI_VALUED = ['diagnosis', 'medication']
+# Filter keyword -> column name
+FILTERS = {
+    'doctors': 'doctor',
+    'hospitals': 'hospital',
+    'genders': 'gender',
+    'age_groups': 'age_group',
+    'blood_groups': 'blood_group',
+    'allergies': 'allergy',
+    'diagnoses': 'diagnosis',
+    'medications': 'medication',
+}
+
+
+@lru_cache(maxsize=65536)
+def parse_date(value):
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(str(value).strip(), fmt).date()
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def date_argument(value):
+    """argparse type for --visit-from / --visit-to"""
+    parsed = parse_date(value)
+    if parsed is None:
+        raise argparse.ArgumentTypeError(f"'{value}' is not a date ({' or '.join(DATE_FORMATS)})")
+    return parsed
+
+
+def _epoch_day(value):
+    parsed = value if isinstance(value, date) else parse_date(value)
+    if parsed is None:
+        raise ValueError(f"'{value}' is not a date ({' or '.join(DATE_FORMATS)})")
+    return (parsed - date(1970, 1, 1)).days
+
+
+def calculate_age(date_of_birth, today=None):
+    born = parse_date(date_of_birth) if date_of_birth else None
+    if born is None:
+        return None
+    today = today or date.today()
+    age = today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+    return age if age >= 0 else None
+
+
+def calculate_age_group(age):
+    if age is None:
+        return UNKNOWN
+    if age <= 20:
+        return '0-20'
+    elif age <= 35:
+        return '21-35'
+    elif age <= 50:
+        return '36-50'
+    elif age <= 65:
+        return '51-65'
+    return '65+'
+
+
+def normalize_gender(gender):
+    if not gender:
+        return UNKNOWN
+    value = str(gender).strip().lower()
+    if value in ('m', 'male', 'man'):
+        return 'Male'
+    if value in ('f', 'female', 'woman'):
+        return 'Female'
+    return str(gender).strip() or UNKNOWN
+
+
+def iter_ehr_records(path):
+    """
+    Yield EHR records from a JSON array (ehr_records.json) or NDJSON file,
+    parsed incrementally so memory does not grow with the file.
+
+    Records carry ``ehr_details`` either as a dict (createehrs.py) or as a
+    JSON string (the ehr.py / ehr2.py API payloads); both are returned with
+    ``ehr_details`` decoded to a dict.
+    """
+    for record in iter_records(path):
+        details = record.get('ehr_details') or {}
+        if isinstance(details, str):
+            details = json.loads(details)
+        yield {**record, 'ehr_details': details}
+
+
+def split_diagnoses(diagnosis):
+    if not diagnosis:
+        return [UNKNOWN]
+    return [part.strip() for part in str(diagnosis).split(',') if part.strip()] or [UNKNOWN]
+
+
+def flatten_medications(medications):
+    if not isinstance(medications, list):
+        return []
+    flat = []
+    for item in medications:
+        if isinstance(item, list):
+            flat.extend(str(m).strip() for m in item if m and str(m).strip())
+        elif item and str(item).strip():
+            flat.append(str(item).strip())
+    return flat
+
+
+def _int_prefix(text, default=-1):
+    digits = ''
+    for char in str(text or '').strip():
+        if not char.isdigit():
+            break
+        digits += char
+    return int(digits) if digits else default
+
+
+class DatasetBuilder:
+    """Accumulates EHR records into dictionary-encoded columns"""
+
+    def __init__(self, today=None):
+        self.today = today or date.today()
+        self.dictionaries = {name: {} for name in CATEGORICAL + MULTI_VALUED}
+        # Fix the age group codes so they are stable across exports
+        for group in AGE_GROUPS:
+            self._code('age_group', group)
+        self.columns = {name: array('i') for name in CATEGORICAL}
+        self.columns.update({
+            'nid': array('q'),
+            'age': array('h'),
+            'visit_day': array('i'),
+            'systolic': array('h'),
+            'diastolic': array('h'),
+            'cholesterol': array('h'),
+        })
+        self.pairs = {name: (array('i'), array('i')) for name in MULTI_VALUED}
+        self.rows = 0
+
+    def _code(self, name, value):
+        dictionary = self.dictionaries[name]
+        code = dictionary.get(value)
+        if code is None:
+            code = dictionary[value] = len(dictionary)
+        return code
+
+    def add(self, record):
+        details = record.get('ehr_details') or {}
+        tests = details.get('test_results') or {}
+        age = calculate_age(details.get('date_of_birth'), self.today)
+        visit = parse_date(details.get('visit_date'))
+        pressure = str(tests.get('blood_pressure') or '').split('/')
+
+        values = {
+            'doctor': record.get('doctor_id') or UNKNOWN,
+            'hospital': record.get('hospital_id') or UNKNOWN,
+            'gender': normalize_gender(details.get('gender')),
+            'age_group': calculate_age_group(age),
+            'blood_group': record.get('blood_group') or details.get('blood_group') or UNKNOWN,
+            'allergy': tests.get('allergy') or 'None',
+        }
+        for name, value in values.items():
+            self.columns[name].append(self._code(name, value))
+
+        self.columns['nid'].append(_int_prefix(record.get('nid_no')))
+        self.columns['age'].append(-1 if age is None else age)
+        self.columns['visit_day'].append((visit - date(1970, 1, 1)).days if visit else -1)
+        self.columns['systolic'].append(_int_prefix(pressure[0]))
+        self.columns['diastolic'].append(_int_prefix(pressure[1]) if len(pressure) > 1 else -1)
+        self.columns['cholesterol'].append(_int_prefix(tests.get('cholesterol')))
+
+        for name, items in (('diagnosis', split_diagnoses(details.get('diagnosis'))),
+                            ('medication', flatten_medications(details.get('medications')))):
+            rows, codes = self.pairs[name]
+            for item in dict.fromkeys(items):
+                rows.append(self.rows)
+                codes.append(self._code(name, item))
+        self.rows += 1
+
+    def build(self):
+        columns = {name: np.frombuffer(values, dtype=values.typecode).copy()
+                   for name, values in self.columns.items()}
+        for name, (rows, codes) in self.pairs.items():
+            columns[f'{name}_rows'] = np.frombuffer(rows, dtype=np.int32).copy()
+            columns[f'{name}_codes'] = np.frombuffer(codes, dtype=np.int32).copy()
+        dictionaries = {name: list(values) for name, values in self.dictionaries.items()}
+        return ResearchDataset(columns, dictionaries, self.today.isoformat())
+
+
+class ResearchDataset:
+    """
+    Columnar, dictionary-encoded EHR dataset for vectorized research queries.
+
+    Single-valued categories are int32 code columns; diagnoses and
+    medications are (row, code) pairs so one record can carry several.
+    """
+
+    def __init__(self, columns, dictionaries, reference_date):
+        self.columns = columns
+        self.dictionaries = dictionaries
+        self.reference_date = reference_date
+
+    def __len__(self):
+        return len(self.columns['nid'])
+
+    def save(self, path):
+        """Write a .npz file, or a directory of .npy files that load with mmap"""
+        meta = {'dictionaries': self.dictionaries, 'reference_date': self.reference_date}
+        if path.endswith('.npz'):
+            np.savez(path, _meta=np.array(json.dumps(meta)), **self.columns)
+            return
+        os.makedirs(path, exist_ok=True)
+        for name, values in self.columns.items():
+            np.save(os.path.join(path, f'{name}.npy'), values)
+        with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as file:
+            json.dump(meta, file, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        if path.endswith('.npz'):
+            with np.load(path) as data:
+                meta = json.loads(str(data['_meta']))
+                columns = {name: data[name] for name in data.files if name != '_meta'}
+        else:
+            with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as file:
+                meta = json.load(file)
+            columns = {name[:-4]: np.load(os.path.join(path, name), mmap_mode='r')
+                       for name in os.listdir(path) if name.endswith('.npy')}
+        return cls(columns, meta['dictionaries'], meta['reference_date'])
+
+    def codes(self, name, values):
+        dictionary = self.dictionaries[name]
+        return np.array([dictionary.index(v) for v in values if v in dictionary], dtype=np.int32)
+
+    def _rows_with(self, name, values):
+        mask = np.zeros(len(self), dtype=bool)
+        codes = self.columns[f'{name}_codes']
+        mask[self.columns[f'{name}_rows'][np.isin(codes, self.codes(name, values))]] = True
+        return mask
+
+    def mask(self, visit_from=None, visit_to=None, min_age=None, max_age=None, **filters):
+        """
+        Boolean row mask for the given filters.
+
+        Keyword filters take lists of labels, e.g. ``genders=['Male']``,
+        ``age_groups=['36-50']``, ``diagnoses=['Asthma']``; a record
+        matches a multi-valued filter if it has any of the listed values.
+        ``visit_from`` / ``visit_to`` take dates or date strings; records
+        whose own visit date did not parse never match them.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for key, values in filters.items():
+            if not values:
+                continue
+            name = FILTERS[key]
+            if name in MULTI_VALUED:
+                mask &= self._rows_with(name, values)
+            else:
+                mask &= np.isin(self.columns[name], self.codes(name, values))
+        if visit_from or visit_to:
+            days = self.columns['visit_day']
+            # Unparsed visit dates are stored as -1
+            mask &= days >= 0
+            if visit_from:
+                mask &= days >= _epoch_day(visit_from)
+            if visit_to:
+                mask &= days <= _epoch_day(visit_to)
+        if min_age is not None:
+            mask &= self.columns['age'] >= min_age
+        if max_age is not None:
+            mask &= (self.columns['age'] >= 0) & (self.columns['age'] <= max_age)
+        return mask
+
+    def count(self, **filters):
+        return int(np.count_nonzero(self.mask(**filters)))
+
+    def _dimension(self, name, mask):
+        """Return (row indices, codes) for a column restricted to the mask"""
+        if name in MULTI_VALUED:
+            rows = self.columns[f'{name}_rows']
+            keep = mask[rows]
+            return rows[keep], self.columns[f'{name}_codes'][keep]
+        rows = np.flatnonzero(mask)
+        return rows, self.columns[name][rows]
+
+    def value_counts(self, name, mask=None):
+        mask = np.ones(len(self), dtype=bool) if mask is None else mask
+        _, codes = self._dimension(name, mask)
+        counts = np.bincount(codes, minlength=len(self.dictionaries[name]))
+        order = np.argsort(-counts, kind='stable')
+        return [(self.dictionaries[name][i], int(counts[i])) for i in order if counts[i]]
+
+    def crosstab(self, row_name, col_name, mask=None):
+        """Counts of records per (row value, column value); returns labels and matrix"""
+        if row_name in MULTI_VALUED and col_name in MULTI_VALUED:
+            raise ValueError('At most one dimension of a crosstab may be multi-valued')
+        mask = np.ones(len(self), dtype=bool) if mask is None else mask
+        if col_name in MULTI_VALUED:
+            labels_col, labels_row, table = self.crosstab(col_name, row_name, mask)
+            return labels_row, labels_col, table.T
+        rows, row_codes = self._dimension(row_name, mask)
+        col_codes = self.columns[col_name][rows]
+        n_rows, n_cols = len(self.dictionaries[row_name]), len(self.dictionaries[col_name])
+        table = np.bincount(row_codes.astype(np.int64) * n_cols + col_codes,
+                            minlength=n_rows * n_cols).reshape(n_rows, n_cols)
+        return self.dictionaries[row_name], self.dictionaries[col_name], table
+
+
+def build_dataset(paths, today=None):
+    builder = DatasetBuilder(today)
+    for path in paths:
+        for record in iter_ehr_records(path):
+            builder.add(record)
+    return builder.build()
+
+
+def _print_crosstab(row_labels, col_labels, table):
+    keep_rows = table.sum(axis=1) > 0
+    keep_cols = table.sum(axis=0) > 0
+    col_labels = [label for label, keep in zip(col_labels, keep_cols) if keep]
+    width = max([len(label) for label in row_labels] + [10])
+    print(' ' * width + ''.join(f'{label:>10}' for label in col_labels))
+    for label, row, keep in zip(row_labels, table, keep_rows):
+        if keep:
+            print(f'{label:<{width}}' + ''.join(f'{value:>10}' for value in row[keep_cols]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar research dataset export for EHR records")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Build a dataset from EHR JSON/NDJSON files')
+    build_parser.add_argument('inputs', nargs='+', help='ehr_records.json style files or NDJSON payload logs')
+    build_parser.add_argument('--output', '-o', default='research_dataset.npz',
+                              help='.npz file, or a directory of .npy columns (default: research_dataset.npz)')
+
+    query_parser = subparsers.add_parser('query', help='Filtered counts and cross-tabs over a dataset')
+    query_parser.add_argument('dataset')
+    query_parser.add_argument('--age-group', action='append', dest='age_groups')
+    query_parser.add_argument('--gender', action='append', dest='genders')
+    query_parser.add_argument('--diagnosis', action='append', dest='diagnoses')
+    query_parser.add_argument('--medication', action='append', dest='medications')
+    query_parser.add_argument('--blood-group', action='append', dest='blood_groups')
+    query_parser.add_argument('--hospital', action='append', dest='hospitals')
+    query_parser.add_argument('--visit-from', type=date_argument)
+    query_parser.add_argument('--visit-to', type=date_argument)
+    query_parser.add_argument('--crosstab', nargs=2, metavar=('ROW', 'COLUMN'))
+    query_parser.add_argument('--top', metavar='COLUMN', help='Most frequent values of a column')
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        start = time.perf_counter()
+        dataset = build_dataset(args.inputs)
+        dataset.save(args.output)
+        print(f"Exported {len(dataset)} EHRs to {args.output} in {time.perf_counter() - start:.2f}s")
+        return
+
+    dataset = ResearchDataset.load(args.dataset)
+    start = time.perf_counter()
+    mask = dataset.mask(age_groups=args.age_groups, genders=args.genders, diagnoses=args.diagnoses,
+                        medications=args.medications, blood_groups=args.blood_groups,
+                        hospitals=args.hospitals, visit_from=args.visit_from, visit_to=args.visit_to)
+    print(f"Matching records: {int(np.count_nonzero(mask))} of {len(dataset)}")
+    if args.top:
+        for label, count in dataset.value_counts(args.top, mask)[:20]:
+            print(f"  {label}: {count}")
+    if args.crosstab:
+        _print_crosstab(*dataset.crosstab(args.crosstab[0], args.crosstab[1], mask))
+    print(f"Query time: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
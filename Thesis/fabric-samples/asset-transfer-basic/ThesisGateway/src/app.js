@@ -10,12 +10,16 @@ import ehrRoutes from './routes/ehrRoutes.js';
 import patientRoutes from './routes/patientRoutes.js';
 import doctorRoutes from './routes/doctorRoutes.js';
 import researcherRoutes from './routes/researcherRoutes.js';
+import { traceRequests } from './utils/tracing.js';
 import cors from 'cors';
 
 const app = express();
 const port = 8000;
 
-app.use(express.json());
+// Joins X-Trace-Id traces; spans go to THESIS_TRACE when it is set
+app.use(traceRequests);
+// Large enough for /ehr/create/batch payloads
+app.use(express.json({ limit: process.env.JSON_BODY_LIMIT || '10mb' }));
 app.use(express.urlencoded({ extended: true }));
 app.use(cors());
 
@@ -1,9 +1,10 @@
 import express from 'express';
 import upload from '../middleware/upload.js';
-import { createEHR, getAllEHRs, getEHRStats } from '../services/ehrService.js';
+import { createEHR, createEHRBatch, getAllEHRs, getEHRStats } from '../services/ehrService.js';
 const router = express.Router();
 router.post('/create', upload.single('fingerprint'), createEHR);
 router.post('/create/nid', createEHR);
+router.post('/create/batch', createEHRBatch);
 router.get('/all', getAllEHRs);
 router.get('/stats', getEHRStats);
 export default router; 
\ No newline at end of file
@@ -1,9 +1,20 @@
 import { getContract, utf8Decoder, getAllFromContract } from './fabricService.js';
 import { uploadToIPFS, fetchFromIPFS } from './ipfsService.js';
 import { getHash } from '../utils/hash.js';
+import { createLimiter } from '../utils/concurrency.js';
 import fs from 'node:fs';
 import { registerPatientFromBiometric } from './patientService.js';
 
+// Snapshot written by ehr_stats.py; when present, stats are served from it
+const EHR_STATS_SNAPSHOT = process.env.EHR_STATS_SNAPSHOT;
+// Parsed snapshot, reused until ehr_stats.py replaces the file
+let snapshotCache = null;
+
+// Limits for /ehr/create/batch
+const EHR_BATCH_MAX = Number(process.env.EHR_BATCH_MAX || 500);
+const EHR_BATCH_IPFS_CONCURRENCY = Number(process.env.EHR_BATCH_IPFS_CONCURRENCY || 16);
+const EHR_BATCH_LEDGER_CONCURRENCY = Number(process.env.EHR_BATCH_LEDGER_CONCURRENCY || 8);
+
 export const createEHR = async (req, res) => {
     try {
         const { doctor_id, hospital_id, ehr_details, nid_no } = req.body;
@@ -25,7 +36,7 @@ export const createEHR = async (req, res) => {
         else if (req.file) {
             const filePath = req.file.path;
             // Get patient hash from fingerprint
-            patientHash = await registerPatientFromBiometric(filePath, req.file.filename, false);
+            patientHash = await registerPatientFromBiometric(filePath, req.file.filename, false, req.body);
             
         }
         // Invalid case: Neither or both provided
@@ -88,6 +99,91 @@ export const createEHR = async (req, res) => {
     }
 };
 
+/**
+ * Create many NID-addressed EHRs in one request.
+ *
+ * Body: {"records": [{nid_no, doctor_id, hospital_id, ehr_details}, ...]}
+ * or a bare array. Each distinct patient and doctor is checked once, IPFS
+ * uploads and ledger submissions run as a pipeline with separate
+ * concurrency limits, and every record gets its own outcome so one bad
+ * record doesn't fail the batch.
+ */
+export const createEHRBatch = async (req, res) => {
+    const records = Array.isArray(req.body) ? req.body : req.body?.records;
+    if (!Array.isArray(records) || records.length === 0) {
+        return res.status(400).json({ error: 'Expected a non-empty records array' });
+    }
+    if (records.length > EHR_BATCH_MAX) {
+        return res.status(413).json({ error: `At most ${EHR_BATCH_MAX} records per batch` });
+    }
+
+    try {
+        const contractPatient = await getContract('patient');
+        const contractDoctor = await getContract('doctor');
+        const contractEHR = await getContract('ehr');
+        const ledgerLimit = createLimiter(EHR_BATCH_LEDGER_CONCURRENCY);
+        const ipfsLimit = createLimiter(EHR_BATCH_IPFS_CONCURRENCY);
+
+        // One existence check per distinct patient / doctor in the batch
+        const patientChecks = new Map();
+        const doctorChecks = new Map();
+        const patientExists = (patientHash) => {
+            if (!patientChecks.has(patientHash)) {
+                patientChecks.set(patientHash, ledgerLimit(() => contractPatient.evaluateTransaction('PatientExists', patientHash))
+                    .then(result => utf8Decoder.decode(result) === 'true'));
+            }
+            return patientChecks.get(patientHash);
+        };
+        const doctorExists = (doctorId) => {
+            if (!doctorChecks.has(doctorId)) {
+                doctorChecks.set(doctorId, ledgerLimit(() => contractDoctor.evaluateTransaction('DoctorExists', doctorId))
+                    .then(result => utf8Decoder.decode(result) === 'true'));
+            }
+            return doctorChecks.get(doctorId);
+        };
+
+        const createOne = async (record, index) => {
+            const { doctor_id, hospital_id, ehr_details, nid_no } = record || {};
+            const outcome = { index, nid_no: nid_no ?? null };
+            if (!nid_no || !doctor_id) {
+                return { ...outcome, status: 400, error: 'nid_no and doctor_id are required' };
+            }
+            try {
+                const patientHash = getHash(String(nid_no));
+                const [patientOk, doctorOk] = await Promise.all([patientExists(patientHash), doctorExists(doctor_id)]);
+                if (!patientOk) {
+                    return { ...outcome, status: 404, error: 'Patient does not exist, please register first.' };
+                }
+                if (!doctorOk) {
+                    return { ...outcome, status: 404, error: `Doctor with ID ${doctor_id} does not exist.` };
+                }
+
+                const cid = await ipfsLimit(() => uploadToIPFS(JSON.stringify(ehr_details)));
+                // The index keeps IDs distinct for identical payloads in the same millisecond
+                const ehr_id = getHash(`${cid}${Date.now()}:${index}`);
+                const ehr_info = { ehr_id, patient_id: patientHash, doctor_id, hospital_id, cid };
+                await ledgerLimit(() => contractEHR.submitTransaction('CreateEHR', String(ehr_id), JSON.stringify(ehr_info)));
+                return { ...outcome, status: 201, ehr_info };
+            } catch (error) {
+                console.error(`Error creating EHR ${index} in batch:`, error);
+                return { ...outcome, status: 500, error: error.message };
+            }
+        };
+
+        const results = await Promise.all(records.map(createOne));
+        const created = results.filter(result => result.status === 201).length;
+        res.status(200).json({
+            message: `Created ${created} of ${records.length} EHRs`,
+            created,
+            failed: records.length - created,
+            results
+        });
+    } catch (error) {
+        console.error('Error creating EHR batch:', error);
+        res.status(500).json({ error: 'Failed to create EHR batch', details: error.message });
+    }
+};
+
 export const getAllEHRs = async (req, res) => {
     try {
         const result = await getAllFromContract('GetAll', 'ehr');
@@ -128,8 +224,40 @@ export const getAllEHRs = async (req, res) => {
     }
 };
 
+/**
+ * The stats snapshot, or null when none has been written. The file is only
+ * re-read and re-parsed when its mtime or size changes, and never with
+ * blocking I/O on the request path.
+ */
+async function readStatsSnapshot() {
+    let info;
+    try {
+        info = await fs.promises.stat(EHR_STATS_SNAPSHOT);
+    } catch (error) {
+        if (error.code === 'ENOENT') {
+            snapshotCache = null;
+            return null;
+        }
+        throw error;
+    }
+    if (!snapshotCache || snapshotCache.mtimeMs !== info.mtimeMs || snapshotCache.size !== info.size) {
+        const snapshot = JSON.parse(await fs.promises.readFile(EHR_STATS_SNAPSHOT, 'utf8'));
+        snapshotCache = { mtimeMs: info.mtimeMs, size: info.size, snapshot };
+    }
+    return snapshotCache.snapshot;
+}
+
 export const getEHRStats = async (req, res) => {
     try {
+        const snapshot = EHR_STATS_SNAPSHOT ? await readStatsSnapshot() : null;
+        if (snapshot) {
+            return res.status(200).json({
+                message: 'EHR statistics fetched successfully',
+                stats: snapshot.stats,
+                updated_at: snapshot.updated_at
+            });
+        }
+
         const ehrs = await getAllFromContract('GetAll', 'ehr'); // Specify 'ehr' as the contract type
 
         const stats = {
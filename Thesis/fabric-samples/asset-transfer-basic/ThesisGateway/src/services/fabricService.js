@@ -6,6 +6,7 @@ import path from 'node:path';
 import { TextDecoder } from 'node:util';
 import { fileURLToPath } from 'url';
 import { dirname } from 'path';
+import { traceContract } from '../utils/tracing.js';
 
 const __filename = fileURLToPath(import.meta.url);
 const __dirname = dirname(__filename);
@@ -79,11 +80,11 @@ export const initializeFabric = async () => {
 
         const network = gateway.getNetwork(channelName);
 
-        // Initialize all contracts
-        contractPatient = network.getContract('patient');
-        contractDoctor = network.getContract('doctor');
-        contractEHR = network.getContract('ehr');
-        contractResearch = network.getContract('research');
+        // Initialize all contracts; every evaluate/submit is traced
+        contractPatient = traceContract(network.getContract('patient'), 'patient');
+        contractDoctor = traceContract(network.getContract('doctor'), 'doctor');
+        contractEHR = traceContract(network.getContract('ehr'), 'ehr');
+        contractResearch = traceContract(network.getContract('research'), 'research');
 
         console.log('Successfully connected to Fabric network and initialized all contracts');
     } catch (error) {
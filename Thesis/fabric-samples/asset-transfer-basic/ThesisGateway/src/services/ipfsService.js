@@ -1,11 +1,12 @@
 import { create as ipfsHttpClient } from 'ipfs-http-client';
+import { withSpan } from '../utils/tracing.js';
 
 const ipfs = ipfsHttpClient({ host: 'localhost', port: 5001, protocol: 'http' });
 
 export const uploadToIPFS = async (data) => {
     try {
         const payload = typeof data === 'string' ? data : JSON.stringify(data);
-        const { cid } = await ipfs.add(payload);
+        const { cid } = await withSpan('ipfs.add', () => ipfs.add(payload), { bytes: payload.length });
         console.log("File uploaded to IPFS with CID:", cid.toString());
         return cid.toString();
     } catch (error) {
@@ -17,9 +18,11 @@ export const uploadToIPFS = async (data) => {
 export const fetchFromIPFS = async (cid) => {
     try {
         let data = [];
-        for await (const chunk of ipfs.cat(cid)) {
-            data.push(...chunk);
-        }
+        await withSpan('ipfs.cat', async () => {
+            for await (const chunk of ipfs.cat(cid)) {
+                data.push(...chunk);
+            }
+        });
         return Buffer.from(data).toString();
     } catch (error) {
         console.error('IPFS fetch error:', error);
@@ -4,12 +4,19 @@ import axios from 'axios';
 import FormData from 'form-data';
 import fs from 'node:fs';
 import { getHash } from '../utils/hash.js';
+import { withSpan, traceHeaders } from '../utils/tracing.js';
 import path from 'path';
 
 const PYTHON_SERVER_URL = 'http://localhost:15000';
 const PERMISSIONS_FILE = path.join(process.cwd(), 'src', 'data', 'permissions.json');
-
-export async function registerPatientFromBiometric(filePath, filename, register) {
+// Demographic hints the NID server can use to narrow /match; it falls back
+// to a full scan when the narrowed search finds nothing
+const MATCH_HINT_FIELDS = ['gender', 'birth_year_min', 'birth_year_max', 'district'];
+// The NID server drops a queued /match once this budget has passed, so it
+// never works on a probe this side has already timed out
+const NID_MATCH_TIMEOUT_MS = Number(process.env.NID_MATCH_TIMEOUT_MS || 30000);
+
+export async function registerPatientFromBiometric(filePath, filename, register, hints = {}) {
     try {
         const formData = new FormData();
         const fileStream = fs.createReadStream(filePath);
@@ -18,12 +25,20 @@ export async function registerPatientFromBiometric(filePath, filename, register)
             filename: filename,
             contentType: "image/bmp"
         });
+        for (const field of MATCH_HINT_FIELDS) {
+            if (hints?.[field] !== undefined && hints[field] !== '') {
+                formData.append(field, String(hints[field]));
+            }
+        }
 
-        const pythonResponse = await axios.post(`${PYTHON_SERVER_URL}/match` , formData, {
+        const pythonResponse = await withSpan('nid.match', () => axios.post(`${PYTHON_SERVER_URL}/match` , formData, {
+            timeout: NID_MATCH_TIMEOUT_MS,
             headers: {
-                ...formData.getHeaders()
+                ...formData.getHeaders(),
+                ...traceHeaders(),
+                'X-Request-Timeout-Ms': String(NID_MATCH_TIMEOUT_MS)
             }
-        });
+        }));
         
         // Delete temporary file after response
         fs.unlinkSync(filePath);
@@ -50,7 +65,7 @@ export async function registerPatient(req, res) {
         }
 
         const filePath = req.file.path;
-        const response = await registerPatientFromBiometric(filePath, req.file.filename, true);
+        const response = await registerPatientFromBiometric(filePath, req.file.filename, true, req.body);
 
         if (response) {
             return res.status(200).json({ message: 'Patient registered successfully' });
@@ -77,7 +92,7 @@ export async function findPatientInfo(req, res) {
         } else if (req.file) {
             // Search by fingerprint image
             const filePath = req.file.path;
-            hash = await registerPatientFromBiometric(filePath, req.file.filename, false);
+            hash = await registerPatientFromBiometric(filePath, req.file.filename, false, req.body);
         } else {
             return res.status(400).json({ error: 'No fingerprint image uploaded or NID number provided' });
         }
@@ -103,7 +118,7 @@ export async function getPatientEHRs(req, res) {
         // Case 1: Fingerprint image provided
         if (req.file) {
             const filePath = req.file.path;
-            hash = await registerPatientFromBiometric(filePath, req.file.filename, false);
+            hash = await registerPatientFromBiometric(filePath, req.file.filename, false, req.body);
 
             const contractPatient = await getContract('patient');
             const patientExist = await contractPatient.evaluateTransaction('PatientExists', hash);
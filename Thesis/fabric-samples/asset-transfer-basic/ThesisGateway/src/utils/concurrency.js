@@ -0,0 +1,29 @@
+/**
+ * Returns limit(fn): runs fn() once fewer than `concurrency` calls started
+ * through the same limiter are still pending, and resolves with its result.
+ */
+export function createLimiter(concurrency) {
+    const max = Math.max(1, Number(concurrency) || 1);
+    const queue = [];
+    let active = 0;
+
+    const next = () => {
+        if (active >= max || queue.length === 0) {
+            return;
+        }
+        active++;
+        const { fn, resolve, reject } = queue.shift();
+        Promise.resolve()
+            .then(fn)
+            .then(resolve, reject)
+            .finally(() => {
+                active--;
+                next();
+            });
+    };
+
+    return (fn) => new Promise((resolve, reject) => {
+        queue.push({ fn, resolve, reject });
+        next();
+    });
+}
@@ -0,0 +1,95 @@
+import { AsyncLocalStorage } from 'node:async_hooks';
+import crypto from 'node:crypto';
+import fs from 'node:fs';
+import { performance } from 'node:perf_hooks';
+
+// Same headers and NDJSON span shape as thesis_client/tracing.py
+export const TRACE_HEADER = 'x-trace-id';
+export const PARENT_HEADER = 'x-parent-span-id';
+const SERVICE = 'gateway';
+const TRACE_FILE = process.env.THESIS_TRACE;
+
+const storage = new AsyncLocalStorage();
+const output = TRACE_FILE ? fs.createWriteStream(TRACE_FILE, { flags: 'a' }) : null;
+
+const newId = (bytes) => crypto.randomBytes(bytes).toString('hex');
+const nowSeconds = () => (performance.timeOrigin + performance.now()) / 1000;
+
+function startSpan(name, traceId, parentId, attrs = {}) {
+    return {
+        trace_id: traceId || newId(16),
+        span_id: newId(8),
+        parent_id: parentId || null,
+        name,
+        attrs,
+        start: nowSeconds(),
+        started: performance.now(),
+    };
+}
+
+function finishSpan(span, attrs = {}) {
+    if (!output) {
+        return;
+    }
+    const { started, ...record } = span;
+    Object.assign(record.attrs, attrs);
+    record.service = SERVICE;
+    record.start = Number(record.start.toFixed(6));
+    record.duration = Number(((performance.now() - started) / 1000).toFixed(6));
+    output.write(JSON.stringify(record) + '\n');
+}
+
+/**
+ * Express middleware: continues the caller's trace (or starts one), records
+ * a span for the whole request when the response finishes and runs the
+ * rest of the chain with that span as the current one.
+ */
+export function traceRequests(req, res, next) {
+    const span = startSpan(`${req.method} ${req.path}`, req.get(TRACE_HEADER), req.get(PARENT_HEADER));
+    res.setHeader(TRACE_HEADER, span.trace_id);
+    res.on('finish', () => {
+        finishSpan(span, { route: `${req.baseUrl}${req.route?.path ?? ''}`, status: res.statusCode });
+    });
+    storage.run(span, next);
+}
+
+/**
+ * Run fn() as a child span of the current one; the span is recorded with
+ * the error name if fn rejects.
+ */
+export async function withSpan(name, fn, attrs = {}) {
+    const parent = storage.getStore();
+    const span = startSpan(name, parent?.trace_id, parent?.span_id, { ...attrs });
+    try {
+        return await storage.run(span, fn);
+    } catch (error) {
+        span.attrs.error = error?.name || 'Error';
+        throw error;
+    } finally {
+        finishSpan(span);
+    }
+}
+
+/** Headers that make the next hop's spans children of the current span */
+export function traceHeaders() {
+    const span = storage.getStore();
+    return span ? { [TRACE_HEADER]: span.trace_id, [PARENT_HEADER]: span.span_id } : {};
+}
+
+/**
+ * Proxy a Fabric contract so evaluate/submit calls become
+ * `fabric.<kind> <contract>.<function>` spans.
+ */
+export function traceContract(contract, contractName) {
+    return new Proxy(contract, {
+        get(target, property) {
+            const value = Reflect.get(target, property);
+            if (property !== 'evaluateTransaction' && property !== 'submitTransaction') {
+                return typeof value === 'function' ? value.bind(target) : value;
+            }
+            const kind = property === 'evaluateTransaction' ? 'evaluate' : 'submit';
+            return (functionName, ...args) => withSpan(`fabric.${kind} ${contractName}.${functionName}`,
+                () => value.call(target, functionName, ...args));
+        },
+    });
+}
@@ -0,0 +1,19 @@
+"""
+Shared HTTP client for the gateway and NID server APIs.
+
+Scripts in sibling directories import it after putting
+asset-transfer-basic/ on sys.path:
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    from thesis_client import GatewayClient
+
+The asyncio clients in thesis_client.aio need aiohttp.
+"""
+
+from .client import (DEFAULT_TIMEOUT, GATEWAY_URL, NID_SERVER_URL, NO_RETRY, ApiClient,
+                     GatewayClient, NIDClient, RetryPolicy)
+
+__all__ = [
+    'ApiClient', 'GatewayClient', 'NIDClient', 'RetryPolicy', 'NO_RETRY',
+    'DEFAULT_TIMEOUT', 'GATEWAY_URL', 'NID_SERVER_URL',
+]
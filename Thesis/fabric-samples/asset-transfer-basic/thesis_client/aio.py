@@ -0,0 +1,157 @@
+import asyncio
+import base64
+import time
+from urllib.parse import urlsplit
+
+from .client import (DEFAULT_TIMEOUT, GATEWAY_URL, IDEMPOTENT_METHODS, NID_SERVER_URL,
+                     ApiClient, RetryPolicy)
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class AsyncApiClient:
+    """
+    asyncio counterpart of ApiClient built on aiohttp.
+
+    Shares RetryPolicy, URL handling, JSON compression and the on_request /
+    on_response hooks with the sync client, so load generators can switch
+    between threads and coroutines without changing their measurements.
+    Use as ``async with AsyncApiClient(url) as client:``.
+    """
+
+    def __init__(self, base_url, timeout=DEFAULT_TIMEOUT, retry=None, limit=100,
+                 compress_threshold=None, headers=None):
+        if aiohttp is None:
+            raise ImportError("AsyncApiClient requires aiohttp (pip install aiohttp)")
+        # Reuse the sync client's URL and body helpers without opening a session
+        self._helper = ApiClient.__new__(ApiClient)
+        self._helper.base_url = base_url.rstrip("/")
+        self._helper.compress_threshold = compress_threshold
+        self.base_url = self._helper.base_url
+        self.retry = retry or RetryPolicy()
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        self.timeout = aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+        self.limit = limit
+        self.headers = headers or {}
+        self.on_request = []
+        self.on_response = []
+        self.session = None
+        from .tracing import shared_tracer
+        shared_tracer().attach(self)
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self):
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.limit, keepalive_timeout=30)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout,
+                                                 headers=self.headers)
+        return self
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _emit(self, **timing):
+        for hook in self.on_response:
+            hook(timing)
+
+    async def request(self, method, path, json=None, data=None, files=None, headers=None,
+                      idempotent=None, retry=None):
+        """
+        Send a request and return (status, headers, body bytes).
+
+        ``files`` takes the same {field: (filename, bytes)} mapping as the
+        sync client and is sent as multipart form data alongside ``data``.
+        """
+        await self.open()
+        method = method.upper()
+        url = self._helper.url(path)
+        headers = dict(headers or {})
+        retry = retry or self.retry
+        idempotent = method in IDEMPOTENT_METHODS if idempotent is None else idempotent
+        if json is not None:
+            data = self._helper._encode_json(json, headers)
+        request_bytes = len(data) if isinstance(data, (bytes, str)) else None
+
+        for attempt in range(retry.attempts):
+            for hook in self.on_request:
+                hook(method, url, headers)
+            body = data
+            if files:
+                body = aiohttp.FormData()
+                for name, value in (data or {}).items():
+                    body.add_field(name, str(value))
+                for name, (filename, content) in files.items():
+                    body.add_field(name, content, filename=filename)
+            start = time.perf_counter()
+            try:
+                async with self.session.request(method, url, data=body, headers=headers) as response:
+                    content = await response.read()
+                    status, response_headers = response.status, response.headers
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as error:
+                self._emit(method=method, url=url, route=urlsplit(url).path, status=None,
+                           attempt=attempt, elapsed=time.perf_counter() - start,
+                           request_bytes=request_bytes, response_bytes=None, error=type(error).__name__,
+                           request=None)
+                connect_failed = isinstance(error, aiohttp.ClientConnectorError)
+                if attempt + 1 >= retry.attempts or not (idempotent or connect_failed):
+                    raise
+                await asyncio.sleep(retry.delay(attempt))
+                continue
+
+            self._emit(method=method, url=url, route=urlsplit(url).path, status=status,
+                       attempt=attempt, elapsed=time.perf_counter() - start,
+                       request_bytes=request_bytes, response_bytes=len(content), error=None,
+                       request=None)
+            if attempt + 1 < retry.attempts and retry.should_retry_status(status, idempotent):
+                await asyncio.sleep(retry.delay(attempt, response_headers.get("Retry-After")))
+                continue
+            return status, response_headers, content
+
+    async def get(self, path, **kwargs):
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path, **kwargs):
+        return await self.request("POST", path, **kwargs)
+
+
+class AsyncGatewayClient(AsyncApiClient):
+    def __init__(self, base_url=GATEWAY_URL, compress_threshold=8192, **kwargs):
+        super().__init__(base_url, compress_threshold=compress_threshold, **kwargs)
+
+    async def create_ehr(self, payload):
+        return await self.post("/ehr/create/nid", json=payload)
+
+    async def patient_ehrs(self, nid_no):
+        return await self.post("/patient/ehrs", json={"nid_no": nid_no}, idempotent=True)
+
+
+class AsyncNIDClient(AsyncApiClient):
+    def __init__(self, base_url=NID_SERVER_URL, **kwargs):
+        super().__init__(base_url, **kwargs)
+
+    def _deadline_headers(self):
+        read = self.timeout.sock_read
+        return {"X-Request-Timeout-Ms": str(int(read * 1000))} if read else {}
+
+    async def match(self, image, filename="probe.bmp", **hints):
+        return await self.post("/match", data=hints or None, files={"image": (filename, image)},
+                               headers=self._deadline_headers(), idempotent=True)
+
+    async def match_template(self, template, **hints):
+        return await self.post("/match/template", json={"template": base64.b64encode(template).decode("ascii"),
+                                                         **hints},
+                               headers=self._deadline_headers(), idempotent=True)
+
+    async def nid(self, nid_no):
+        return await self.post("/nid", data={"nid_no": nid_no}, idempotent=True)
@@ -0,0 +1,145 @@
+import base64
+import gzip
+import hashlib
+import json
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+CAPTURE_FORMAT = "thesis-traffic"
+CAPTURE_VERSION = 1
+BODY_MODES = ("full", "hash", "none")
+# Request headers needed to re-issue a body as the server first saw it
+REPLAY_HEADERS = ("content-type", "content-encoding")
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def normalize_route(path):
+    """Group /doctor/d0001 and /permission/requests/5000000001 style paths"""
+    path = urlsplit(path).path or "/"
+    return re.sub(r"/[^/]*\d[^/]*", "/:id", path)
+
+
+class TrafficRecorder:
+    """
+    Append request records to an NDJSON capture (gzip when the path ends in .gz).
+
+    Each line holds the start timestamp, service, method, path, status,
+    latency, payload sizes, the body SHA-256 and, with ``bodies="full"``,
+    the base64 body so the request can be replayed. Attach it to any
+    ApiClient with ``recorder.attach(client)``.
+    """
+
+    def __init__(self, path, bodies="full"):
+        if bodies not in BODY_MODES:
+            raise ValueError(f"bodies must be one of {BODY_MODES}")
+        self.path = path
+        self.bodies = bodies
+        self._lock = threading.Lock()
+        opener = gzip.open if path.endswith(".gz") else open
+        self._file = opener(path, "at", encoding="utf-8")
+        self._write({"format": CAPTURE_FORMAT, "version": CAPTURE_VERSION, "bodies": bodies,
+                     "started_at": time.time()})
+
+    def _write(self, entry):
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._file.write(line)
+
+    def record(self, service, method, path, started, elapsed, status, body=b"", headers=None,
+               response_bytes=None, error=None):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        body = body or b""
+        entry = {
+            "ts": round(started, 6),
+            "service": service,
+            "method": method,
+            "path": path,
+            "status": status,
+            "elapsed": round(elapsed, 6),
+            "req_bytes": len(body),
+            "resp_bytes": response_bytes,
+            "headers": {k.lower(): v for k, v in (headers or {}).items() if k.lower() in REPLAY_HEADERS},
+        }
+        if error:
+            entry["error"] = error
+        if body and self.bodies != "none":
+            entry["sha256"] = hashlib.sha256(body).hexdigest()
+        if body and self.bodies == "full":
+            entry["body"] = base64.b64encode(body).decode("ascii")
+        self._write(entry)
+
+    def hook(self, timing):
+        """on_response hook for ApiClient"""
+        request = timing.get("request")
+        parts = urlsplit(timing["url"])
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        body = request.body if request is not None else None
+        if body is not None and not isinstance(body, (bytes, str)):
+            body = None  # streamed/generator bodies can't be captured
+        self.record(f"{parts.scheme}://{parts.netloc}", timing["method"], path,
+                    time.time() - timing["elapsed"], timing["elapsed"], timing["status"],
+                    body, request.headers if request is not None else None,
+                    timing["response_bytes"], timing["error"])
+
+    def attach(self, client):
+        client.on_response.append(self.hook)
+        return client
+
+    def flush(self):
+        with self._lock:
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def shared_recorder(path, bodies="full"):
+    """One recorder per path for the whole process (used by THESIS_CAPTURE)"""
+    with _shared_lock:
+        if path not in _shared:
+            import atexit
+            _shared[path] = TrafficRecorder(path, bodies)
+            atexit.register(_shared[path].close)
+        return _shared[path]
+
+
+def read_capture(path):
+    """Return the request entries of a capture sorted by start time"""
+    opener = gzip.open if path.endswith(".gz") else open
+    entries = []
+    with opener(path, "rt", encoding="utf-8") as file:
+        for line_no, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A capture cut off mid-write only loses its last line
+                print(f"Warning: {path}:{line_no} is not valid JSON, skipping")
+                continue
+            if entry.get("format") == CAPTURE_FORMAT:
+                if entry["version"] != CAPTURE_VERSION:
+                    raise ValueError(f"{path}: unsupported capture version {entry['version']}")
+                continue
+            entries.append(entry)
+    entries.sort(key=lambda e: e["ts"])
+    return entries
+
+
+def entry_body(entry):
+    """Decoded request body of a capture entry, or None if it wasn't stored"""
+    if "body" in entry:
+        return base64.b64decode(entry["body"])
+    return b"" if not entry.get("req_bytes") else None
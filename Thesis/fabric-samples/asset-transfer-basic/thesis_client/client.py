@@ -0,0 +1,247 @@
+import gzip
+import json
+import os
+import random
+import time
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+GATEWAY_URL = os.environ.get("GATEWAY_URL", "http://localhost:8000")
+NID_SERVER_URL = os.environ.get("NID_SERVER_URL", "http://localhost:15000")
+
+# (connect, read) seconds
+DEFAULT_TIMEOUT = (3.05, 30)
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "PUT", "DELETE"])
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter.
+
+    Failures to connect are always retried since the request never reached
+    the server; any other transport error is only retried for idempotent
+    calls, as the server may already have read and acted on the request.
+    Retryable statuses are only retried for idempotent calls, and a
+    Retry-After header from the server takes precedence over backoff.
+    """
+
+    def __init__(self, attempts=3, backoff=0.2, max_backoff=5.0,
+                 retry_statuses=(429, 502, 503, 504)):
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_statuses = frozenset(retry_statuses)
+
+    def delay(self, attempt, retry_after=None):
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+
+    def should_retry_status(self, status, idempotent):
+        return idempotent and status in self.retry_statuses
+
+
+NO_RETRY = RetryPolicy(attempts=1)
+
+
+def _rewind(files):
+    """Reset file objects in a requests ``files`` mapping before a retry"""
+    for value in (files or {}).values():
+        handle = value[1] if isinstance(value, tuple) else value
+        if hasattr(handle, "seek"):
+            handle.seek(0)
+
+
+def _never_sent(error):
+    """True when a transport error happened while connecting, before any bytes went out"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    seen = set()
+    cause = error
+    while cause is not None and id(cause) not in seen:
+        if isinstance(cause, NewConnectionError):
+            return True
+        seen.add(id(cause))
+        # requests wraps urllib3's MaxRetryError, which keeps the original as .reason
+        nested = getattr(cause, "reason", None)
+        if not isinstance(nested, BaseException) and cause.args and isinstance(cause.args[0], BaseException):
+            nested = cause.args[0]
+        cause = nested if isinstance(nested, BaseException) else cause.__cause__ or cause.__context__
+    return False
+
+
+class ApiClient:
+    """
+    Pooled keep-alive HTTP client shared by the Python tooling.
+
+    Wraps a requests.Session with a sized connection pool, default timeouts,
+    jittered retries, optional gzip of large JSON bodies and hooks:
+
+    * ``on_request`` callables get (method, url, headers) before each attempt
+      and may add headers;
+    * ``on_response`` callables get a timing dict after each attempt with
+      method, url, route, status, attempt, elapsed, request/response sizes,
+      any error and the sent requests.PreparedRequest (None on errors).
+
+    Setting THESIS_CAPTURE to a file path records every request made by
+    every client in the process (see thesis_client.capture); setting
+    THESIS_TRACE does the same for trace spans (see thesis_client.tracing).
+    Trace headers are sent either way.
+    """
+
+    def __init__(self, base_url, timeout=DEFAULT_TIMEOUT, retry=None, pool_maxsize=32,
+                 compress_threshold=None, headers=None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.retry = retry or RetryPolicy()
+        self.compress_threshold = compress_threshold
+        self.on_request = []
+        self.on_response = []
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if headers:
+            self.session.headers.update(headers)
+        if os.environ.get("THESIS_CAPTURE"):
+            from .capture import shared_recorder
+            shared_recorder(os.environ["THESIS_CAPTURE"]).attach(self)
+        from .tracing import shared_tracer
+        shared_tracer().attach(self)
+
+    def url(self, path):
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return urljoin(self.base_url + "/", path.lstrip("/"))
+
+    def _encode_json(self, payload, headers):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        headers.setdefault("Content-Type", "application/json")
+        if self.compress_threshold is not None and len(body) >= self.compress_threshold:
+            body = gzip.compress(body, compresslevel=5)
+            headers["Content-Encoding"] = "gzip"
+        return body
+
+    def _emit(self, **timing):
+        for hook in self.on_response:
+            hook(timing)
+
+    def request(self, method, path, json=None, data=None, files=None, headers=None,
+                timeout=None, idempotent=None, retry=None, **kwargs):
+        method = method.upper()
+        url = self.url(path)
+        headers = dict(headers or {})
+        retry = retry or self.retry
+        idempotent = method in IDEMPOTENT_METHODS if idempotent is None else idempotent
+        if json is not None:
+            data = self._encode_json(json, headers)
+        request_bytes = len(data) if isinstance(data, (bytes, str)) else None
+
+        for attempt in range(retry.attempts):
+            for hook in self.on_request:
+                hook(method, url, headers)
+            if attempt:
+                _rewind(files)
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, data=data, files=files, headers=headers,
+                                                timeout=timeout or self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as error:
+                elapsed = time.perf_counter() - start
+                self._emit(method=method, url=url, route=urlsplit(url).path, status=None,
+                           attempt=attempt, elapsed=elapsed, request_bytes=request_bytes,
+                           response_bytes=None, error=type(error).__name__, request=None)
+                # Past the connect phase the server may have acted; only retry those if safe
+                retryable = idempotent or _never_sent(error)
+                if attempt + 1 >= retry.attempts or not retryable:
+                    raise
+                time.sleep(retry.delay(attempt))
+                continue
+
+            elapsed = time.perf_counter() - start
+            self._emit(method=method, url=url, route=urlsplit(url).path, status=response.status_code,
+                       attempt=attempt, elapsed=elapsed, request_bytes=request_bytes,
+                       response_bytes=len(response.content), error=None, request=response.request)
+            if attempt + 1 < retry.attempts and retry.should_retry_status(response.status_code, idempotent):
+                time.sleep(retry.delay(attempt, response.headers.get("Retry-After")))
+                continue
+            return response
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class GatewayClient(ApiClient):
+    """Client for the Express gateway (ThesisGateway/src/app.js)"""
+
+    def __init__(self, base_url=GATEWAY_URL, compress_threshold=8192, **kwargs):
+        super().__init__(base_url, compress_threshold=compress_threshold, **kwargs)
+
+    def create_ehr(self, payload):
+        """POST /ehr/create/nid with a JSON payload (nid_no, doctor_id, hospital_id, ehr_details)"""
+        return self.post("/ehr/create/nid", json=payload)
+
+    def create_ehr_batch(self, payloads):
+        """POST /ehr/create/batch; the response lists one outcome per payload"""
+        return self.post("/ehr/create/batch", json={"records": list(payloads)})
+
+    def create_ehr_with_fingerprint(self, data, fingerprint, filename="fingerprint.bmp"):
+        """POST /ehr/create as multipart form data with a fingerprint image"""
+        return self.post("/ehr/create", data=data, files={"fingerprint": (filename, fingerprint)})
+
+    def register_patient(self, fingerprint, filename="fingerprint.bmp"):
+        return self.post("/patient/register", files={"fingerprint": (filename, fingerprint)})
+
+    def patient_ehrs(self, nid_no):
+        return self.post("/patient/ehrs", json={"nid_no": nid_no}, idempotent=True)
+
+
+class NIDClient(ApiClient):
+    """Client for the NID / fingerprint server (NIDServer/fingerprint.py)"""
+
+    def __init__(self, base_url=NID_SERVER_URL, **kwargs):
+        super().__init__(base_url, **kwargs)
+
+    def _deadline_headers(self):
+        # The server drops queued work once this read timeout has passed
+        read = self.timeout[1] if isinstance(self.timeout, tuple) else self.timeout
+        return {"X-Request-Timeout-Ms": str(int(read * 1000))} if read else {}
+
+    def match(self, image, filename="probe.bmp", **hints):
+        """``hints`` (gender, birth_year_min, birth_year_max, district) narrow the search"""
+        # Matching is read-only, so it is safe to retry on 503/429
+        return self.post("/match", data=hints or None, files={"image": (filename, image)},
+                         headers=self._deadline_headers(), idempotent=True)
+
+    def match_template(self, template, **hints):
+        """Identify from fingerprint_template bytes; only the template is uploaded"""
+        return self.post("/match/template", data=template, params=hints or None,
+                         headers={"Content-Type": "application/octet-stream", **self._deadline_headers()},
+                         idempotent=True)
+
+    def nid(self, nid_no):
+        return self.post("/nid", data={"nid_no": nid_no}, idempotent=True)
+
+    def nid_batch(self, nid_nos, fields=None):
+        payload = {"nid_nos": list(nid_nos)}
+        if fields:
+            payload["fields"] = list(fields)
+        return self.post("/nid/batch", json=payload, idempotent=True)
@@ -0,0 +1,193 @@
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+# Propagated on every hop: Python client -> gateway -> NID server
+TRACE_HEADER = "X-Trace-Id"
+PARENT_HEADER = "X-Parent-Span-Id"
+# NDJSON span file shared by every process that sets it
+TRACE_ENV = "THESIS_TRACE"
+
+_current = contextvars.ContextVar("thesis_span", default=None)
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def new_trace_id():
+    return os.urandom(16).hex()
+
+
+def new_span_id():
+    return os.urandom(8).hex()
+
+
+def current_span():
+    """The active Span in this thread/task, or None"""
+    return _current.get()
+
+
+def _pop_header(headers, name):
+    """Remove ``name`` from a plain dict of headers in any letter case; returns the last value"""
+    value = None
+    for key in [key for key in headers if key.lower() == name.lower()]:
+        value = headers.pop(key)
+    return value
+
+
+class SpanWriter:
+    """Append finished spans, one JSON object per line"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, record):
+        line = json.dumps(record, separators=(",", ":"), default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+
+def shared_writer(path):
+    with _writers_lock:
+        if path not in _writers:
+            _writers[path] = SpanWriter(path)
+        return _writers[path]
+
+
+class Span:
+    """
+    One timed operation. The record written on finish has trace_id,
+    span_id, parent_id, service, name, start (epoch seconds), duration
+    (seconds) and attrs; every hop writes the same shape.
+    """
+
+    def __init__(self, tracer, name, trace_id, parent_id, attrs, activate=True):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = new_span_id()
+        self.parent_id = parent_id
+        self.attrs = attrs
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self._token = _current.set(self) if activate else None
+
+    def headers(self):
+        """Headers that make the next hop's spans children of this one"""
+        return {TRACE_HEADER: self.trace_id, PARENT_HEADER: self.span_id}
+
+    def finish(self, **attrs):
+        self.attrs.update(attrs)
+        duration = time.perf_counter() - self._started
+        if self._token is not None:
+            try:
+                _current.reset(self._token)
+            except ValueError:
+                # Finished from a different context than it started in
+                pass
+        self.tracer.emit({
+            "trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+            "service": self.tracer.service, "name": self.name, "start": round(self.start, 6),
+            "duration": round(duration, 6), "attrs": self.attrs,
+        })
+
+
+class Tracer:
+    """
+    Records spans for one service into a SpanWriter.
+
+    ``start`` opens a span as a child of the current one (or of an explicit
+    ``trace_id``/``parent_id`` taken from incoming headers) and makes it
+    current until ``finish``; ``span`` does the same as a context manager.
+    Without a path nothing is written, but ids are still generated and
+    propagated so downstream hops can record the trace.
+    """
+
+    def __init__(self, service, path=None):
+        self.service = service
+        self.writer = shared_writer(path) if path else None
+        # Client span of the request in flight, and the last one started (to
+        # recognise a retry of the same request). Per tracer, so two tracers
+        # on one client don't clobber each other; ContextVars rather than
+        # thread-locals so concurrent asyncio tasks each see their own
+        self._request_span = contextvars.ContextVar(f"thesis_request_span_{id(self)}", default=None)
+        self._last_attempt = contextvars.ContextVar(f"thesis_last_attempt_{id(self)}", default=None)
+
+    @property
+    def enabled(self):
+        return self.writer is not None
+
+    def emit(self, record):
+        if self.writer is not None:
+            self.writer.write(record)
+
+    def start(self, name, trace_id=None, parent_id=None, **attrs):
+        return self._start(name, trace_id, parent_id, attrs)
+
+    def _start(self, name, trace_id, parent_id, attrs, activate=True):
+        parent = current_span()
+        if trace_id is None and parent is not None:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        return Span(self, name, trace_id or new_trace_id(), parent_id, attrs, activate)
+
+    @contextmanager
+    def span(self, name, trace_id=None, parent_id=None, **attrs):
+        span = self.start(name, trace_id, parent_id, **attrs)
+        try:
+            yield span
+        except BaseException as error:
+            span.attrs["error"] = type(error).__name__
+            raise
+        finally:
+            span.finish()
+
+    def _on_request(self, method, url, headers):
+        # One client span per attempt. Trace headers already on the request
+        # (e.g. forwarded by the capture proxy) are continued; otherwise the
+        # trace continues the caller's span, or starts a new one per call
+        trace_id = _pop_header(headers, TRACE_HEADER)
+        parent_id = _pop_header(headers, PARENT_HEADER)
+        previous = self._last_attempt.get()
+        if previous is not None and (trace_id, parent_id) == (previous.trace_id, previous.span_id):
+            # A retry still carries the previous attempt's ids; keep its parent
+            parent_id = previous.parent_id
+        # Only propagated through the headers, never made current, so spans
+        # finished out of order (several tracers on one client) can't leak
+        span = self._start(f"{method} {urlsplit(url).path}", trace_id, parent_id if trace_id else None,
+                           {"url": url}, activate=False)
+        headers.update(span.headers())
+        self._request_span.set(span)
+        self._last_attempt.set(span)
+
+    def _on_response(self, timing):
+        span = self._request_span.get()
+        if span is None:
+            return
+        self._request_span.set(None)
+        span.finish(status=timing["status"], attempt=timing["attempt"], error=timing["error"],
+                    request_bytes=timing["request_bytes"], response_bytes=timing["response_bytes"])
+
+    def attach(self, client):
+        """Propagate trace headers from ``client`` and record a span per request"""
+        client.on_request.append(self._on_request)
+        client.on_response.append(self._on_response)
+        return client
+
+
+_shared_tracer = None
+
+
+def shared_tracer(path=None):
+    """Process-wide tracer named after the running script"""
+    global _shared_tracer
+    if _shared_tracer is None:
+        service = os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0] or "python"
+        _shared_tracer = Tracer(service, path or os.environ.get(TRACE_ENV))
+    return _shared_tracer
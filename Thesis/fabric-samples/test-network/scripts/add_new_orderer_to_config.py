@@ -7,21 +7,32 @@ import base64
 import copy
 import json
 import math
-from typing import Any
+from typing import Any, Dict, List, Optional
 
 
 def parse_args():
     parser = argparse.ArgumentParser(
         prog='Config Update',
-        description='What the program does',
-        epilog='Text at the bottom of help')
+        description='Add one orderer, or a manifest of orderers, to a BFT channel config',
+        epilog='Either pass -a/-i/-s/-c for a single orderer or -m with a JSON manifest')
     parser.add_argument('config_path', type=str)
     parser.add_argument('updated_config_path', type=str)
-    parser.add_argument('-a', '--address', type=str, required=True)
-    parser.add_argument('-i', '--identity', type=str, required=True)
-    parser.add_argument('-s', '--server-cert', type=str, required=True)
-    parser.add_argument('-c', '--client-cert', type=str, required=True)
-    return parser.parse_args()
+    parser.add_argument('-a', '--address', type=str)
+    parser.add_argument('-i', '--identity', type=str)
+    parser.add_argument('-s', '--server-cert', type=str)
+    parser.add_argument('-c', '--client-cert', type=str)
+    parser.add_argument('-m', '--manifest', type=str,
+                        help='JSON list of {"address", "identity", "server_cert", "client_cert"} entries')
+    parser.add_argument('-d', '--diff', type=str,
+                        help='Also write the before/after of only the touched config sections to this file')
+    parser.add_argument('-q', '--quiet', action='store_true', help='Do not log each section update')
+    args = parser.parse_args()
+    single = [args.address, args.identity, args.server_cert, args.client_cert]
+    if args.manifest and any(single):
+        parser.error('--manifest cannot be combined with -a/-i/-s/-c')
+    if not args.manifest and not all(single):
+        parser.error('-a, -i, -s and -c are required unless --manifest is given')
+    return args
 
 
 def _pem_file_to_base64(path: str) -> str:
@@ -45,54 +56,149 @@ def _calculate_bft_quorum(n: int) -> int:
     return int(math.ceil((n + f + 1) / 2))
 
 
+def load_manifest(manifest_path: str) -> List[Dict[str, str]]:
+    with open(manifest_path, 'r') as f:
+        manifest = json.load(f)
+    if not isinstance(manifest, list) or not manifest:
+        raise ValueError(f'{manifest_path}: expected a non-empty JSON list of orderers')
+    required = ('address', 'identity', 'server_cert', 'client_cert')
+    for index, entry in enumerate(manifest):
+        if not isinstance(entry, dict):
+            raise ValueError(f'{manifest_path}: entry {index} must be an object, got {json.dumps(entry)}')
+        missing = [key for key in required if not entry.get(key)]
+        if missing:
+            raise ValueError(f'{manifest_path}: entry {index} is missing {", ".join(missing)}')
+        not_strings = [key for key in required if not isinstance(entry[key], str)]
+        if not_strings:
+            raise ValueError(f'{manifest_path}: entry {index} needs string values for {", ".join(not_strings)}')
+    return manifest
+
+
+def _config_sections(config: Dict[str, Any]) -> Dict[str, Any]:
+    orderer = config['channel_group']['groups']['Orderer']
+    block_validation = orderer['policies']['BlockValidation']['policy']['value']
+    return {
+        'addresses': orderer['groups']['OrdererOrg']['values']['Endpoints']['value']['addresses'],
+        'block validation identities': block_validation['identities'],
+        'block validation rules': block_validation['rule'],
+        'consenter_mapping': orderer['values']['Orderers']['value']['consenter_mapping'],
+    }
+
+
+def _validate_orderers(sections: Dict[str, Any], orderers: List[Dict[str, str]]) -> None:
+    """Reject duplicate endpoints, addresses or identities before anything is modified"""
+    seen_endpoints = {(str(c['host']), str(c['port'])) for c in sections['consenter_mapping']}
+    seen_addresses = set(sections['addresses'])
+    seen_identities = {c['identity'] for c in sections['consenter_mapping']}
+    errors = []
+    for orderer in orderers:
+        if orderer['address'].count(':') != 1:
+            errors.append(f'{orderer["address"]}: address must be host:port')
+            continue
+        endpoint = tuple(orderer['address'].split(':'))
+        if endpoint in seen_endpoints:
+            errors.append(f'{orderer["address"]}: host/port already present in the config or manifest')
+        if orderer['address'] in seen_addresses:
+            errors.append(f'{orderer["address"]}: endpoint address already present in the config or manifest')
+        if orderer['identity'] in seen_identities:
+            errors.append(f'{orderer["address"]}: identity already present in the config or manifest')
+        seen_endpoints.add(endpoint)
+        seen_addresses.add(orderer['address'])
+        seen_identities.add(orderer['identity'])
+    if errors:
+        raise ValueError('Invalid orderer update:\n  ' + '\n  '.join(errors))
+
+
+def add_orderers(config: Dict[str, Any], orderers: List[Dict[str, str]], log: bool = True,
+                 diff: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Add all orderers to the config in a single pass.
+
+    Each orderer is a dict with address and base64 identity, server_cert and
+    client_cert. The BFT quorum is recomputed once for the final consenter
+    count. Returns the before/after of each touched section, or None without
+    ``diff``; the sections are only copied when ``log`` or ``diff`` needs them.
+    """
+    sections = _config_sections(config)
+    _validate_orderers(sections, orderers)
+    before = copy.deepcopy(sections) if log or diff else None
+
+    addresses = sections['addresses']
+    identities = sections['block validation identities']
+    rule = sections['block validation rules']
+    consenter_mapping = sections['consenter_mapping']
+    next_id = max((int(c['id']) for c in consenter_mapping), default=0) + 1
+
+    for orderer in orderers:
+        host, port = orderer['address'].split(':')
+        addresses.append(f'{host}:{port}')
+
+        new_identity = copy.deepcopy(identities[0])
+        new_identity['principal']['id_bytes'] = orderer['identity']
+        identities.append(new_identity)
+        rule['n_out_of']['rules'].append({'signed_by': len(identities) - 1})
+
+        consenter_mapping.append({
+            'client_tls_cert': orderer['client_cert'],
+            'host': host,
+            'id': next_id,
+            'identity': orderer['identity'],
+            'msp_id': consenter_mapping[0]['msp_id'],
+            'port': port,
+            'server_tls_cert': orderer['server_cert']
+        })
+        next_id += 1
+
+    rule['n_out_of']['n'] = _calculate_bft_quorum(len(consenter_mapping))
+
+    if log:
+        for name, section in sections.items():
+            _log_update(name, before[name], section)
+    if not diff:
+        return None
+    return {name: {'before': before[name], 'after': section} for name, section in sections.items()}
+
+
 def update_config(config_path: str, updated_config_path: str, address: str, identity_pem_path: str, server_pem_path: str, client_pem_path: str):
+    update_config_batch(config_path, updated_config_path, [{
+        'address': address,
+        'identity': identity_pem_path,
+        'server_cert': server_pem_path,
+        'client_cert': client_pem_path,
+    }])
+
+
+def update_config_batch(config_path: str, updated_config_path: str, manifest: List[Dict[str, str]],
+                        diff_path: Optional[str] = None, log: bool = True):
     with open(config_path, 'r') as f:
         config = json.load(f)
-    identity = _pem_file_to_base64(identity_pem_path)
-    client_cert = _pem_file_to_base64(client_pem_path)
-    server_cert = _pem_file_to_base64(server_pem_path)
-    host, port = address.split(':')
-
-    addresses = config['channel_group']['groups']['Orderer']['groups']['OrdererOrg']['values']['Endpoints']['value']['addresses']
-    addresses_before_update = copy.deepcopy(addresses)
-    original_orderers_count = len(addresses_before_update)
-    addresses.append(f'{addresses[0].split(":")[0]}:{port}')
-    new_orderers_count = len(addresses)
-    _log_update('addresses', addresses_before_update, addresses)
-
-    identities = config['channel_group']['groups']['Orderer']['policies']['BlockValidation']['policy']['value']['identities']
-    identities_before_update = copy.deepcopy(identities)
-    new_identity = copy.deepcopy(identities[0])
-    new_identity['principal']['id_bytes'] = identity
-    identities.append(new_identity)
-    _log_update('block validation identities', identities_before_update, identities)
-
-    rule = config['channel_group']['groups']['Orderer']['policies']['BlockValidation']['policy']['value'][
-        'rule']
-    rule_before_update = copy.deepcopy(rule)
-    rule['n_out_of']['n'] = _calculate_bft_quorum(new_orderers_count)
-    rule['n_out_of']['rules'].append({'signed_by': new_orderers_count - 1})
-    _log_update('block validation rules', rule_before_update, rule)
-
-    consenter_mapping = config['channel_group']['groups']['Orderer']['values']['Orderers']['value']['consenter_mapping']
-    consenter_mapping_before_update = copy.deepcopy(consenter_mapping)
-    consenter_mapping.append({
-        'client_tls_cert': client_cert,
-        'host': host,
-        'id': new_orderers_count,
-        'identity': identity,
-        'msp_id': consenter_mapping[0]['msp_id'],
-        'port': port,
-        'server_tls_cert': server_cert
-    })
-    _log_update('consenter_mapping', consenter_mapping_before_update, consenter_mapping)
+    orderers = [{
+        'address': entry['address'],
+        'identity': _pem_file_to_base64(entry['identity']),
+        'server_cert': _pem_file_to_base64(entry['server_cert']),
+        'client_cert': _pem_file_to_base64(entry['client_cert']),
+    } for entry in manifest]
+
+    diff = add_orderers(config, orderers, log, diff=bool(diff_path))
 
     with open(updated_config_path, 'w') as f:
         json.dump(config, f)
+    if diff_path:
+        with open(diff_path, 'w') as f:
+            json.dump(diff, f, indent=2)
+    sections = _config_sections(config)
+    print(f'Added {len(orderers)} orderer(s); BFT quorum is now '
+          f'{sections["block validation rules"]["n_out_of"]["n"]} of '
+          f'{len(sections["consenter_mapping"])}')
 
 # Press the green button in the gutter to run the script.
 if __name__ == '__main__':
     args = parse_args()
-    update_config(args.config_path, args.updated_config_path, args.address, args.identity, args.server_cert, args.client_cert)
+    if args.manifest:
+        manifest = load_manifest(args.manifest)
+    else:
+        manifest = [{'address': args.address, 'identity': args.identity,
+                     'server_cert': args.server_cert, 'client_cert': args.client_cert}]
+    update_config_batch(args.config_path, args.updated_config_path, manifest, args.diff, not args.quiet)
 
 # See PyCharm help at https://www.jetbrains.com/help/pycharm/